@@ -2,20 +2,29 @@
 Runs a celery worker process that exposes a task API for
 ores.scoring_systems.CeleryQueue
 
+Workers consume the scoring system's `worker_queues` (the default queue
+unless configured).  Tasks sent to a `precache_queue` or through
+`queue_routes` need a separate pool of workers, e.g.
+
+    celery --queues=celery_precache
+
 Usage:
     celery [--config-dir=<path>]... [--logging-config=<path>]
-           [--debug] [--verbose]
+           [--queues=<names>] [--debug] [--verbose]
 
 Options:
     -h --help                Prints this documentation
     --config-dir=<path>      The path to a directory containing configuration
                              [default: config/]
+    --queues=<names>         A comma separated list of queues to consume
+                             instead of the configured `worker_queues`
     --debug                  Print debug logging information
     --verbose                Print verbose extraction information
 """
 import docopt
 
 from ..scoring_systems import CeleryQueue
+from ..util import shared_with_forks
 from .util import build_config, configure_logging
 
 
@@ -25,18 +34,23 @@ def main(argv=None):
     debug = args['--debug']
 
     run(verbose=verbose, debug=debug,
-        config_dirs=args['--config-dir'])
+        config_dirs=args['--config-dir'], queues=args['--queues'])
 
 
-def run(**kwargs):
+def run(queues=None, **kwargs):
     application = build(**kwargs)
-    application.worker_main(
-        argv=["celery_worker"])
+    argv = ["celery_worker"]
+    if queues is not None:
+        argv.extend(["-Q", queues])
+    application.worker_main(argv=argv)
 
 
 def build(**kwargs):
     config = build_config(**kwargs)
     configure_logging(config=config, **kwargs)
-    scoring_system = CeleryQueue.from_config(
-        config, config['ores']['scoring_system'])
+    # Models are loaded here, before celery forks its worker processes, so
+    # that all of the workers on a host share one copy of them.
+    with shared_with_forks():
+        scoring_system = CeleryQueue.from_config(
+            config, config['ores']['scoring_system'])
     return scoring_system.application
@@ -1,6 +1,8 @@
 
 class ScoreProcessorOverloaded(RuntimeError):
-    pass
+    def __init__(self, *args, retry_after=None):
+        super().__init__(*args)
+        self.retry_after = retry_after
 
 
 class TimeoutError(RuntimeError):
@@ -17,3 +19,7 @@ class MissingModels(RuntimeError):
 
 class TooManyRequestsError(RuntimeError):
     pass
+
+
+class RootCacheExpired(RuntimeError):
+    pass
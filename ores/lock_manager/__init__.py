@@ -1,5 +1,6 @@
 from .ip_range_list import IpRangeList
+from .local_lock_manager import LocalLockManager
 from .lock_manager import LockManager
 from .poolcounter import PoolCounter
 
-__all__ = [IpRangeList, LockManager, PoolCounter]
+__all__ = [IpRangeList, LocalLockManager, LockManager, PoolCounter]
@@ -1,19 +1,73 @@
+import bisect
+import functools
 import ipaddress
 
 
 class IpRangeList:
-    def __init__(self, whitelist):
+    """
+    Matches IP addresses against a whitelist of addresses and ranges.
+
+    The whitelist is compiled into sorted, merged intervals of integers for
+    each IP version so that a lookup is a binary search.
+
+    :Parameters:
+        whitelist : `list` ( `str` )
+            IP addresses or ranges, v4 or v6
+        memo_size : `int`
+            The number of recently matched IPs to remember.  0 disables.
+    """
+
+    def __init__(self, whitelist, memo_size=256):
         self.whitelist = whitelist
+        self.intervals = {4: [], 6: []}
+        for pattern_ip in whitelist or []:
+            ip_range = ipaddress.ip_network(pattern_ip)
+            self.intervals[ip_range.version].append(
+                (int(ip_range.network_address),
+                 int(ip_range.broadcast_address)))
+        self.intervals = {version: _merge(intervals)
+                          for version, intervals in self.intervals.items()}
+        self.starts = {version: [start for start, _ in intervals]
+                       for version, intervals in self.intervals.items()}
+
+        self.memo_size = memo_size
+        self._build_memo()
+
+    def _build_memo(self):
+        if self.memo_size:
+            self.memo = functools.lru_cache(maxsize=self.memo_size)(
+                self._lookup)
+        else:
+            self.memo = self._lookup
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['memo']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_memo()
 
     def matches(self, ip):
+        return self.memo(ip)
+
+    def _lookup(self, ip):
         search_ip = ipaddress.ip_address(ip)
-        for pattern_ip in self.whitelist:
-            ip_range = ipaddress.ip_network(pattern_ip)
-            try:
-                if search_ip in ip_range:
-                    return True
-            except TypeError:
-                # This is normal, when comparing IPv4 against IPv6.
-                pass
-
-        return False
+        intervals = self.intervals[search_ip.version]
+        search_int = int(search_ip)
+        i = bisect.bisect_right(self.starts[search_ip.version], search_int)
+        return i > 0 and search_int <= intervals[i - 1][1]
+
+
+def _merge(intervals):
+    """
+    Sorts intervals and merges those that overlap or touch.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
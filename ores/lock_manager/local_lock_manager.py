@@ -0,0 +1,231 @@
+"""
+A lock manager that keeps its counters in shared memory rather than in an
+external daemon.
+
+Counters live in arrays that are shared with every process forked after the
+lock manager is created (e.g. uwsgi workers forked from a master that built
+the application), so checking a lock is a few memory operations under a
+process-shared lock and never touches the network.  Processes that build
+their own lock manager after forking only limit themselves.
+
+Keys are hashed into a fixed number of slots.  Keys that collide share a
+slot, which only ever makes their limits stricter.  Slots are guarded by a
+fixed number of striped locks so that unrelated keys rarely contend.  Each
+slot records which pids hold or wait for it, so the locks of a process that
+is killed are reclaimed by the next process that finds the slot full.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+
+from ..errors import TimeoutError, TooManyRequestsError
+from ..util import pid_alive
+from .lock_manager import LockManager
+
+logger = logging.getLogger(__name__)
+
+
+class LocalLockManager(LockManager):
+    """
+    Limits the number of concurrent locks per key like PoolCounter does:
+    `workers` may hold a lock at once, up to `maxqueue` may hold or wait for
+    one, and waiting gives up after `timeout` seconds (or right away if
+    `timeout` is None).  Optionally, locks are also limited by a token bucket
+    per key.
+
+    :Parameters:
+        slots : `int`
+            The number of counters to hash keys into
+        rate : `float`
+            If set, the number of locks per second that each key is allowed
+            on average
+        burst : `int`
+            The number of locks that a key can take at once before `rate`
+            applies.  Defaults to `rate`.
+        stripes : `int`
+            The number of locks that guard the slots
+        holders : `int`
+            The number of processes that can hold or wait for a lock in a
+            slot at once.  It should be at least `maxqueue`.  Locking fails
+            with a `RuntimeError` when a slot runs out of room.
+    """
+
+    def __init__(self, slots=65536, rate=None, burst=None, stripes=64,
+                 holders=8):
+        self.slots = int(slots)
+        self.rate = float(rate) if rate is not None else None
+        self.burst = float(burst if burst is not None else (rate or 0))
+        self.holders = int(holders)
+
+        self.conditions = [multiprocessing.Condition()
+                           for _ in range(int(stripes))]
+        self.running = multiprocessing.RawArray('i', self.slots)
+        self.waiting = multiprocessing.RawArray('i', self.slots)
+        if self.rate is not None:
+            self.tokens = multiprocessing.RawArray('d', self.slots)
+            self.refilled = multiprocessing.RawArray('d', self.slots)
+        # `holders` entries per slot: a pid and its running and waiting locks
+        self.holder_pids = multiprocessing.RawArray(
+            'i', self.slots * self.holders)
+        self.holder_running = multiprocessing.RawArray(
+            'i', self.slots * self.holders)
+        self.holder_waiting = multiprocessing.RawArray(
+            'i', self.slots * self.holders)
+        self.pid = None
+        self._check_process()
+
+    def _check_process(self):
+        # Locks held before a fork belong to the parent
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.held = {}  # key --> locks held by this process
+
+    def _slot(self, key):
+        digest = hashlib.blake2b(bytes(key, 'utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') % self.slots
+
+    def _condition(self, slot):
+        return self.conditions[slot % len(self.conditions)]
+
+    def connect(self):
+        return True
+
+    def lock(self, key, workers, maxqueue, timeout):
+        self._check_process()
+        slot = self._slot(key)
+        condition = self._condition(slot)
+        deadline = time.monotonic() + (timeout or 0)
+        # All of a lock's counters are updated under one acquisition of its
+        # stripe.  The uncontended path doesn't touch `waiting`.
+        with condition:
+            if self.running[slot] + self.waiting[slot] >= maxqueue or \
+               self.running[slot] >= workers:
+                self._reclaim(slot)
+            if self.running[slot] + self.waiting[slot] >= maxqueue:
+                raise TooManyRequestsError
+            if self.rate is not None and not self._take_token(slot):
+                raise TooManyRequestsError
+
+            entry = self._holder_entry(slot)
+            if self.running[slot] >= workers:
+                self.waiting[slot] += 1
+                self.holder_waiting[entry] += 1
+                try:
+                    while self.running[slot] >= workers:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError
+                        condition.wait(remaining)
+                finally:
+                    self.waiting[slot] -= 1
+                    self.holder_waiting[entry] -= 1
+                    self._free_holder_entry(entry)
+            self.running[slot] += 1
+            self.holder_pids[entry] = self.pid
+            self.holder_running[entry] += 1
+            self.held[key] = self.held.get(key, 0) + 1
+
+        return True
+
+    def _holder_entry(self, slot):
+        """
+        Finds (or claims) the entry that records this process' locks in
+        `slot`.  Must be called with the slot's condition held.
+        """
+        start = slot * self.holders
+        for reclaimed in (False, True):
+            free = None
+            for entry in range(start, start + self.holders):
+                if self.holder_pids[entry] == self.pid:
+                    return entry
+                elif self.holder_pids[entry] == 0 and free is None:
+                    free = entry
+            if free is not None:
+                self.holder_pids[free] = self.pid
+                return free
+            elif not reclaimed:
+                self._reclaim(slot)
+        raise RuntimeError("More than {0} processes hold or wait for a lock "
+                           "in the same slot.  Increase `holders`."
+                           .format(self.holders))
+
+    def _free_holder_entry(self, entry):
+        if self.holder_running[entry] == 0 and \
+           self.holder_waiting[entry] == 0:
+            self.holder_pids[entry] = 0
+
+    def _reclaim(self, slot):
+        """
+        Releases the locks in `slot` of processes that died holding or
+        waiting for them.  Must be called with the slot's condition held.
+        """
+        start = slot * self.holders
+        reclaimed = False
+        for entry in range(start, start + self.holders):
+            pid = self.holder_pids[entry]
+            if pid == 0 or pid == self.pid or pid_alive(pid):
+                continue
+            logger.warning("Reclaiming locks held by process {0}, which is "
+                           "gone.".format(pid))
+            self.running[slot] -= self.holder_running[entry]
+            self.waiting[slot] -= self.holder_waiting[entry]
+            self.holder_running[entry] = 0
+            self.holder_waiting[entry] = 0
+            self.holder_pids[entry] = 0
+            reclaimed = True
+        if reclaimed:
+            self._condition(slot).notify_all()
+
+    def _take_token(self, slot):
+        now = time.monotonic()
+        if self.refilled[slot] == 0:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, self.tokens[slot] +
+                         (now - self.refilled[slot]) * self.rate)
+        self.refilled[slot] = now
+        if tokens >= 1:
+            self.tokens[slot] = tokens - 1
+            return True
+        else:
+            self.tokens[slot] = tokens
+            return False
+
+    def release(self, key):
+        self._check_process()
+        slot = self._slot(key)
+        condition = self._condition(slot)
+        with condition:
+            if self.held.get(key, 0) == 0:
+                return False
+            self.held[key] -= 1
+            if self.held[key] == 0:
+                del self.held[key]
+            self.running[slot] -= 1
+            entry = self._holder_entry(slot)
+            self.holder_running[entry] -= 1
+            self._free_holder_entry(entry)
+            # Only wake the stripe when someone waits on this slot
+            if self.waiting[slot] > 0:
+                condition.notify_all()
+        return True
+
+    def close(self):
+        return True
+
+    @classmethod
+    def from_config(cls, config, name, section_key="lock_managers"):
+        """
+        lock_managers:
+            local:
+                class: ores.lock_manager.LocalLockManager
+                slots: 65536
+                rate: 10 # locks per second per IP
+                burst: 20
+                stripes: 64
+                holders: 8 # processes per slot
+        """
+        section = config[section_key][name]
+        return cls(**{k: v for k, v in section.items() if k != "class"})
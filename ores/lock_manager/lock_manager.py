@@ -1,4 +1,7 @@
 """Lock manager interface."""
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class LockManager:
@@ -33,3 +36,29 @@ class LockManager:
         returns false if it wasn't able to close the connection, true otherwise.
         """
         raise NotImplementedError
+
+    @classmethod
+    def from_config(cls, config, name, section_key="lock_managers"):
+        """
+        Expects a `class` to load or, for PoolCounter, a list of nodes:
+
+            lock_managers:
+                pool_counter:
+                    - localhost:7531
+                local:
+                    class: ores.lock_manager.LocalLockManager
+        """
+        try:
+            import yamlconf
+        except ImportError:
+            raise ImportError("Could not find yamlconf.  This packages is " +
+                              "required when using yaml config files.")
+        logger.info("Loading LockManager '{0}' from config.".format(name))
+        section = config[section_key][name]
+        if isinstance(section, dict) and 'class' in section:
+            Class = yamlconf.import_module(section['class'])
+            return Class.from_config(config, name, section_key=section_key)
+        else:
+            from .poolcounter import PoolCounter
+            return PoolCounter.from_config(
+                config, name, section_key=section_key)
@@ -2,11 +2,21 @@
 Class to implement PoolCounter lock manager.
 
 This is useful to make sure too many connections are not coming from one IP.
+
+PoolCounter ties a lock to the connection that acquired it, so a connection
+is checked out of a per-node pool when a lock is acquired and is only
+returned to the pool once the lock is released on it.  Keys are mapped to
+nodes with rendezvous hashing so that a key keeps using the same node, and
+keys move to their next node while a node is failing.
 """
 
 import hashlib
 import logging
+import os
 import socket
+import threading
+import time
+from collections import defaultdict
 
 from ..errors import TimeoutError, TooManyRequestsError
 from .lock_manager import LockManager
@@ -15,82 +25,231 @@ logger = logging.getLogger(__name__)
 
 
 class PoolCounter(LockManager):
-    def __init__(self, nodes, connection_timeout=0.1):
-        self.nodes = nodes
+    """
+    :Parameters:
+        nodes : `list` ( (`str`, `int`) )
+            The host and port of each PoolCounter node
+        connection_timeout : `float`
+            Seconds to wait for a connection to a node
+        io_timeout : `float`
+            Seconds to wait for a node to respond.  When acquiring a lock,
+            this is on top of the time the node may queue the request for.
+        max_idle : `int`
+            The number of idle connections to keep open per node
+        retry_interval : `float`
+            Seconds to skip a node for after it fails
+    """
+
+    def __init__(self, nodes, connection_timeout=0.1, io_timeout=0.5,
+                 max_idle=8, retry_interval=10):
+        self.nodes = [tuple(node) for node in nodes]
         self.connection_timeout = connection_timeout
-        self.stream = None
+        self.io_timeout = io_timeout
+        self.max_idle = max_idle
+        self.retry_interval = retry_interval
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.mutex = threading.Lock()
+        self.idle = defaultdict(list)  # node --> [sockets]
+        self.held = defaultdict(list)  # key --> [(node, socket)]
+        self.down_until = {}  # node --> time
+
+    def _check_fork(self):
+        # Connections can't be shared with a forked process
+        if self.pid != os.getpid():
+            self._reset()
+
+    def nodes_for(self, key):
+        """
+        Orders nodes by rendezvous hash for a key.
+        """
+        return sorted(
+            self.nodes,
+            key=lambda node: hashlib.sha256(bytes(
+                "{0}:{1}{2}".format(node[0], node[1], key), 'utf-8'))
+            .hexdigest())
+
+    def _healthy_nodes_for(self, key):
+        now = time.monotonic()
+        nodes = self.nodes_for(key)
+        healthy = [node for node in nodes
+                   if self.down_until.get(node, 0) <= now]
+        # If everything is down, try anyway
+        return healthy or nodes
+
+    def _mark_down(self, node, error):
+        logger.warning("PoolCounter node {0}:{1} failed: {2}"
+                       .format(node[0], node[1], error))
+        self.down_until[node] = time.monotonic() + self.retry_interval
+        with self.mutex:
+            idle, self.idle[node] = self.idle[node], []
+        for stream in idle:
+            stream.close()
+
+    def _connect(self, node):
+        stream = socket.create_connection(
+            node, timeout=self.connection_timeout)
+        stream.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return stream
+
+    def _checkout(self, node):
+        """
+        :Returns:
+            A connection to `node` and whether or not it was idle in the pool
+        """
+        with self.mutex:
+            if self.idle[node]:
+                return self.idle[node].pop(), True
+        return self._connect(node), False
+
+    def _checkin(self, node, stream):
+        with self.mutex:
+            if len(self.idle[node]) < self.max_idle:
+                self.idle[node].append(stream)
+                return
+        stream.close()
+
+    def _request(self, stream, line, timeout):
+        stream.settimeout(timeout)
+        stream.sendall(bytes(line + "\n", 'utf-8'))
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = stream.recv(4096)
+            if not chunk:
+                raise ConnectionResetError("Connection closed by node")
+            data += chunk
+        return data.decode('utf-8').strip()
+
+    def _acquire(self, node, key, workers, maxqueue, timeout):
+        line = 'ACQ4ME %s %d %d %d' % (key, workers, maxqueue, timeout)
+        stream, reused = self._checkout(node)
+        try:
+            return stream, self._request(
+                stream, line, timeout + self.io_timeout)
+        except socket.error:
+            stream.close()
+            if not reused:
+                raise
+        # An idle connection may have been closed by the node.  Try again
+        # with a fresh one.
+        stream = self._connect(node)
+        try:
+            return stream, self._request(
+                stream, line, timeout + self.io_timeout)
+        except socket.error:
+            stream.close()
+            raise
 
     def connect(self, key):
-        hashes = []
-        for node in self.nodes:
-            hashes.append(
-                (node, hashlib.sha256(bytes(node[0] + key, 'utf-8')).hexdigest())
-            )
-        node = sorted(hashes, key=lambda i: i[1])[0][0]
-        try:
-            self.stream = socket.socket(socket.AF_INET, socket.SOCK_STREAM, 0)
-            self.stream.settimeout(self.connection_timeout)
-            self.stream.connect(node)
-            self.stream.settimeout(None)
-        except ConnectionRefusedError:
-            logger.warning(
-                'Can not connect to the PoolCounter node %s' % node[0])
-            return False
-        except TimeoutError:
-            logger.warning(
-                'Timeout error connecting to the PoolCounter node %s' % node[0])
-            return False
-        return True
+        self._check_fork()
+        for node in self._healthy_nodes_for(key):
+            try:
+                stream, _ = self._checkout(node)
+            except socket.error as e:
+                self._mark_down(node, e)
+                continue
+            self._checkin(node, stream)
+            return True
+        logger.warning('Can not connect to any PoolCounter node')
+        return False
 
     def lock(self, key, workers, maxqueue, timeout):
-        if not self.stream:
-            connected = self.connect(key)
-            if not connected:
+        self._check_fork()
+        error = None
+        for node in self._healthy_nodes_for(key):
+            try:
+                stream, data = self._acquire(
+                    node, key, workers, maxqueue, timeout)
+            except socket.error as e:
+                self._mark_down(node, e)
+                error = e
+                continue
+
+            if data == 'LOCKED':
+                with self.mutex:
+                    self.held[key].append((node, stream))
+                return True
+
+            self._checkin(node, stream)
+            if data == 'QUEUE_FULL':
+                raise TooManyRequestsError
+            elif data == 'TIMEOUT':
+                raise TimeoutError
+            else:
                 return False
-        try:
-            self.stream.send(bytes(
-                'ACQ4ME %s %d %d %d\n' % (key, workers, maxqueue, timeout),
-                'utf-8'))
-            data = self.stream.recv(4096).decode('utf-8')
-        except socket.error as e:
-            self.close()
-            raise e
 
-        if data.strip() == 'QUEUE_FULL':
-            raise TooManyRequestsError
-
-        if data.strip() == 'TIMEOUT':
-            raise TimeoutError
-
-        return data.strip() == 'LOCKED'
+        if error is not None:
+            raise error
+        return False
 
     def release(self, key):
-        if not self.stream:
-            return False
+        self._check_fork()
+        with self.mutex:
+            if not self.held.get(key):
+                return False
+            node, stream = self.held[key].pop()
+            if not self.held[key]:
+                del self.held[key]
 
         try:
-            self.stream.send(bytes('RELEASE %s\n' % key, 'utf-8'))
-            data = self.stream.recv(4096).decode('utf-8')
+            data = self._request(stream, 'RELEASE %s' % key, self.io_timeout)
         except socket.error as e:
-            self.close()
+            # Closing the connection releases the lock too
+            stream.close()
+            self._mark_down(node, e)
             raise e
 
-        return data.strip() == 'RELEASED'
+        self._checkin(node, stream)
+        return data == 'RELEASED'
 
     def close(self):
-        if self.stream:
-            self.stream.close()
-            self.stream = None
-            return True
-
-        return False
+        self._check_fork()
+        with self.mutex:
+            streams = [stream for streams in self.idle.values()
+                       for stream in streams]
+            streams.extend(stream for held in self.held.values()
+                           for _, stream in held)
+            self.idle.clear()
+            self.held.clear()
+        for stream in streams:
+            stream.close()
+
+        return len(streams) > 0
 
     @classmethod
     def from_config(cls, config, name, section_key="lock_managers"):
+        """
+        Expects either a list of nodes:
+
+            lock_managers:
+                pool_counter:
+                    - localhost:7531
+
+        or nodes with options:
+
+            lock_managers:
+                pool_counter:
+                    class: ores.lock_manager.PoolCounter
+                    nodes:
+                        - localhost:7531
+                    connection_timeout: 0.1
+                    io_timeout: 0.5
+                    max_idle: 8
+                    retry_interval: 10
+        """
+        section = config[section_key][name]
+        if isinstance(section, dict):
+            kwargs = {k: v for k, v in section.items()
+                      if k not in ('nodes', 'class')}
+            section = section['nodes']
+        else:
+            kwargs = {}
+
         nodes = []
-        # TODO: Fix config so we can inject connection_timeout
-        for node in config[section_key][name]:
+        for node in section:
             nodes.append((node.split(':')[0],
                           int(node.split(':')[1])))
 
-        return cls(nodes)
+        return cls(nodes, **kwargs)
@@ -0,0 +1,112 @@
+"""
+A minimal, in-process PoolCounter server for tests and benchmarks.
+
+It implements the `ACQ4ME` and `RELEASE` commands that
+:class:`ores.lock_manager.PoolCounter` uses, and releases a connection's
+locks when it disconnects, like the real server does.
+
+    with PoolCounterStub() as server:
+        pool_counter = PoolCounter([server.address])
+"""
+import socketserver
+import threading
+import time
+from collections import defaultdict
+
+
+class PoolCounterStub:
+    """
+    :Parameters:
+        host : `str`
+            The host to listen on
+        port : `int`
+            The port to listen on.  0 picks a free port.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.condition = threading.Condition()
+        self.running = defaultdict(int)  # key --> locks held
+        self.waiting = defaultdict(int)  # key --> requests queued
+
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                held = defaultdict(int)
+                try:
+                    for line in self.rfile:
+                        response = stub.handle(line.decode('utf-8'), held)
+                        self.wfile.write(bytes(response + "\n", 'utf-8'))
+                finally:
+                    stub.release_all(held)
+
+        self.server = socketserver.ThreadingTCPServer(
+            (host, port), Handler, bind_and_activate=False)
+        self.server.daemon_threads = True
+        self.server.allow_reuse_address = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self.address = self.server.server_address
+        self.thread = None
+
+    def handle(self, line, held):
+        parts = line.split()
+        if len(parts) == 5 and parts[0] == "ACQ4ME":
+            key = parts[1]
+            workers, maxqueue, timeout = (int(p) for p in parts[2:])
+            if held[key] > 0:
+                return "LOCK_HELD"
+            return self.acquire(key, workers, maxqueue, timeout, held)
+        elif len(parts) == 2 and parts[0] == "RELEASE":
+            key = parts[1]
+            if held[key] == 0:
+                return "NOT_LOCKED"
+            with self.condition:
+                held[key] -= 1
+                self.running[key] -= 1
+                self.condition.notify_all()
+            return "RELEASED"
+        else:
+            return "ERROR BAD_COMMAND"
+
+    def acquire(self, key, workers, maxqueue, timeout, held):
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            if self.running[key] + self.waiting[key] >= maxqueue:
+                return "QUEUE_FULL"
+            self.waiting[key] += 1
+            try:
+                while self.running[key] >= workers:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return "TIMEOUT"
+                    self.condition.wait(remaining)
+                self.running[key] += 1
+                held[key] += 1
+                return "LOCKED"
+            finally:
+                self.waiting[key] -= 1
+
+    def release_all(self, held):
+        with self.condition:
+            for key, count in held.items():
+                self.running[key] -= count
+            self.condition.notify_all()
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.05},
+            daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -1,6 +1,9 @@
+from .aggregating_statsd import AggregatingStatsd
 from .logger import Logger
 from .metrics_collector import MetricsCollector
 from .null import Null
+from .prometheus import Prometheus
 from .statsd import Statsd
 
-__all__ = [Logger, MetricsCollector, Null, Statsd]
+__all__ = [AggregatingStatsd, Logger, MetricsCollector, Null, Prometheus,
+           Statsd]
@@ -0,0 +1,131 @@
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from .statsd import Statsd
+
+logger = logging.getLogger(__name__)
+
+
+class AggregatingStatsd(Statsd):
+    """
+    A :class:`ores.metrics_collectors.Statsd` that doesn't send anything on
+    the request path.  Increments are summed in memory, and a background
+    thread flushes them to statsd in one pipeline every `flush_interval`
+    milliseconds.
+
+    Timings are aggregated between flushes rather than sent one by one, so
+    memory and packets don't grow with traffic and no timing is dropped.  A
+    timing metric is flushed as `<metric>.count` and `<metric>.sum`
+    (milliseconds) counters, which add up across processes, and as
+    `<metric>.min` and `<metric>.max` timings.
+
+    :Parameters:
+        statsd_client : :class:`statsd.StatsClient`
+            The client to flush to
+        flush_interval : `int`
+            Milliseconds between flushes
+    """
+
+    def __init__(self, statsd_client, flush_interval=1000):
+        super().__init__(statsd_client)
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pid = None
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self.counts = defaultdict(int)
+        self.timings = {}  # message --> [count, sum, min, max]
+
+    def _check_flusher(self):
+        # Threads don't survive a fork, so each process starts its own
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    self._reset()
+                    self.stopped = threading.Event()
+                    self.flusher = threading.Thread(
+                        target=self._flush_periodically, daemon=True)
+                    self.flusher.start()
+
+    def _flush_periodically(self):
+        while not self.stopped.wait(self.flush_interval / 1000):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Could not flush metrics: {0}".format(e))
+
+    def send_timing_event(self, *message_parts, duration=None):
+        self._check_flusher()
+        messages = self.generate_messages(message_parts)
+        with self.lock:
+            for message in messages:
+                aggregate = self.timings.get(message)
+                if aggregate is None:
+                    self.timings[message] = [1, duration * 1000,
+                                             duration * 1000, duration * 1000]
+                else:
+                    aggregate[0] += 1
+                    aggregate[1] += duration * 1000
+                    aggregate[2] = min(aggregate[2], duration * 1000)
+                    aggregate[3] = max(aggregate[3], duration * 1000)
+
+    def send_increment_event(self, *message_parts, count=1):
+        self._check_flusher()
+        messages = self.generate_messages(message_parts)
+        with self.lock:
+            for message in messages:
+                self.counts[message] += count
+
+    def flush(self):
+        """
+        Sends everything collected since the last flush.
+        """
+        with self.lock:
+            counts, timings = self.counts, self.timings
+            self._reset()
+        if len(counts) == 0 and len(timings) == 0:
+            return
+
+        with self.statsd_client.pipeline() as pipe:
+            for message, count in counts.items():
+                pipe.incr(message, count=count)
+            for message, (count, total, minimum, maximum) in \
+                    timings.items():
+                pipe.incr(message + ".count", count=count)
+                pipe.incr(message + ".sum", count=total)
+                pipe.timing(message + ".min", minimum)
+                pipe.timing(message + ".max", maximum)
+
+    def close(self):
+        """
+        Stops the flushing thread and flushes what is left.
+        """
+        if self.pid == os.getpid():
+            self.stopped.set()
+            self.flusher.join()
+        self.flush()
+
+    @classmethod
+    def from_parameters(cls, *args, flush_interval=1000, **kwargs):
+        import statsd
+        statsd_client = statsd.StatsClient(*args, **kwargs)
+        return cls(statsd_client, flush_interval=flush_interval)
+
+    @classmethod
+    def from_config(cls, config, name, section_key="metrics_collectors"):
+        """
+        metrics_collectors:
+            wmflabs_statsd:
+                class: ores.metrics_collectors.AggregatingStatsd
+                host: labmon1001.eqiad.wmnet
+                prefix: ores.{hostname}
+                maxudpsize: 512
+                flush_interval: 1000 # milliseconds
+        """
+        return super().from_config(config, name, section_key=section_key)
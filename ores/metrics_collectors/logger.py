@@ -63,6 +63,15 @@ class Logger(MetricsCollector):
             self.logger.debug("score_cache_miss: {0}:{1}"
                               .format(request.context_name, model_name))
 
+    def score_cache_tier_hit(self, tier, context_name, model_name, count=1):
+        self.logger.debug("score_cache_tier_hit: {0}:{1}:{2} x{3}"
+                          .format(tier, context_name, model_name, count))
+
+    def score_cache_tier_miss(self, tier, context_name, model_name,
+                              count=1):
+        self.logger.debug("score_cache_tier_miss: {0}:{1}:{2} x{3}"
+                          .format(tier, context_name, model_name, count))
+
     def score_errored(self, request, model_name):
         self.logger.debug("score_errored: {0}:{1}"
                           .format(request.context_name, model_name))
@@ -89,6 +98,13 @@ class Logger(MetricsCollector):
             "Response code {0} in {1} context"
             .format(response_code, request.context_name))
 
+    def stage_timed(self, request, stage, duration, model_names=None):
+        self.logger.debug(
+            "stage_timed: {0} {1}:{2} in {3} seconds"
+            .format(stage, request.context_name,
+                    format_set(model_names or request.model_names),
+                    round(duration, 3)))
+
     @classmethod
     def from_config(cls, config, name, section_key="metrics_collectors"):
         """
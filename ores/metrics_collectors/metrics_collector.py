@@ -28,6 +28,13 @@ class MetricsCollector:
     def score_cache_miss(self, request, model_name):
         raise NotImplementedError()
 
+    def score_cache_tier_hit(self, tier, context_name, model_name, count=1):
+        raise NotImplementedError()
+
+    def score_cache_tier_miss(self, tier, context_name, model_name,
+                              count=1):
+        raise NotImplementedError()
+
     def score_errored(self, request, model_name):
         raise NotImplementedError()
 
@@ -46,6 +53,14 @@ class MetricsCollector:
     def response_made(self, response_code, request):
         raise NotImplementedError()
 
+    def stage_timed(self, request, stage, duration, model_names=None):
+        """
+        Reports a span of a request's :class:`ores.tracing.Trace`.
+        `model_names` are the models the stage applied to, if it was specific
+        to some.
+        """
+        raise NotImplementedError()
+
     @classmethod
     def from_config(cls, config, name, section_key="metrics_collectors"):
         try:
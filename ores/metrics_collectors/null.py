@@ -26,6 +26,13 @@ class Null(MetricsCollector):
     def score_cache_miss(self, request, model_name):
         pass
 
+    def score_cache_tier_hit(self, tier, context_name, model_name, count=1):
+        pass
+
+    def score_cache_tier_miss(self, tier, context_name, model_name,
+                              count=1):
+        pass
+
     def score_errored(self, request, model_name):
         pass
 
@@ -44,6 +51,9 @@ class Null(MetricsCollector):
     def response_made(self, response_code, request):
         pass
 
+    def stage_timed(self, request, stage, duration, model_names=None):
+        pass
+
     @classmethod
     def from_config(cls, config, name, section_key="metrics_collectors"):
         """
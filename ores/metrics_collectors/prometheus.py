@@ -0,0 +1,414 @@
+"""
+A metrics collector that can be scraped by Prometheus.
+
+Each process keeps its counters and histograms in memory.  uwsgi and celery
+prefork their workers, so a scrape would only see whichever worker happened
+to serve it.  To report on all of them, processes that share a `directory`
+write a snapshot of their metrics there in the background, and a scrape sums
+the snapshots of every process.
+
+Snapshots of processes that have exited are merged into a single file so
+that counters never go backwards and recycling workers doesn't grow the
+directory.  A process merges its own snapshot when it exits normally and a
+scrape merges the snapshots of processes that were killed.  The directory
+should be emptied when the service is (re)started.
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from ..util import pid_alive
+from .metrics_collector import MetricsCollector
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 15.0, 30.0)
+EXITED_SNAPSHOT = "exited.json"
+LOCK_FILE = ".lock"
+
+
+class Prometheus(MetricsCollector):
+    """
+    Keeps counters and latency histograms (in seconds) for each metric and
+    renders them in the Prometheus text format.  See `exposition()`.
+
+    :Parameters:
+        directory : `str`
+            A directory to share metrics with other processes through.  If
+            not set, only this process' metrics are reported.
+        buckets : `list` ( `float` )
+            Upper bounds of the histogram buckets in seconds
+        write_interval : `int`
+            Milliseconds between writing this process' snapshot to
+            `directory`
+        namespace : `str`
+            A prefix for the name of every metric
+    """
+
+    def __init__(self, directory=None, buckets=DEFAULT_BUCKETS,
+                 write_interval=1000, namespace="ores"):
+        self.directory = directory
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self.write_interval = write_interval
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.pid = None
+        self._reset()
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            atexit.register(self.retire)
+
+    def _reset(self):
+        self.counters = defaultdict(float)
+        # (name, labels) --> [count per bucket..., count in +Inf, sum]
+        self.histograms = defaultdict(
+            lambda: [0] * (len(self.buckets) + 1) + [0.0])
+
+    def _check_process(self):
+        # Metrics recorded before a fork belong to the parent and threads
+        # don't survive a fork, so each process starts over.
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    self._reset()
+                    self.snapshot_name = "{0}-{1}.json".format(
+                        self.pid, uuid.uuid4().hex[:8])
+                    if self.directory is not None:
+                        self.stopped = threading.Event()
+                        self.writer = threading.Thread(
+                            target=self._write_periodically, daemon=True)
+                        self.writer.start()
+
+    def _write_periodically(self):
+        while not self.stopped.wait(self.write_interval / 1000):
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                logger.warning("Could not write metrics: {0}".format(e))
+
+    def precache_request(self, request, duration):
+        self.observe('precache_request', duration,
+                     context=request.context_name, model=request.model_names)
+
+    def scores_request(self, request, duration):
+        self.observe('scores_request', duration,
+                     context=request.context_name, model=request.model_names)
+        self.increment('revision_scored', count=len(request.rev_ids),
+                       context=request.context_name,
+                       model=request.model_names)
+
+    def datasources_extracted(self, request, rev_id_count, duration):
+        self.observe('datasources_extracted', duration,
+                     context=request.context_name, model=request.model_names)
+
+    def score_processed(self, request, duration):
+        self.observe('score_processed', duration,
+                     context=request.context_name, model=request.model_names)
+
+    def score_processor_overloaded(self, request):
+        self.increment('score_processor_overloaded',
+                       context=request.context_name,
+                       model=request.model_names)
+
+    def score_cache_hit(self, request, model_name):
+        name = 'precache_cache_hit' if request.precache else 'score_cache_hit'
+        self.increment(name, context=request.context_name, model=model_name)
+
+    def score_cache_miss(self, request, model_name):
+        name = 'precache_cache_miss' if request.precache \
+            else 'score_cache_miss'
+        self.increment(name, context=request.context_name, model=model_name)
+
+    def score_cache_tier_hit(self, tier, context_name, model_name, count=1):
+        self.increment('score_cache_tier_hit', count=count, tier=tier,
+                       context=context_name, model=model_name)
+
+    def score_cache_tier_miss(self, tier, context_name, model_name,
+                              count=1):
+        self.increment('score_cache_tier_miss', count=count, tier=tier,
+                       context=context_name, model=model_name)
+
+    def score_errored(self, request, model_name):
+        self.increment('score_errored', context=request.context_name,
+                       model=model_name)
+
+    def score_timed_out(self, request, duration):
+        self.observe('score_timed_out', duration,
+                     context=request.context_name, model=request.model_names)
+
+    def precache_score(self, request, duration):
+        self.observe('precache_score', duration,
+                     context=request.context_name, model=request.model_names)
+
+    def precache_scoring_error(self, request, status, duration):
+        self.observe('precache_scoring_error', duration,
+                     context=request.context_name, model=request.model_names,
+                     status=status)
+
+    def lock_acquired(self, lock_type, duration):
+        self.observe('lock_acquired', duration, lock_type=lock_type)
+
+    def response_made(self, response_code, request):
+        self.increment('response', code=response_code,
+                       context=request.context_name)
+
+    def stage_timed(self, request, stage, duration, model_names=None):
+        self.observe('stage', duration, stage=stage,
+                     context=request.context_name,
+                     model=model_names or request.model_names)
+
+    def increment(self, name, count=1, **labels):
+        """
+        Adds `count` to a counter.  A label that is given a set of values
+        (e.g. model names) counts once for each value.
+        """
+        self._check_process()
+        expanded = self.expand_labels(labels)
+        with self.lock:
+            for label_values in expanded:
+                self.counters[(name, label_values)] += count
+
+    def observe(self, name, duration, **labels):
+        """
+        Records `duration` (in seconds) in a histogram.  Labels are expanded
+        like they are for `increment()`.
+        """
+        self._check_process()
+        i = bisect.bisect_left(self.buckets, duration)
+        expanded = self.expand_labels(labels)
+        with self.lock:
+            for label_values in expanded:
+                histogram = self.histograms[(name, label_values)]
+                histogram[i] += 1
+                histogram[-1] += duration
+
+    @staticmethod
+    def expand_labels(labels):
+        expanded = [()]
+        for key in sorted(labels):
+            value = labels[key]
+            if isinstance(value, str) or not hasattr(value, "__iter__"):
+                values = [str(value)]
+            else:
+                values = sorted(str(v) for v in value)
+            expanded = [label_values + ((key, v),)
+                        for label_values in expanded for v in values]
+        return expanded
+
+    def snapshot(self):
+        """
+        Returns this process' metrics in a form that can be written as JSON.
+        """
+        self._check_process()
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value
+                             in self.counters.items()],
+                'histograms': [[name, labels, list(histogram)]
+                               for (name, labels), histogram
+                               in self.histograms.items()]
+            }
+
+    def write_snapshot(self):
+        """
+        Writes this process' snapshot to `directory`.
+        """
+        if self.directory is None or self.pid != os.getpid():
+            # Nothing has been recorded in this process
+            return
+        self._write_json(self.snapshot_name, self.snapshot())
+
+    def _write_json(self, filename, doc):
+        path = os.path.join(self.directory, filename)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(doc, f)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, filename):
+        try:
+            with open(os.path.join(self.directory, filename)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read metrics from {0}: {1}"
+                           .format(filename, e))
+            return None
+
+    @contextmanager
+    def _locked(self, operation):
+        # Keeps scrapes from reading a snapshot that is being merged
+        with open(os.path.join(self.directory, LOCK_FILE), "a") as f:
+            fcntl.flock(f, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def retire(self):
+        """
+        Merges this process' metrics into the snapshot of exited processes.
+        Called when the process exits.
+        """
+        if self.directory is None or self.pid != os.getpid():
+            return
+        self.close()
+        with self._locked(fcntl.LOCK_EX):
+            self._merge_snapshots([self.snapshot_name])
+
+    def merge_exited(self):
+        """
+        Merges the snapshots of processes that are gone without having
+        retired (e.g. killed workers).
+        """
+        with self._locked(fcntl.LOCK_EX):
+            exited = []
+            for filename in os.listdir(self.directory):
+                pid, _, _ = filename.partition("-")
+                if filename.endswith(".json") and pid.isdigit() and \
+                   not pid_alive(int(pid)):
+                    exited.append(filename)
+            if len(exited) > 0:
+                self._merge_snapshots(exited)
+
+    def _merge_snapshots(self, filenames):
+        snapshots = [self._read_json(EXITED_SNAPSHOT)]
+        snapshots.extend(self._read_json(filename) for filename in filenames)
+        counters, histograms = self.sum_snapshots(
+            snapshot for snapshot in snapshots if snapshot is not None)
+        self._write_json(EXITED_SNAPSHOT, {
+            'counters': [[name, labels, value]
+                         for (name, labels), value in counters.items()],
+            'histograms': [[name, labels, histogram]
+                           for (name, labels), histogram in histograms.items()]
+        })
+        for filename in filenames:
+            os.remove(os.path.join(self.directory, filename))
+
+    def read_snapshots(self):
+        if self.directory is None:
+            return [self.snapshot()]
+
+        # Make sure the process serving the scrape is up to date
+        self.write_snapshot()
+        self.merge_exited()
+        with self._locked(fcntl.LOCK_SH):
+            snapshots = [self._read_json(filename)
+                         for filename in os.listdir(self.directory)
+                         if filename.endswith(".json")]
+        return [snapshot for snapshot in snapshots if snapshot is not None]
+
+    def sum_snapshots(self, snapshots):
+        """
+        Sums counters and histograms across `snapshots`.
+        """
+        counters = defaultdict(float)
+        histograms = defaultdict(lambda: [0] * (len(self.buckets) + 1) + [0.0])
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                counters[(name, tuple(map(tuple, labels)))] += value
+            for name, labels, values in snapshot['histograms']:
+                if len(values) != len(self.buckets) + 2:
+                    # Written with different buckets
+                    continue
+                histogram = histograms[(name, tuple(map(tuple, labels)))]
+                for i, value in enumerate(values):
+                    histogram[i] += value
+        return counters, histograms
+
+    def collect(self):
+        """
+        Sums the snapshots of every process.
+        """
+        return self.sum_snapshots(self.read_snapshots())
+
+    def exposition(self):
+        """
+        Renders the metrics of every process in the Prometheus text format.
+        """
+        counters, histograms = self.collect()
+        lines = []
+
+        by_name = defaultdict(list)
+        for (name, labels), value in counters.items():
+            by_name[name].append((labels, value))
+        for name in sorted(by_name):
+            metric = "{0}_{1}_total".format(self.namespace, name)
+            lines.append("# TYPE {0} counter".format(metric))
+            for labels, value in sorted(by_name[name]):
+                lines.append("{0}{1} {2}".format(
+                    metric, format_labels(labels), format_value(value)))
+
+        by_name = defaultdict(list)
+        for (name, labels), histogram in histograms.items():
+            by_name[name].append((labels, histogram))
+        for name in sorted(by_name):
+            metric = "{0}_{1}_duration_seconds".format(self.namespace, name)
+            lines.append("# TYPE {0} histogram".format(metric))
+            for labels, histogram in sorted(by_name[name]):
+                cumulative = 0
+                bounds = [format_value(b) for b in self.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, histogram):
+                    cumulative += count
+                    lines.append("{0}_bucket{1} {2}".format(
+                        metric, format_labels(labels + (('le', bound),)),
+                        cumulative))
+                lines.append("{0}_sum{1} {2}".format(
+                    metric, format_labels(labels),
+                    format_value(histogram[-1])))
+                lines.append("{0}_count{1} {2}".format(
+                    metric, format_labels(labels), cumulative))
+
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """
+        Stops the writing thread and writes a final snapshot.
+        """
+        if self.pid == os.getpid() and self.directory is not None:
+            self.stopped.set()
+            self.writer.join()
+            self.write_snapshot()
+
+    @classmethod
+    def from_config(cls, config, name, section_key="metrics_collectors"):
+        """
+        metrics_collectors:
+            local_prometheus:
+                class: ores.metrics_collectors.Prometheus
+                directory: /var/run/ores/metrics
+                write_interval: 1000 # milliseconds
+                buckets: [0.05, 0.1, 0.5, 1, 5, 15]
+        """
+        logger.info("Loading Prometheus '{0}' from config.".format(name))
+        section = config[section_key][name]
+        return cls(**{k: v for k, v in section.items() if k != "class"})
+
+
+def format_labels(labels):
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(key, escape(value))
+                          for key, value in labels) + "}"
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n") \
+                .replace('"', '\\"')
+
+
+def format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    else:
+        return repr(float(value))
@@ -1,3 +1,4 @@
+import functools
 import logging
 import socket
 
@@ -54,6 +55,15 @@ class Statsd(MetricsCollector):
             self.send_increment_event(
                 'score_cache_miss', request.context_name, model_name)
 
+    def score_cache_tier_hit(self, tier, context_name, model_name, count=1):
+        self.send_increment_event('score_cache_tier_hit', tier, context_name,
+                                  model_name, count=count)
+
+    def score_cache_tier_miss(self, tier, context_name, model_name,
+                              count=1):
+        self.send_increment_event('score_cache_tier_miss', tier, context_name,
+                                  model_name, count=count)
+
     def score_errored(self, request, model_name):
         self.send_increment_event('score_errored', request.context_name,
                                   model_name)
@@ -78,6 +88,11 @@ class Statsd(MetricsCollector):
         self.send_increment_event('response', response_code,
                                   request.context_name)
 
+    def stage_timed(self, request, stage, duration, model_names=None):
+        self.send_timing_event('stage', stage, request.context_name,
+                               model_names or request.model_names,
+                               duration=duration)
+
     def send_timing_event(self, *message_parts, duration=None):
         with self.statsd_client.pipeline() as pipe:
             for message in self.generate_messages(message_parts):
@@ -94,16 +109,26 @@ class Statsd(MetricsCollector):
         Performs a deterministic first walk of the tree implied by a list of
         message parts.
 
-        generate_messages(["foo", "bar", ["herp", "derp"], "baz"]) yields:
+        generate_messages(["foo", "bar", ["herp", "derp"], "baz"]) returns:
         * "foo"
         * "foo.bar"
-        * "foo.bar.herp"
-        * "foo.bar.herp.baz"
         * "foo.bar.derp"
         * "foo.bar.derp.baz"
+        * "foo.bar.herp"
+        * "foo.bar.herp.baz"
+
+        The same parts (e.g. an event, context and set of models) come up
+        request after request, so the messages are cached.
         """
-        for message_parts in cls.generate_message_parts(parts):
-            yield ".".join(message_parts)
+        return cls._generate_messages(tuple(
+            tuple(cls.branch_message_part(part)) for part in parts))
+
+    @classmethod
+    @functools.lru_cache(maxsize=4096)
+    def _generate_messages(cls, branched_parts):
+        return tuple(".".join(message_parts)
+                     for message_parts in
+                     cls.generate_message_parts(branched_parts))
 
     @classmethod
     def generate_message_parts(cls, parts, i=0, message=[]):
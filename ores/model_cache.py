@@ -0,0 +1,165 @@
+"""
+On-demand model loading.
+
+A :class:`LazyModel` stands in for a :class:`revscoring.Model` in a
+:class:`ores.scoring_context.ScoringContext` and loads the model through a
+shared :class:`ModelCache` the first time it is used.  The cache keeps the
+most recently used models loaded up to a memory budget and evicts the rest.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+class ModelCache:
+    """
+    :Parameters:
+        load : `callable`
+            Loads a model by its config key
+        size : `callable`
+            Estimates how many bytes a model takes up by its config key (e.g.
+            the size of its model file).  Called when the model is loaded.
+        max_memory : `int`
+            The number of megabytes of models to keep loaded.  If None, models
+            are never evicted.
+    """
+
+    def __init__(self, load, size, max_memory=None):
+        self.load = load
+        self.size = size
+        self.max_memory = int(max_memory * MB) \
+            if max_memory is not None else None
+
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.models = OrderedDict()
+        self.pinned = set()
+        self.memory = 0
+
+    def __getstate__(self):
+        # Locks can't be pickled and loaded models shouldn't travel
+        state = self.__dict__.copy()
+        state['lock'] = None
+        state['key_locks'] = {}
+        state['models'] = OrderedDict()
+        state['memory'] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Gets a model, loading it if it isn't loaded already.
+        """
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key][0]
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given model
+        with key_lock:
+            with self.lock:
+                if key in self.models:
+                    self.models.move_to_end(key)
+                    return self.models[key][0]
+
+            start = time.time()
+            model = self.load(key)
+            size = self._size(key)
+            logger.info("Loaded model {0} ({1} MB) in {2} seconds"
+                        .format(key, round(size / MB, 1),
+                                round(time.time() - start, 3)))
+
+            with self.lock:
+                self.models[key] = (model, size)
+                self.memory += size
+                self._evict()
+
+            return model
+
+    def pin(self, key, model=None):
+        """
+        Loads a model and keeps it loaded.  A `model` that was already loaded
+        can be provided.
+        """
+        with self.lock:
+            self.pinned.add(key)
+            if model is not None and key not in self.models:
+                size = self._size(key)
+                self.models[key] = (model, size)
+                self.memory += size
+                self._evict()
+        return self.get(key)
+
+    def _size(self, key):
+        try:
+            return self.size(key)
+        except Exception as e:
+            logger.warning("Could not estimate the size of {0}: {1}"
+                           .format(key, e))
+            return 0
+
+    def _evict(self):
+        if self.max_memory is None:
+            return
+        for key in list(self.models.keys()):
+            if self.memory <= self.max_memory:
+                break
+            # Never evict the model that was just loaded
+            if key in self.pinned or key == next(reversed(self.models)):
+                continue
+            _, size = self.models.pop(key)
+            self.memory -= size
+            logger.info("Evicted model {0} ({1} MB)"
+                        .format(key, round(size / MB, 1)))
+
+    def __contains__(self, key):
+        return key in self.models
+
+
+class LazyModel:
+    """
+    Stands in for a :class:`revscoring.Model` until it is used.  A model's
+    version, features and info are remembered once it has been loaded so
+    that those can still be read without reloading it after it is evicted.
+
+    :Parameters:
+        model_cache : :class:`ModelCache`
+            The cache to load the model through
+        key : `str`
+            The config key of the model
+    """
+    REMEMBERED = ('version', 'features', 'info')
+
+    def __init__(self, model_cache, key):
+        self.model_cache = model_cache
+        self.key = key
+
+    @property
+    def model(self):
+        model = self.model_cache.get(self.key)
+        for attr in self.REMEMBERED:
+            if attr not in self.__dict__:
+                self.__dict__[attr] = getattr(model, attr, None)
+        return model
+
+    def __getattr__(self, attr):
+        # Only called for attributes that LazyModel doesn't have itself
+        if attr.startswith("__") or 'model_cache' not in self.__dict__:
+            raise AttributeError(attr)
+        model = self.model
+        if attr in self.REMEMBERED:
+            return self.__dict__[attr]
+        else:
+            return getattr(model, attr)
+
+    def __repr__(self):
+        return "{0}({1!r})".format(self.__class__.__name__, self.key)
@@ -0,0 +1,115 @@
+"""
+Snapshots of the model metadata that a
+:class:`ores.scoring_context.ClientScoringContext` needs.
+
+A client only needs a model's info and the root datasources of its features,
+but getting those from a model file means unpickling the whole estimator.
+A snapshot stores just that metadata, keyed by a hash of the model file so
+that it is ignored once the model file changes.  The model file's size and
+modification time are stored too, and the file is only hashed when they
+differ, so reading a snapshot doesn't read the model file.  Snapshots are
+written with `ores snapshot_models` and read from the directory configured
+as `ores.data_paths.model_metadata`.
+"""
+import logging
+import os.path
+import pickle
+from hashlib import sha1
+
+logger = logging.getLogger(__name__)
+
+EXTENSION = ".metadata"
+
+
+def snapshot_dir(config):
+    """
+    Returns the configured snapshot directory or None.
+    """
+    return config.get('ores', {}).get('data_paths', {}).get('model_metadata')
+
+
+def model_file_hash(config, key):
+    """
+    Returns a hash of the model file of a model or None if it is not loaded
+    from a file.
+    """
+    section = config['scorer_models'][key]
+    if 'model_file' not in section:
+        return None
+    hash = sha1()
+    with open(section['model_file'], 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash.update(chunk)
+    return hash.hexdigest()
+
+
+def model_file_stat(config, key):
+    """
+    Returns the size and modification time (in nanoseconds) of the model file
+    of a model or None if it is not loaded from a file.
+    """
+    section = config['scorer_models'][key]
+    if 'model_file' not in section:
+        return None
+    stat = os.stat(section['model_file'])
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def snapshot_path(directory, key):
+    return os.path.join(directory, key + EXTENSION)
+
+
+def write_snapshot(directory, config, key, info, root_datasources):
+    """
+    Writes the metadata snapshot of a model.
+
+    :Returns:
+        The path of the snapshot or None if the model is not loaded from a
+        file.
+    """
+    file_hash = model_file_hash(config, key)
+    if file_hash is None:
+        return None
+    snapshot = {
+        'model_file_hash': file_hash,
+        'model_file_stat': model_file_stat(config, key),
+        'version': info.get('version') if info is not None else None,
+        'info': info,
+        'root_datasources': list(root_datasources),
+        'root_datasource_names': [str(d) for d in root_datasources]
+    }
+    path = snapshot_path(directory, key)
+    with open(path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def read_snapshot(directory, config, key):
+    """
+    Reads the metadata snapshot of a model.
+
+    :Returns:
+        A `dict` snapshot or None if there is no snapshot or it is stale
+    """
+    path = snapshot_path(directory, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+        file_stat = model_file_stat(config, key)
+        if file_stat is not None and \
+           snapshot.get('model_file_stat') == file_stat:
+            # Unchanged since the snapshot was written
+            return snapshot
+        file_hash = model_file_hash(config, key)
+    except Exception as e:
+        logger.warning("Could not read the metadata snapshot of {0}: {1}"
+                       .format(key, e))
+        return None
+
+    if file_hash is None or snapshot.get('model_file_hash') != file_hash:
+        logger.info("The metadata snapshot of {0} is stale".format(key))
+        return None
+    else:
+        return snapshot
@@ -0,0 +1,5 @@
+from .in_memory_root_cache_store import InMemoryRootCacheStore
+from .redis_root_cache_store import RedisRootCacheStore
+from .root_cache_store import RootCacheStore
+
+__all__ = [RootCacheStore, RedisRootCacheStore, InMemoryRootCacheStore]
@@ -0,0 +1,20 @@
+"""
+In memory implementation of root cache store.  Only useful when the workers
+share a process with the web server (e.g. eager celery tasks).  Used for
+tests.
+"""
+
+from .root_cache_store import RootCacheStore
+
+
+class InMemoryRootCacheStore(RootCacheStore):
+
+    def __init__(self, min_size=None):
+        super().__init__(min_size=min_size)
+        self.values = {}
+
+    def _set(self, key, value, ttl):
+        self.values[key] = value
+
+    def _get(self, key):
+        return self.values.get(key)
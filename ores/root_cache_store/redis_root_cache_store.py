@@ -0,0 +1,62 @@
+"""
+Class to implement Redis root cache store.
+
+Payloads expire so that a task that is never picked up doesn't leave its
+root caches behind.  Unless a `ttl` is configured, they expire once the
+task that reads them would be past its deadline.
+"""
+
+import logging
+
+from .root_cache_store import RootCacheStore
+
+logger = logging.getLogger(__name__)
+TTL = 60   # 1 minute, when there is no deadline
+PREFIX = "ores_root_cache"
+
+
+class RedisRootCacheStore(RootCacheStore):
+    def __init__(self, redis, ttl=None, prefix=None, min_size=None):
+        super().__init__(min_size=min_size)
+        self.redis = redis
+        self.ttl = int(ttl) if ttl is not None else None
+        self.prefix = str(prefix or PREFIX)
+
+    def _set(self, key, value, ttl):
+        ttl = self.ttl or ttl or TTL
+        return self.redis.setex(self.prefix + ':' + key, int(ttl), value)
+
+    def _get(self, key):
+        return self.redis.get(self.prefix + ':' + key)
+
+    @classmethod
+    def from_parameters(cls, *args, ttl=None, prefix=None, min_size=None,
+                        **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("Could not find redis-py.  This packages is " +
+                              "required when using " +
+                              "ores.root_cache_store.RedisRootCacheStore.")
+
+        return cls(redis.StrictRedis(*args, **kwargs), ttl=ttl, prefix=prefix,
+                   min_size=min_size)
+
+    @classmethod
+    def from_config(cls, config, name, section_key="root_cache_stores"):
+        """
+        root_cache_stores:
+            redis:
+                class: ores.root_cache_store.RedisRootCacheStore
+                host: localhost
+                prefix: ores-derp
+                ttl: 60 # overrides the deadline of the task
+                min_size: 4096
+        """
+        logger.info("Loading RedisRootCacheStore '{0}' from config."
+                    .format(name))
+        section = config[section_key][name]
+
+        kwargs = {k: v for k, v in section.items() if k != "class"}
+
+        return cls.from_parameters(**kwargs)
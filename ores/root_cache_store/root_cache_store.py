@@ -0,0 +1,79 @@
+"""
+Interface for root cache stores.
+
+Root caches (the datasources extracted for a revision) can include the full
+text of a revision and its parent.  Rather than sending them through the
+celery broker, a root cache store holds them to the side for a short time
+and only a reference travels in the task message.
+"""
+import pickle
+import uuid
+
+from ..errors import RootCacheExpired
+
+REFERENCE = "root_cache_ref"
+
+
+class RootCacheStore:
+    """
+    :Parameters:
+        min_size : `int`
+            Payloads that encode to fewer bytes than this are left in the task
+            message since a round trip to the store would cost more than it
+            saves.
+    """
+
+    def __init__(self, min_size=None):
+        self.min_size = int(min_size or 0)
+
+    def store(self, payload, ttl=None):
+        """
+        Stores a payload.
+
+        :Parameters:
+            payload : `object`
+                A picklable payload
+            ttl : `int`
+                Seconds that the payload is needed for.  Stores that expire
+                payloads keep it at least this long unless they are
+                configured with a TTL of their own.
+
+        :Returns:
+            A reference to the payload or the payload itself if it is smaller
+            than `min_size`.  Either can be passed to :meth:`load`.
+        """
+        value = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(value) < self.min_size:
+            return payload
+
+        key = uuid.uuid4().hex
+        self._set(key, value, ttl)
+        return {REFERENCE: key}
+
+    def load(self, payload):
+        """
+        Loads a payload from a reference returned by :meth:`store`.
+
+        :Raises:
+            :class:`ores.errors.RootCacheExpired` if the payload is gone
+        """
+        if not is_reference(payload):
+            return payload
+
+        value = self._get(payload[REFERENCE])
+        if value is None:
+            raise RootCacheExpired(
+                "Root cache {0} is no longer stored".format(
+                    payload[REFERENCE]))
+        return pickle.loads(value)
+
+    def _set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def _get(self, key):
+        raise NotImplementedError
+
+
+def is_reference(payload):
+    return isinstance(payload, dict) and len(payload) == 1 and \
+        REFERENCE in payload
@@ -2,5 +2,6 @@ from .empty import Empty
 from .lru import LRU
 from .redis import Redis, RedisSentinel
 from .score_cache import ScoreCache
+from .two_tier import TwoTier
 
-__all__ = [ScoreCache, Empty, LRU, Redis, RedisSentinel]
+__all__ = [ScoreCache, Empty, LRU, Redis, RedisSentinel, TwoTier]
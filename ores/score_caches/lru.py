@@ -1,4 +1,6 @@
 import logging
+import threading
+import time
 
 from .score_cache import ScoreCache
 
@@ -6,8 +8,18 @@ logger = logging.getLogger(__name__)
 
 
 class LRU(ScoreCache):
+    """
+    An in-process least-recently-used score cache.  It is safe to share
+    between threads.
 
-    def __init__(self, size=1024):
+    :Parameters:
+        size : `int`
+            The maximum number of scores to hold
+        ttl : `float`
+            If set, the number of seconds after which a stored score expires
+    """
+
+    def __init__(self, size=1024, ttl=None):
         try:
             import pylru
         except ImportError:
@@ -15,6 +27,9 @@ class LRU(ScoreCache):
                               "required when using ores.score_caches.LRU.")
 
         self.lru = pylru.lrucache(size)
+        self.ttl = float(ttl) if ttl is not None else None
+        # pylru reorders its linked list on every lookup
+        self.lock = threading.Lock()
 
     def lookup(self, context_name, model_name, rev_id, version=None,
                injection_cache=None):
@@ -22,7 +37,12 @@ class LRU(ScoreCache):
         cache_hash = hash(tuple(sorted((injection_cache or {}).items())))
         key = (context_name, model_name, rev_id, version, cache_hash)
         logger.debug("Looking up score at {0}".format(key))
-        return self.lru[key]
+        with self.lock:
+            score, expires = self.lru[key]
+            if expires is not None and expires < time.time():
+                del self.lru[key]
+                raise KeyError(key)
+        return score
 
     def store(self, score, context_name, model_name, rev_id, version=None,
               injection_cache=None):
@@ -30,10 +50,19 @@ class LRU(ScoreCache):
         cache_hash = hash(tuple(sorted((injection_cache or {}).items())))
         key = (context_name, model_name, rev_id, version, cache_hash)
         logger.debug("Storing score at {0}: {1}".format(key, str(score)[:100]))
-        self.lru[key] = score
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.lru[key] = (score, expires)
 
     @classmethod
     def from_config(cls, config, name, section_key="score_caches"):
+        """
+        score_caches:
+            memory_lru:
+                class: ores.score_caches.LRU
+                size: 1024
+                ttl: 60 # seconds
+        """
         section = config[section_key][name]
 
         return cls(**{k: v for k, v in section.items() if k != "class"})
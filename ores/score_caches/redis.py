@@ -1,7 +1,7 @@
-import json
 import logging
 from hashlib import sha1
 
+from . import codecs
 from .score_cache import ScoreCache
 
 logger = logging.getLogger("ores.score_caches.redis")
@@ -13,12 +13,42 @@ CLUSTER = 'orescache'
 SOCKET_TIMEOUT = 0.1
 
 
+def decode(codec, key, value):
+    """
+    Decodes a cached score.  A value that can't be decoded (e.g. it is
+    corrupt) is treated as a miss.
+    """
+    try:
+        return codec.decode(value)
+    except Exception:
+        logger.warning("Could not decode the score cached at {0}"
+                       .format(key), exc_info=True)
+        raise KeyError(key)
+
+
+def decode_many(codec, keys, values):
+    """
+    Decodes cached scores into a `dict` mapping the index of each key to its
+    score.  Misses are omitted.
+    """
+    scores = {}
+    for i, (key, value) in enumerate(zip(keys, values)):
+        if value is None:
+            continue
+        try:
+            scores[i] = decode(codec, key, value)
+        except KeyError:
+            continue
+    return scores
+
+
 class Redis(ScoreCache):
 
-    def __init__(self, redis, ttl=None, prefix=None):
+    def __init__(self, redis, ttl=None, prefix=None, codec=None):
         self.redis = redis
         self.ttl = int(ttl or TTL)
         self.prefix = str(prefix or PREFIX)
+        self.codec = codec or codecs.JSON()
 
     def lookup(self, context_name, model_name, rev_id, version=None,
                injection_cache=None):
@@ -31,7 +61,7 @@ class Redis(ScoreCache):
         if value is None:
             raise KeyError(key)
         else:
-            return json.loads(str(value, 'utf-8'))
+            return decode(self.codec, key, value)
 
     def store(self, score, context_name, model_name, rev_id, version=None,
               injection_cache=None):
@@ -40,7 +70,33 @@ class Redis(ScoreCache):
             injection_cache=injection_cache)
 
         logger.debug("Storing score at {0}".format(key))
-        self.redis.setex(key, self.ttl, bytes(json.dumps(score), 'utf-8'))
+        self.redis.setex(key, self.ttl, self.codec.encode(score))
+
+    def lookup_many(self, context_name, lookups):
+        lookups = list(lookups)
+        if len(lookups) == 0:
+            return {}
+        keys = [self._generate_key(
+                    context_name, model_name, rev_id, version=version,
+                    injection_cache=injection_cache)
+                for model_name, rev_id, version, injection_cache in lookups]
+
+        logger.debug("Looking up {0} scores".format(len(keys)))
+        values = self.redis.mget(keys)
+        return decode_many(self.codec, keys, values)
+
+    def store_many(self, context_name, stores):
+        stores = list(stores)
+        if len(stores) == 0:
+            return
+        logger.debug("Storing {0} scores".format(len(stores)))
+        pipe = self.redis.pipeline(transaction=False)
+        for score, model_name, rev_id, version, injection_cache in stores:
+            key = self._generate_key(
+                context_name, model_name, rev_id, version=version,
+                injection_cache=injection_cache)
+            pipe.setex(key, self.ttl, self.codec.encode(score))
+        pipe.execute()
 
     def _generate_key(self, wiki, model, rev_id, version=None,
                       injection_cache=None):
@@ -54,14 +110,16 @@ class Redis(ScoreCache):
         return ":".join(str(v) for v in key_values)
 
     @classmethod
-    def from_parameters(cls, *args, ttl=None, prefix=None, **kwargs):
+    def from_parameters(cls, *args, ttl=None, prefix=None, codec=None,
+                        **kwargs):
         try:
             import redis
         except ImportError:
             raise ImportError("Could not find redis-py.  This packages is " +
                               "required when using ores.score_caches.Redis.")
 
-        return cls(redis.StrictRedis(*args, **kwargs), ttl=ttl, prefix=prefix)
+        return cls(redis.StrictRedis(*args, **kwargs), ttl=ttl, prefix=prefix,
+                   codec=codecs.from_name(codec))
 
     @classmethod
     def from_config(cls, config, name, section_key="score_caches"):
@@ -72,6 +130,7 @@ class Redis(ScoreCache):
                 host: localhost
                 prefix: ores-derp
                 ttl: 9001
+                codec: msgpack  # or json (default)
         """
         logger.info("Loading Redis '{0}' from config.".format(name))
         section = config[section_key][name]
@@ -88,12 +147,14 @@ class Redis(ScoreCache):
 
 class RedisSentinel(ScoreCache):
 
-    def __init__(self, sentinel, ttl=None, prefix=None, cluster=None, socket_timeout=None):
+    def __init__(self, sentinel, ttl=None, prefix=None, cluster=None, socket_timeout=None,
+                 codec=None):
         self.sentinel = sentinel
         self.ttl = int(ttl or TTL)
         self.prefix = str(prefix or PREFIX)
         self.cluster = str(cluster or CLUSTER)
         self.socket_timeout = float(socket_timeout or SOCKET_TIMEOUT)
+        self.codec = codec or codecs.JSON()
 
     def lookup(self, context_name, model_name, rev_id, version=None,
                injection_cache=None):
@@ -107,7 +168,7 @@ class RedisSentinel(ScoreCache):
         if value is None:
             raise KeyError(key)
         else:
-            return json.loads(str(value, 'utf-8'))
+            return decode(self.codec, key, value)
 
     def store(self, score, context_name, model_name, rev_id, version=None,
               injection_cache=None):
@@ -117,7 +178,35 @@ class RedisSentinel(ScoreCache):
 
         master = self.sentinel.master_for(self.cluster, socket_timeout=self.socket_timeout)
         sentinel_logger.debug("Storing score at {0} in master".format(key))
-        master.setex(key, self.ttl, bytes(json.dumps(score), 'utf-8'))
+        master.setex(key, self.ttl, self.codec.encode(score))
+
+    def lookup_many(self, context_name, lookups):
+        lookups = list(lookups)
+        if len(lookups) == 0:
+            return {}
+        keys = [self._generate_key(
+                    context_name, model_name, rev_id, version=version,
+                    injection_cache=injection_cache)
+                for model_name, rev_id, version, injection_cache in lookups]
+
+        replica = self.sentinel.slave_for(self.cluster, socket_timeout=self.socket_timeout)
+        sentinel_logger.debug("Looking up {0} scores in replica".format(len(keys)))
+        values = replica.mget(keys)
+        return decode_many(self.codec, keys, values)
+
+    def store_many(self, context_name, stores):
+        stores = list(stores)
+        if len(stores) == 0:
+            return
+        master = self.sentinel.master_for(self.cluster, socket_timeout=self.socket_timeout)
+        sentinel_logger.debug("Storing {0} scores in master".format(len(stores)))
+        pipe = master.pipeline(transaction=False)
+        for score, model_name, rev_id, version, injection_cache in stores:
+            key = self._generate_key(
+                context_name, model_name, rev_id, version=version,
+                injection_cache=injection_cache)
+            pipe.setex(key, self.ttl, self.codec.encode(score))
+        pipe.execute()
 
     def _generate_key(self, wiki, model, rev_id, version=None,
                       injection_cache=None):
@@ -132,7 +221,7 @@ class RedisSentinel(ScoreCache):
 
     @classmethod
     def from_parameters(cls, hosts, ttl=None, prefix=None, cluster=None,
-                        socket_timeout=None):
+                        socket_timeout=None, codec=None):
         try:
             from redis.sentinel import Sentinel
         except ImportError:
@@ -142,7 +231,8 @@ class RedisSentinel(ScoreCache):
         hosts = [i.split(':') for i in hosts]
         return cls(Sentinel(hosts, socket_timeout=socket_timeout),
                    ttl=ttl, prefix=prefix, cluster=cluster,
-                   socket_timeout=socket_timeout)
+                   socket_timeout=socket_timeout,
+                   codec=codecs.from_name(codec))
 
     @classmethod
     def from_config(cls, config, name, section_key="score_caches"):
@@ -154,6 +244,7 @@ class RedisSentinel(ScoreCache):
                 ttl: 9001
                 socket_timeout: 0.1
                 cluster: mymaster
+                codec: msgpack  # or json (default)
                 hosts:
                   - localhost:5000
                   - localhost:5001
@@ -18,6 +18,54 @@ class ScoreCache:
         """
         raise NotImplementedError()
 
+    def lookup_many(self, context_name, lookups):
+        """
+        Returns a set of pre-cached scores at once.  Implementations that can
+        batch round trips should override this.  By default, each score is
+        looked up with :meth:`lookup`.
+
+        :Parameters:
+            context_name : `str`
+                The name of the context the scores belong to
+            lookups : `iterable` ( `tuple` )
+                (model_name, rev_id, version, injection_cache) tuples to look
+                up
+
+        :Returns:
+            A `dict` mapping the index of each lookup in `lookups` to its
+            score for every lookup that was found in the cache.  Misses are
+            omitted.  Lookups of the same revision and model that differ in
+            their version or injection cache get separate entries.
+        """
+        scores = {}
+        for i, (model_name, rev_id, version, injection_cache) in \
+                enumerate(lookups):
+            try:
+                scores[i] = self.lookup(
+                    context_name, model_name, rev_id, version=version,
+                    injection_cache=injection_cache)
+            except KeyError:
+                pass
+
+        return scores
+
+    def store_many(self, context_name, stores):
+        """
+        Caches a set of new scores at once.  Implementations that can batch
+        round trips should override this.  By default, each score is stored
+        with :meth:`store`.
+
+        :Parameters:
+            context_name : `str`
+                The name of the context the scores belong to
+            stores : `iterable` ( `tuple` )
+                (score, model_name, rev_id, version, injection_cache) tuples
+                to store
+        """
+        for score, model_name, rev_id, version, injection_cache in stores:
+            self.store(score, context_name, model_name, rev_id,
+                       version=version, injection_cache=injection_cache)
+
     def context(self, wiki, model, version=None):
         return Context(self, wiki, model, version=None)
 
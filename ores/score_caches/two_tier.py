@@ -0,0 +1,141 @@
+import logging
+from collections import Counter
+
+from ..metrics_collectors import Null
+from .score_cache import ScoreCache
+
+logger = logging.getLogger(__name__)
+
+NEAR = "near"
+FAR = "far"
+
+
+class TwoTier(ScoreCache):
+    """
+    A score cache that puts a fast, local cache (e.g.
+    :class:`ores.score_caches.LRU`) in front of a slower, shared cache (e.g.
+    :class:`ores.score_caches.Redis`).  Scores that are found in the far tier
+    are copied into the near tier so that repeated lookups stay in-process.
+
+    :Parameters:
+        near : :class:`ores.score_caches.ScoreCache`
+            The cache to check first
+        far : :class:`ores.score_caches.ScoreCache`
+            The cache to check when the near tier misses
+        metrics_collector : :class:`ores.metrics_collectors.MetricsCollector`
+            Collects per-tier hit and miss counts.  A scoring system replaces
+            this with its own `metrics_collector`.
+    """
+
+    def __init__(self, near, far, metrics_collector=None):
+        self.near = near
+        self.far = far
+        self.metrics_collector = metrics_collector or Null()
+
+    def lookup(self, context_name, model_name, rev_id, version=None,
+               injection_cache=None):
+        try:
+            score = self.near.lookup(
+                context_name, model_name, rev_id, version=version,
+                injection_cache=injection_cache)
+        except KeyError:
+            self.metrics_collector.score_cache_tier_miss(
+                NEAR, context_name, model_name)
+        else:
+            self.metrics_collector.score_cache_tier_hit(
+                NEAR, context_name, model_name)
+            return score
+
+        try:
+            score = self.far.lookup(
+                context_name, model_name, rev_id, version=version,
+                injection_cache=injection_cache)
+        except KeyError:
+            self.metrics_collector.score_cache_tier_miss(
+                FAR, context_name, model_name)
+            raise
+
+        self.metrics_collector.score_cache_tier_hit(
+            FAR, context_name, model_name)
+        self.near.store(score, context_name, model_name, rev_id,
+                        version=version, injection_cache=injection_cache)
+        return score
+
+    def store(self, score, context_name, model_name, rev_id, version=None,
+              injection_cache=None):
+        self.far.store(score, context_name, model_name, rev_id,
+                       version=version, injection_cache=injection_cache)
+        self.near.store(score, context_name, model_name, rev_id,
+                        version=version, injection_cache=injection_cache)
+
+    def lookup_many(self, context_name, lookups):
+        lookups = list(lookups)
+        scores = self.near.lookup_many(context_name, lookups)
+        self._report_tier(NEAR, context_name, lookups, scores)
+
+        far_indexes = [i for i in range(len(lookups)) if i not in scores]
+        if len(far_indexes) == 0:
+            return scores
+
+        far_lookups = [lookups[i] for i in far_indexes]
+        far_scores = self.far.lookup_many(context_name, far_lookups)
+        self._report_tier(FAR, context_name, far_lookups, far_scores)
+
+        # Fill the near tier with what we found in the far tier
+        self.near.store_many(
+            context_name,
+            ((far_scores[j], model_name, rev_id, version, injection_cache)
+             for j, (model_name, rev_id, version, injection_cache)
+             in enumerate(far_lookups)
+             if j in far_scores))
+
+        scores.update((far_indexes[j], score)
+                      for j, score in far_scores.items())
+        return scores
+
+    def store_many(self, context_name, stores):
+        stores = list(stores)
+        self.far.store_many(context_name, stores)
+        self.near.store_many(context_name, stores)
+
+    def _report_tier(self, tier, context_name, lookups, scores):
+        hits = Counter()
+        misses = Counter()
+        for i, (model_name, _, _, _) in enumerate(lookups):
+            if i in scores:
+                hits[model_name] += 1
+            else:
+                misses[model_name] += 1
+
+        for model_name, count in hits.items():
+            self.metrics_collector.score_cache_tier_hit(
+                tier, context_name, model_name, count=count)
+        for model_name, count in misses.items():
+            self.metrics_collector.score_cache_tier_miss(
+                tier, context_name, model_name, count=count)
+
+    @classmethod
+    def from_config(cls, config, name, section_key="score_caches"):
+        """
+        score_caches:
+            memory_lru:
+                class: ores.score_caches.LRU
+                size: 1024
+                ttl: 60
+            local_redis:
+                class: ores.score_caches.Redis
+                host: localhost
+            local_two_tier:
+                class: ores.score_caches.TwoTier
+                near: memory_lru
+                far: local_redis
+        """
+        logger.info("Loading TwoTier '{0}' from config.".format(name))
+        section = config[section_key][name]
+
+        near = ScoreCache.from_config(config, section['near'],
+                                      section_key=section_key)
+        far = ScoreCache.from_config(config, section['far'],
+                                     section_key=section_key)
+
+        return cls(near, far)
@@ -1,10 +1,12 @@
 import json
 
+from .tracing import Trace
+
 
 class ScoreRequest:
     def __init__(self, context_name, rev_ids, model_names, precache=False,
                  include_features=False, injection_caches=None,
-                 model_info=None, ip=None):
+                 model_info=None, ip=None, include_trace=False):
         """
         Construct a ScoreRequest from parameters.
 
@@ -24,6 +26,9 @@ class ScoreRequest:
                 cached data when extracting features/scoring.
             model_info : `list` ( `str` )
                 A list of model information fields to include in the response
+            include_trace : bool
+                If true, include the timing of each stage of scoring in the
+                response.  See :class:`ores.tracing.Trace`
         """
         self.context_name = context_name
         self.rev_ids = set(rev_ids)
@@ -33,6 +38,8 @@ class ScoreRequest:
         self.injection_caches = injection_caches or {}
         self.model_info = model_info
         self.ip = ip
+        self.include_trace = include_trace
+        self.trace = Trace()
 
     def __str__(self):
         return self.format()
@@ -57,6 +64,8 @@ class ScoreRequest:
             optional.append("model_info=" + json.dumps(self.model_info))
         if self.ip:
             optional.append("ip={0}".format(self.ip))
+        if self.include_trace:
+            optional.append("trace")
 
         return "{0}({1})".format(":".join(repr(v) for v in common),
                                  ", ".join(optional))
@@ -72,7 +81,8 @@ class ScoreRequest:
                 "include_features={0!r}".format(self.include_features),
                 "injection_caches={0!r}".format(self.injection_caches),
                 "ip={0!r}".format(self.ip),
-                "model_info={0!r}".format(self.model_info)]))
+                "model_info={0!r}".format(self.model_info),
+                "include_trace={0!r}".format(self.include_trace)]))
 
     def to_json(self):
         return {
@@ -1,16 +1,41 @@
+import concurrent.futures
+import functools
 import logging
-import multiprocessing
+import os
+import pickle
 import time
 from hashlib import sha1
 
+import stopit
 from revscoring import Model, dependencies
 from revscoring.dependencies import dig
+from revscoring.errors import CaughtDependencyError
 from revscoring.extractors import Extractor
 from revscoring.features import trim
 
+from . import model_metadata
+from .errors import TimeoutError
+from .model_cache import LazyModel, ModelCache
+from .util import timeout
+
 logger = logging.getLogger(__name__)
 
 
+def _timed_load(model_loader, config, key):
+    """
+    Loads a model in a worker process and returns it pickled along with how
+    long loading took.  Large buffers (e.g. numpy arrays) are sent out-of-band
+    so that unpickling them in the parent is little more than a copy.
+    """
+    start = time.time()
+    model = model_loader.load(config, key)
+    buffers = []
+    pickled = pickle.dumps(model, protocol=5, buffer_callback=buffers.append)
+    # bytearrays keep the unpickled arrays writable
+    return (pickled, [bytearray(buffer.raw()) for buffer in buffers],
+            time.time() - start)
+
+
 class ScoringContext(dict):
     """
     Represents a context in which scoring can take place.  Usually, a wiki is
@@ -28,16 +53,99 @@ class ScoringContext(dict):
            An extractor to use for gathering feature values
     """
 
+    LAZY_MODELS = True
+    """
+    Whether or not models can be loaded on demand.  See `map_from_config()`
+    """
+
     class ModelLoader:
         def load(self, config, key):
             return Model.from_config(config, key)
 
+        def size(self, config, key):
+            """
+            Estimates how much memory a model takes up by the size of its
+            model file.  Models that aren't loaded from a file count as 0.
+            """
+            section = config['scorer_models'][key]
+            if 'model_file' not in section:
+                return 0
+            return os.path.getsize(section['model_file'])
+
+        def load_many(self, config, keys, workers=None):
+            """
+            Loads models in parallel across a pool of `workers` processes
+            (one per CPU if None).
+
+            Reading and unpickling model files happens in the workers, and
+            only the pickled models are sent back.  At most `workers` models
+            are in flight at once and each is freed from its worker before
+            the next is sent, so peak memory is the loaded models plus about
+            two copies of `workers` models in transit.  With `workers=1`,
+            that's roughly the largest model twice.
+
+            :Returns:
+                A `dict` of keys and loaded models
+            """
+            keys = list(dict.fromkeys(keys))
+            if len(keys) == 0:
+                return {}
+            workers = min(workers or os.cpu_count(), len(keys))
+            logger.info("Loading {0} models with {1} processes"
+                        .format(len(keys), workers))
+
+            start = time.time()
+            models = {}
+            pending = iter(keys)
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                futures = {}
+
+                def submit_next():
+                    key = next(pending, None)
+                    if key is not None:
+                        futures[executor.submit(
+                            _timed_load, self, config, key)] = key
+
+                for _ in range(workers):
+                    submit_next()
+                while len(futures) > 0:
+                    done, _ = concurrent.futures.wait(
+                        futures,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        key = futures.pop(future)
+                        pickled, buffers, duration = future.result()
+                        models[key] = pickle.loads(pickled, buffers=buffers)
+                        del pickled, buffers
+                        logger.info("Loaded model {0} in {1} seconds"
+                                    .format(key, round(duration, 3)))
+                        submit_next()
+            logger.info("Loaded {0} models in {1} seconds"
+                        .format(len(keys), round(time.time() - start, 3)))
+            return models
+
     def __init__(self, name, model_map, extractor):
         super().__init__()
         self.name = str(name)
         self.update(model_map)
         self.extractor = extractor
 
+        # The dependency graph of a model never changes once it is loaded, so
+        # we only need to walk it once.
+        self._root_datasources = {}
+        self._base_features = {}
+
+    def prepare_dependency_plans(self):
+        """
+        Walks the dependency graph of each model ahead of time so that the
+        root datasources and base features needed for scoring don't need to
+        be worked out while handling requests.
+        """
+        for model_name in self.keys():
+            self.root_datasources([model_name])
+            self.base_features(model_name)
+        self.root_datasources(self.keys())
+
     def format_model_info(self, model_name, paths=None):
         model_info = self._get_model_info_for(model_name)
         return model_info.format(paths, formatting="json")
@@ -98,6 +206,136 @@ class ScoringContext(dict):
 
         return model_scores
 
+    def process_model_scores_batch(self, model_names, root_caches,
+                                   include_features=False, trace=None,
+                                   timeout=None):
+        """
+        Generates score maps for a set of models over many revisions at once.
+        Feature vectors are solved for each revision on its own and then each
+        model is asked to score all of them in one call (see `_score_many()`).
+
+        :Parameters:
+            model_names : `set` ( `str` )
+                A set of models to score
+            root_caches : `dict` ( `int` --> `dict` )
+                Root dependency caches by rev_id.  See
+                `extract_root_dependency_caches()`
+            include_features : `bool`
+                If True, include a map of basic features used in scoring along
+                with the model score.  If False, just generate the scores.
+            trace : :class:`ores.tracing.Trace`
+                If set, feature solving and prediction are recorded as spans
+            timeout : `float`
+                Seconds that solving the features of each revision may take
+
+        :Returns:
+            A tuple of score maps by rev_id and errors by rev_id.  A revision
+            that fails to solve its features or be scored by any model is
+            reported as an error.
+        """
+        model_names = sorted(model_names)
+        errors = {}
+
+        start = time.time()
+        rev_features = {}
+        for rev_id, root_cache in root_caches.items():
+            try:
+                rev_features[rev_id] = self._solve_with_timeout(
+                    model_names, root_cache, include_features, timeout)
+            except Exception as e:
+                errors[rev_id] = e
+        duration = time.time() - start
+        logger.debug("Extracted features for {0}:{1} x{2} in {3} secs"
+                     .format(self.name, set(model_names), len(rev_features),
+                             round(duration, 3)))
+        if trace is not None:
+            trace.add('solve_features', duration, model_names=model_names)
+
+        rev_scores = {rev_id: {} for rev_id in rev_features}
+        for model_name in model_names:
+            version = self[model_name].version
+            rev_ids = [rev_id for rev_id in rev_features
+                       if rev_id not in errors]
+
+            start = time.time()
+            scores = self._score_many(
+                model_name,
+                [rev_features[rev_id][model_name][0] for rev_id in rev_ids])
+            duration = time.time() - start
+            logger.debug("Scored features for {0}:{1}:{2} x{3} in {4} secs"
+                         .format(self.name, model_name, version, len(rev_ids),
+                                 round(duration, 3)))
+            if trace is not None:
+                trace.add('predict', duration, model_names=[model_name])
+
+            for rev_id, score in zip(rev_ids, scores):
+                if isinstance(score, Exception):
+                    errors[rev_id] = score
+                    continue
+                rev_scores[rev_id][model_name] = {'score': score}
+                if include_features:
+                    rev_scores[rev_id][model_name]['features'] = \
+                        rev_features[rev_id][model_name][1]
+
+        for rev_id in errors:
+            rev_scores.pop(rev_id, None)
+
+        return rev_scores, errors
+
+    def _solve_with_timeout(self, model_names, root_cache, include_features,
+                            seconds):
+        """
+        Solves the feature vector (and base feature map if `include_features`)
+        of each model for a revision within `seconds`.
+        """
+        def solve():
+            return {model_name: (
+                        self._solve_features(model_name, root_cache),
+                        self._solve_base_feature_map(
+                            model_name, dependency_cache=root_cache)
+                        if include_features else None)
+                    for model_name in model_names}
+
+        try:
+            return timeout(solve, seconds=seconds)
+        except CaughtDependencyError as e:
+            if isinstance(e.exception, stopit.TimeoutException):
+                raise TimeoutError("Timed out after {0} seconds."
+                                   .format(seconds))
+            raise
+
+    def _score_many(self, model_name, feature_vectors):
+        """
+        Scores many feature vectors with a model.  Models that implement
+        `score_many()` get all of the vectors in one call so that the
+        underlying estimator predicts on a single 2D array.  revscoring's
+        `score_many()` re-fits a model's scaler to its input, so models with a
+        scaler are scored one vector at a time.  If scoring the batch fails,
+        each vector is scored on its own.
+
+        :Returns:
+            A `list` with a score or the error that scoring raised for each
+            vector
+        """
+        model = self[model_name]
+        if len(feature_vectors) > 1 and hasattr(model, "score_many") and \
+           getattr(model, "scaler", None) is None:
+            try:
+                return model.score_many(feature_vectors)
+            except Exception as e:
+                logger.warning("Scoring {0}:{1} x{2} as a batch failed ({3}).  "
+                               .format(self.name, model_name,
+                                       len(feature_vectors), repr(e)) +
+                               "Scoring each revision on its own.")
+
+        scores = []
+        for feature_values in feature_vectors:
+            try:
+                scores.append(model.score(feature_values))
+            except Exception as e:
+                scores.append(e)
+        return scores
+
     def _solve_features(self, model_name, dependency_cache=None):
         """
         Solves the vector (`list`) of features for a given model using
@@ -112,7 +350,7 @@ class ScoringContext(dict):
         `model_name` using `dependency_cache`.  This will return a mapping
         between the `str` name of the base features and the solved values.
         """
-        features = list(trim(self[model_name].features))
+        features = self.base_features(model_name)
         feature_values = self.extractor.solve(features, cache=dependency_cache)
         return {str(f): v
                 for f, v in zip(features, feature_values)}
@@ -137,6 +375,27 @@ class ScoringContext(dict):
 
         return score
 
+    def base_features(self, model_name):
+        """
+        Returns the leaf :class:`revscoring.Feature` of a model.  The list is
+        computed once per model.
+        """
+        if model_name not in self._base_features:
+            self._base_features[model_name] = \
+                list(trim(self[model_name].features))
+        return self._base_features[model_name]
+
+    def root_datasources(self, model_names):
+        """
+        Returns the root :class:`revscoring.Datasource` that are needed to
+        score a set of models.  The list is computed once per set of models.
+        """
+        key = frozenset(model_names)
+        if key not in self._root_datasources:
+            self._root_datasources[key] = list(
+                dict.fromkeys(self._generate_root_datasources(key)))
+        return self._root_datasources[key]
+
     def _generate_root_datasources(self, model_names):
         for model_name in model_names:
             for dependency in dependencies.dig(self.model_features(model_name)):
@@ -164,8 +423,7 @@ class ScoringContext(dict):
             _injection_caches[rev_id] = dict(injection_cache.items())
 
         # Find our root datasources
-        root_datasources = \
-            list(set(self._generate_root_datasources(model_names)))
+        root_datasources = self.root_datasources(model_names)
 
         start = time.time()
         error_root_vals = self.extractor.extract(
@@ -189,15 +447,74 @@ class ScoringContext(dict):
         # Note that root_caches should have been modified in place
         return root_caches, errors
 
+    def extract_model_set_root_caches(self, model_set_revs,
+                                      injection_caches=None):
+        """
+        Extracts root dependency caches for several sets of models with a
+        single call to the extractor.  Root datasources shared between model
+        sets (e.g. revision text) are only requested once.  The caches are
+        then trimmed so that each revision only carries the root datasources
+        of its own model set.
+
+        :Parameters:
+            model_set_revs : `dict` ( `frozenset` --> `list` ( `int` ) )
+                A mapping of sets of model names to the revisions that need
+                to be scored with them
+            injection_caches : `dict` ( `int` --> `dict` )
+                Injection caches by rev_id
+
+        :Returns:
+            A tuple of root caches by rev_id and errors by rev_id.  See
+            `extract_root_dependency_caches()`
+        """
+        if len(model_set_revs) == 0:
+            return {}, {}
+
+        all_model_names = set().union(*model_set_revs.keys())
+        all_rev_ids = [rev_id for rev_ids in model_set_revs.values()
+                       for rev_id in rev_ids]
+        root_caches, errors = self.extract_root_dependency_caches(
+            all_model_names, all_rev_ids, injection_caches=injection_caches)
+
+        if len(model_set_revs) > 1:
+            all_root_datasources = \
+                set(self.root_datasources(all_model_names))
+            for model_set, rev_ids in model_set_revs.items():
+                unneeded = all_root_datasources - \
+                    set(self.root_datasources(model_set))
+                if len(unneeded) == 0:
+                    continue
+                for rev_id in rev_ids:
+                    if rev_id in root_caches:
+                        root_caches[rev_id] = {
+                            k: v for k, v in root_caches[rev_id].items()
+                            if k not in unneeded}
+
+        return root_caches, errors
+
     @classmethod
     def map_from_config(cls, config, context_names,
-                        section_key="scoring_contexts"):
+                        section_key="scoring_contexts", lazy_models=None,
+                        loading_workers=None):
         """
         Loads a whole set of ScoringContext's from a configuration file
         while maintaining a cache of model names.  This aids in better memory
         management and allows model aliases to be implemented at the
         configuration level.
 
+        :Parameters:
+            lazy_models : `dict`
+                If set, models are loaded the first time they are used rather
+                than up front.  Expects:
+
+                    max_memory: 4096  # MB of models to keep loaded
+                    preload:  # Loaded up front and never evicted
+                        - enwiki  # All of a context's models
+                        - "wikidatawiki:damaging"  # A single model
+            loading_workers : `int`
+                The number of processes to load models with.  If None, one
+                per CPU.
+
         :Returns:
             A map of context_names and ScoringContext's where models are loaded
             once and reused cross contexts.
@@ -206,20 +523,55 @@ class ScoringContext(dict):
         context_map = {}
         model_loader = cls.ModelLoader()
 
+        if lazy_models is not None and not cls.LAZY_MODELS:
+            logger.info("{0} doesn't support lazy_models.  Ignoring."
+                        .format(cls.__name__))
+            lazy_models = None
+        if lazy_models is not None:
+            model_cache = ModelCache(
+                functools.partial(model_loader.load, config),
+                functools.partial(model_loader.size, config),
+                max_memory=lazy_models.get('max_memory'))
+        else:
+            model_key_map.update(model_loader.load_many(
+                config,
+                (key for context_name in context_names
+                 for key in config[section_key][context_name]['scorer_models']
+                 .values()),
+                workers=loading_workers))
+
         for context_name in context_names:
             section = config[section_key][context_name]
             model_map = {}
             for model_name, key in section['scorer_models'].items():
-                if key in model_key_map:
-                    scorer_model = model_key_map[key]
-                else:
-                    scorer_model = model_loader.load(config, key)
-                    model_key_map[key] = scorer_model
-                model_map[model_name] = scorer_model
+                if key not in model_key_map:
+                    model_key_map[key] = LazyModel(model_cache, key)
+                model_map[model_name] = model_key_map[key]
 
             extractor = Extractor.from_config(config, section['extractor'])
             context_map[context_name] = cls(
                 context_name, model_map=model_map, extractor=extractor)
+            if lazy_models is None:
+                context_map[context_name].prepare_dependency_plans()
+
+        if lazy_models is not None:
+            preload_keys = []
+            for route in lazy_models.get('preload', []):
+                context_name, _, model_name = route.partition(":")
+                section = config[section_key][context_name]
+                model_names = [model_name] if model_name else \
+                    list(section['scorer_models'].keys())
+                preload_keys.extend(section['scorer_models'][model_name]
+                                    for model_name in model_names)
+            models = model_loader.load_many(
+                config, preload_keys, workers=loading_workers)
+            for key, model in models.items():
+                model_cache.pin(key, model=model)
+
+            for route in lazy_models.get('preload', []):
+                # Planning a whole context would load all of its models
+                if route in context_map:
+                    context_map[route].prepare_dependency_plans()
 
         return context_map
 
@@ -257,14 +609,16 @@ class ScoringContext(dict):
         section = config[section_key][name]
         model_loader = cls.ModelLoader()
 
-        model_map = {}
-        for model_name, key in section['scorer_models'].items():
-            scorer_model = model_loader.load(config, key)
-            model_map[model_name] = scorer_model
+        models = model_loader.load_many(
+            config, section['scorer_models'].values())
+        model_map = {model_name: models[key]
+                     for model_name, key in section['scorer_models'].items()}
 
         extractor = Extractor.from_config(config, section['extractor'])
 
-        return cls(name, model_map=model_map, extractor=extractor)
+        scoring_context = cls(name, model_map=model_map, extractor=extractor)
+        scoring_context.prepare_dependency_plans()
+        return scoring_context
 
 
 class ServerScoringContext(ScoringContext):
@@ -277,21 +631,10 @@ class ServerScoringContext(ScoringContext):
     access to basic scoring functionality.
     """
 
-    class ModelLoader:
-        def load_model_and_queue(self, q, config, key):
+    class ModelLoader(ScoringContext.ModelLoader):
+        def load(self, config, key):
             model = Model.from_config(config, key)
             model.info = None  # We don't need info on the server-side
-            q.put(model)
-
-        def load(self, config, key):
-            logger.warning("Loading model {0} with sub-process".format(key))
-            q = multiprocessing.Queue()
-            p = multiprocessing.Process(
-                target=self.load_model_and_queue, args=(q, config, key),
-                daemon=True)
-            p.start()
-            model = q.get()
-            p.join()
             return model
 
     def __init__(self, name, *args, **kwargs):
@@ -309,22 +652,37 @@ class ClientScoringContext(ScoringContext):
     informational functionality.
     """
 
-    class ModelLoader:
-        def load_model_and_queue(self, q, config, key):
-            model = Model.from_config(config, key)
-            # Just return the model info and the root of the features
-            q.put((model.info, list(dig(model.features))))
+    # Only model info and root features are loaded, and those are needed
+    # up front.
+    LAZY_MODELS = False
 
+    class ModelLoader(ScoringContext.ModelLoader):
         def load(self, config, key):
-            logger.warning("Loading model {0} with sub-process".format(key))
-            q = multiprocessing.Queue()
-            p = multiprocessing.Process(
-                target=self.load_model_and_queue, args=(q, config, key),
-                daemon=True)
-            p.start()
-            model_info, root_features = q.get()
-            p.join()
-            return model_info, root_features
+            model = Model.from_config(config, key)
+            # Just return the model info and the root of the features
+            return model.info, list(dig(model.features))
+
+        def load_many(self, config, keys, workers=None):
+            """
+            Reads metadata snapshots (see :mod:`ores.model_metadata`) where
+            they are fresh and only loads the other models in full.
+            """
+            keys = list(dict.fromkeys(keys))
+            directory = model_metadata.snapshot_dir(config)
+            models = {}
+            if directory is not None:
+                for key in keys:
+                    snapshot = model_metadata.read_snapshot(
+                        directory, config, key)
+                    if snapshot is not None:
+                        models[key] = (snapshot['info'],
+                                       snapshot['root_datasources'])
+                logger.info("Read {0} of {1} model metadata snapshots"
+                            .format(len(models), len(keys)))
+            models.update(super().load_many(
+                config, [key for key in keys if key not in models],
+                workers=workers))
+            return models
 
     def __init__(self, name, model_map, *args, **kwargs):
         logger.info("Loading {0} as a ClientScoringContext".format(name))
@@ -339,6 +697,12 @@ class ClientScoringContext(ScoringContext):
         self.features_map = {model_name: root_features
                              for model_name, (_, root_features) in model_map.items()}
 
+    def prepare_dependency_plans(self):
+        # Base features can't be found without the full models
+        for model_name in self.keys():
+            self.root_datasources([model_name])
+        self.root_datasources(self.keys())
+
     def _get_model_info_for(self, model_name):
         return self.info_map[model_name]
 
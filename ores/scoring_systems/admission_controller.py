@@ -0,0 +1,148 @@
+"""
+Admission control for queued scoring work.
+
+Requests are admitted based on the depth of the queue and on how long tasks
+have recently been waiting in it.  Precache requests are held to a fraction
+of the limits that apply to interactive requests so that they are shed first
+when the queue backs up.
+"""
+import logging
+import math
+import threading
+import time
+
+from ..errors import ScoreProcessorOverloaded
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRY_AFTER = 5  # seconds
+MAX_RETRY_AFTER = 60  # seconds
+
+
+class AdmissionController:
+    """
+    :Parameters:
+        get_queue_size : `callable`
+            Returns the number of tasks waiting in the queue
+        queue_maxsize : `int`
+            Interactive requests are rejected while more than this many tasks
+            are waiting
+        max_queue_wait : `float`
+            If set, interactive requests are rejected while tasks are
+            waiting longer than this many seconds in the queue
+        precache_fraction : `float`
+            Precache requests are rejected once the queue reaches this
+            fraction of the interactive limits
+        queue_size_ttl : `float`
+            Seconds to reuse a queue size before checking it again
+        workers : `int`
+            The number of tasks from the queue that are processed at once.
+            Used to estimate how long the queue takes to drain.
+        smoothing : `float`
+            The weight given to each new observation of task wait and service
+            time
+    """
+
+    def __init__(self, get_queue_size, queue_maxsize, max_queue_wait=None,
+                 precache_fraction=0.5, queue_size_ttl=1.0, workers=1,
+                 smoothing=0.2):
+        self.get_queue_size = get_queue_size
+        self.queue_maxsize = int(queue_maxsize)
+        self.max_queue_wait = float(max_queue_wait) \
+            if max_queue_wait is not None else None
+        self.precache_fraction = float(precache_fraction)
+        self.queue_size_ttl = float(queue_size_ttl)
+        self.workers = int(workers)
+        self.smoothing = float(smoothing)
+
+        self.lock = threading.Lock()
+        self._queue_size = None
+        self._queue_size_checked = None
+        self.wait_time = None
+        self.service_time = None
+
+    def queue_size(self):
+        """
+        Returns the number of tasks waiting in the queue.  The queue is only
+        checked once per `queue_size_ttl`.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self._queue_size is None or \
+               now - self._queue_size_checked >= self.queue_size_ttl:
+                self._queue_size = self.get_queue_size()
+                self._queue_size_checked = now
+            return self._queue_size
+
+    def enqueued(self, task_count):
+        """
+        Counts tasks that were just queued against the cached queue size so
+        that a burst of requests doesn't all get admitted on a stale size.
+        """
+        with self.lock:
+            if self._queue_size is not None:
+                self._queue_size += task_count
+
+    def observe(self, wait_time, service_time=None):
+        """
+        Records how long a task waited in the queue and how long it took to
+        process (if it finished).
+        """
+        with self.lock:
+            self.wait_time = self._smooth(self.wait_time, wait_time)
+            if service_time is not None:
+                self.service_time = self._smooth(
+                    self.service_time, service_time)
+
+    def _smooth(self, average, value):
+        if average is None:
+            return value
+        else:
+            return average + self.smoothing * (value - average)
+
+    def admit(self, request):
+        """
+        :Raises:
+            :class:`ores.errors.ScoreProcessorOverloaded` with a `retry_after`
+            if `request` should not be admitted
+        """
+        fraction = self.precache_fraction if request.precache else 1.0
+        queue_size = self.queue_size()
+        queue_limit = self.queue_maxsize * fraction
+        wait_time = self.wait_time
+
+        if queue_size > queue_limit:
+            message = "Queue size is too full {0}".format(queue_size)
+            retry_after = self._drain_time(queue_size, queue_limit)
+        elif self.max_queue_wait is not None and wait_time is not None and \
+                queue_size > 0 and wait_time > self.max_queue_wait * fraction:
+            # An empty queue means that the observed wait is stale
+            message = "Queue wait is too long {0} seconds".format(
+                round(wait_time, 3))
+            retry_after = wait_time - self.max_queue_wait * fraction
+        else:
+            return
+
+        retry_after = min(max(math.ceil(retry_after), 1), MAX_RETRY_AFTER)
+        logger.warning("{0}.  Rejecting {1} request."
+                       .format(message,
+                               "precache" if request.precache
+                               else "interactive"))
+        raise ScoreProcessorOverloaded(message, retry_after=retry_after)
+
+    def _drain_time(self, queue_size, queue_limit):
+        """
+        Estimates how long it will take for the queue to drop back under
+        `queue_limit`.  `workers` tasks take about `service_time` at once, so
+        the queue drains at roughly `workers / service_time` tasks per
+        second.  Until a task has finished, tasks at the back of the queue
+        have been waiting about `wait_time`, so the queue drains at roughly
+        `queue_size / wait_time` tasks per second.
+        """
+        excess = queue_size - queue_limit
+        if self.service_time is not None:
+            return excess * self.service_time / self.workers
+        elif self.wait_time is not None and queue_size > 0:
+            return excess * self.wait_time / queue_size
+        else:
+            return DEFAULT_RETRY_AFTER
@@ -0,0 +1,83 @@
+"""
+Adapters that expose the blocking IO interfaces used by
+:class:`ores.scoring_systems.ScoringSystem` as :mod:`asyncio` coroutines.
+
+Each adapter runs calls against the wrapped object in an executor (the event
+loop's default thread pool unless one is provided) so that the event loop is
+free to make progress on other requests while waiting on IO.
+"""
+import asyncio
+import functools
+
+
+async def run_in_executor(executor, func, *args, **kwargs):
+    """
+    Runs `func` in `executor` and awaits the result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(func, *args, **kwargs))
+
+
+class AsyncAdapter:
+    """
+    :Parameters:
+        wrapped : `object`
+            The blocking object to wrap
+        executor : :class:`concurrent.futures.Executor`
+            The executor to run blocking calls in.  If None, the event loop's
+            default executor is used.
+    """
+
+    def __init__(self, wrapped, executor=None):
+        self.wrapped = wrapped
+        self.executor = executor
+
+    def _run(self, func, *args, **kwargs):
+        return run_in_executor(self.executor, func, *args, **kwargs)
+
+
+class AsyncScoreCache(AsyncAdapter):
+    """
+    Wraps a :class:`ores.score_caches.ScoreCache`
+    """
+
+    async def lookup_many(self, context_name, lookups):
+        return await self._run(self.wrapped.lookup_many, context_name,
+                               lookups)
+
+    async def store_many(self, context_name, stores):
+        return await self._run(self.wrapped.store_many, context_name, stores)
+
+
+class AsyncTaskTracker(AsyncAdapter):
+    """
+    Wraps a :class:`ores.task_tracker.TaskTracker`
+    """
+
+    async def lock(self, key, task_id):
+        return await self._run(self.wrapped.lock, key, task_id)
+
+    async def get_in_progress_task(self, key):
+        return await self._run(self.wrapped.get_in_progress_task, key)
+
+    async def release(self, key):
+        return await self._run(self.wrapped.release, key)
+
+
+class AsyncExtractor(AsyncAdapter):
+    """
+    Wraps the extraction side of a :class:`ores.scoring_context.ScoringContext`
+    """
+
+    async def extract_root_dependency_caches(self, model_names, rev_ids,
+                                             injection_caches=None):
+        return await self._run(
+            self.wrapped.extract_root_dependency_caches, model_names, rev_ids,
+            injection_caches=injection_caches)
+
+    async def extract_model_set_root_caches(self, model_set_revs,
+                                            injection_caches=None):
+        return await self._run(
+            self.wrapped.extract_model_set_root_caches, model_set_revs,
+            injection_caches=injection_caches)
@@ -1,17 +1,30 @@
+import asyncio
+import functools
 import logging
+import math
+import os
 import re
+import time
+from collections import Counter
 from itertools import chain
 from urllib.parse import urlparse
 
 import celery
 import celery.exceptions
+import celery.result
 import celery.states
+import kombu
 import mwapi.errors
 import revscoring.errors
 from ores.score_request import ScoreRequest
 
 from .. import errors
+from ..root_cache_store import RedisRootCacheStore
+from ..root_cache_store.root_cache_store import is_reference
 from ..task_tracker import NullTaskTracker, RedisTaskTracker
+from ..util import split_evenly
+from .admission_controller import AdmissionController
+from .async_adapters import AsyncTaskTracker, run_in_executor
 from .scoring_system import ScoringSystem
 
 logger = logging.getLogger(__name__)
@@ -21,25 +34,112 @@ _applications = []
 DEFAULT_CELERY_QUEUE = "celery"
 SENT = "SENT"
 REQUESTED = "REQUESTED"
+TRACKED_BATCH_SEPARATOR = "#"
 
 
 class CeleryQueue(ScoringSystem):
+    """
+    A scoring system that generates scores in celery workers.  Revisions that
+    are missing the same set of models are sent to the workers in batches.
+
+    :Parameters:
+        application : :class:`celery.Celery`
+            The celery application to send tasks through
+        precache_queue : `str`
+            If set, tasks for precache requests are sent to this queue so
+            that they don't wait in front of interactive requests.  Workers
+            don't consume it unless they are told to (see `worker_queues`),
+            so run a separate pool of workers for it, e.g. `ores celery
+            --queues=<precache_queue>`.
+        queue_routes : `dict` ( `str` --> `str` )
+            Sends tasks for a context (e.g. "enwiki") or for a model in a
+            context (e.g. "enwiki:damaging") to a queue other than the
+            default.  Like `precache_queue`, these queues need workers that
+            are told to consume them.
+        worker_queues : `list` ( `str` )
+            The queues that workers consume unless they are given some with
+            `--queues` (or `celery worker -Q`).  Defaults to the default
+            queue only.
+        queue_maxsize : `int`
+            If set, requests are rejected while more than this many tasks are
+            waiting in a queue that they would send tasks to.  See
+            :class:`ores.scoring_systems.admission_controller.AdmissionController`
+        max_queue_wait : `float`
+            If set, requests are rejected while tasks are waiting longer than
+            this many seconds in the queue
+        precache_fraction : `float`
+            Precache requests are rejected once the queue reaches this
+            fraction of `queue_maxsize` and `max_queue_wait`
+        queue_size_ttl : `float`
+            Seconds to reuse a queue size before checking it again
+        task_tracker : :class:`ores.task_tracker.TaskTracker`
+            Tracks in-progress tasks so that identical work isn't queued twice
+        batch_size : `int`
+            The maximum number of revisions to send in a single task.  Each
+            set of missing models is also spread over up to
+            `worker_concurrency` tasks so that a large request keeps all of a
+            worker's processes busy.
+        root_cache_store : :class:`ores.root_cache_store.RootCacheStore`
+            If set, root caches are written to this store and tasks only
+            carry a reference to them.  Workers must be configured with the
+            same store.  Root caches are kept until their task would be past
+            its deadline.
+    """
 
-    def __init__(self, *args, application, queue_maxsize=None,
-                 task_tracker=None, **kwargs):
+    def __init__(self, *args, application, precache_queue=None,
+                 queue_routes=None, worker_queues=None, queue_maxsize=None,
+                 max_queue_wait=None,
+                 precache_fraction=None, queue_size_ttl=None,
+                 task_tracker=None, batch_size=None, root_cache_store=None,
+                 **kwargs):
         super().__init__(*args, **kwargs)
         global _applications
         self.application = application
+        self.precache_queue = precache_queue
+        self.queue_routes = dict(queue_routes or {})
         self.queue_maxsize = int(queue_maxsize) if queue_maxsize is not None \
                              else None
+        self.batch_size = int(batch_size) if batch_size is not None else None
+        self.max_queue_wait = float(max_queue_wait) \
+            if max_queue_wait is not None else None
+        self.root_cache_store = root_cache_store
 
         self.redis = redis_from_url(self.application.conf.BROKER_URL)
 
         self.task_tracker = task_tracker or NullTaskTracker()
+        self.async_task_tracker = AsyncTaskTracker(self.task_tracker)
 
         if self.queue_maxsize is not None and self.redis is None:
             logger.warning("No redis connection.  Can't check queue size")
 
+        self.queues = {DEFAULT_CELERY_QUEUE} | set(self.queue_routes.values())
+        if self.precache_queue is not None:
+            self.queues.add(self.precache_queue)
+        self.worker_queues = list(worker_queues or [DEFAULT_CELERY_QUEUE])
+        if self.application.conf.task_queues is None:
+            # Workers that aren't told which queues to consume (-Q) consume
+            # the declared ones.  They are declared the same way celery
+            # declares the default queue, and queues that tasks are sent to
+            # but that aren't declared are created as they are needed.
+            self.application.conf.task_queues = [
+                kombu.Queue(queue, kombu.Exchange(queue), queue)
+                for queue in self.worker_queues]
+
+        # Backpressure is applied per queue
+        self.admission_controllers = {}
+        if self.queue_maxsize is not None and self.redis is not None:
+            for queue in self.queues:
+                self.admission_controllers[queue] = AdmissionController(
+                    functools.partial(self._queue_size, queue),
+                    self.queue_maxsize,
+                    max_queue_wait=max_queue_wait,
+                    precache_fraction=precache_fraction
+                    if precache_fraction is not None else 0.5,
+                    queue_size_ttl=queue_size_ttl
+                    if queue_size_ttl is not None else 1.0,
+                    workers=self.application.conf.worker_concurrency or
+                    os.cpu_count())
+
         self._initialize_tasks()
 
         _applications.append(application)
@@ -51,7 +151,8 @@ class CeleryQueue(ScoringSystem):
                            revscoring.errors.DependencyError,
                            mwapi.errors.RequestError,
                            mwapi.errors.TimeoutError,
-                           errors.TimeoutError)
+                           errors.TimeoutError,
+                           errors.RootCacheExpired)
 
         @self.application.task(throws=expected_errors,
                                queue=DEFAULT_CELERY_QUEUE)
@@ -72,7 +173,99 @@ class CeleryQueue(ScoringSystem):
                         .format(request.format(rev_id, model_names)))
             return score_map
 
+        @self.application.task(throws=expected_errors,
+                               queue=DEFAULT_CELERY_QUEUE)
+        def _process_score_map_batch(request, model_names, rev_root_caches):
+            if not isinstance(request, ScoreRequest):
+                request = ScoreRequest.from_json(request)
+
+            if not isinstance(model_names, frozenset):
+                model_names = frozenset(model_names)
+
+            root_caches = {rev_id: root_cache for rev_id, root_cache
+                           in self._load_root_caches(rev_root_caches)}
+            logger.info("Generating score maps for {0}:{1} x{2}"
+                        .format(request.context_name, set(model_names),
+                                len(root_caches)))
+
+            start = time.time()
+            rev_scores, rev_errors = ScoringSystem._process_score_maps(
+                self, request, model_names, root_caches)
+            logger.info("Completed generating score maps for {0}:{1} x{2}"
+                        .format(request.context_name, set(model_names),
+                                len(root_caches)))
+            return self._format_batch_result(
+                rev_scores, rev_errors, duration=time.time() - start,
+                spans=request.trace.spans)
+
         self._process_score_map = _process_score_map
+        # Not `_process_score_maps` since that would shadow the method
+        self._process_score_map_batch = _process_score_map_batch
+
+    def _format_batch_result(self, rev_scores, rev_errors, duration=None,
+                             spans=None):
+        """
+        Converts the output of a batch into something that can be stored in
+        the result backend.  Revision IDs are kept in lists of pairs so that
+        they stay `int` through JSON.  `duration` is the time the worker
+        spent on the batch and `spans` are the worker's part of the request's
+        :class:`ores.tracing.Trace`.
+        """
+        backend = self.application.backend
+        return {
+            'scores': [[rev_id, score_map]
+                       for rev_id, score_map in rev_scores.items()],
+            'errors': [[rev_id, backend.prepare_exception(error)]
+                       for rev_id, error in rev_errors.items()],
+            'duration': duration,
+            'spans': spans or []}
+
+    def _read_batch_result(self, task_result):
+        """
+        The inverse of :meth:`_format_batch_result`
+        """
+        backend = self.application.backend
+        rev_scores = {rev_id: score_map
+                      for rev_id, score_map in task_result['scores']}
+        rev_errors = {rev_id: backend.exception_to_python(error)
+                      for rev_id, error in task_result['errors']}
+        return rev_scores, rev_errors
+
+    def _load_root_caches(self, rev_root_caches):
+        if not is_reference(rev_root_caches):
+            return rev_root_caches
+        elif self.root_cache_store is None:
+            raise RuntimeError("Received a root cache reference, but no " +
+                               "root_cache_store is configured")
+        else:
+            return self.root_cache_store.load(rev_root_caches)
+
+    def _root_cache_ttl(self, batch_size):
+        """
+        Root caches are needed until the task that reads them is past its
+        deadline: it may wait in the queue for up to `max_queue_wait` (or
+        as long as the batch may run) and then run for as long as the batch
+        may take.
+        """
+        batch_timeout = self._batch_timeout(batch_size)
+        if batch_timeout is None:
+            return None
+        queue_wait = self.max_queue_wait \
+            if self.max_queue_wait is not None else batch_timeout
+        return math.ceil(queue_wait + batch_timeout)
+
+    def _batch_rev_ids(self, rev_ids):
+        """
+        Splits the revisions for a set of models into batches.  Batches are
+        no bigger than `batch_size` and there are at least as many of them as
+        the workers can run at once (up to one per revision).
+        """
+        concurrency = self.application.conf.worker_concurrency or \
+            os.cpu_count()
+        parts = min(len(rev_ids), concurrency)
+        if self.batch_size is not None:
+            parts = max(parts, math.ceil(len(rev_ids) / self.batch_size))
+        return split_evenly(rev_ids, parts)
 
     def _process_missing_scores(self, request, missing_model_set_revs,
                                 root_caches, inprogress_results=None):
@@ -84,51 +277,92 @@ class CeleryQueue(ScoringSystem):
 
         # Generate score results
         results = {}
+        batch_sizes = {}
+        sent_tasks = {}
         for missing_models, rev_ids in missing_model_set_revs.items():
+            batch_rev_ids = []
             for rev_id in rev_ids:
-                injection_cache = request.injection_caches.get(rev_id)
-                if rev_id not in root_caches:
-                    for model_name in missing_models:
-                        task_id = context.format_id_string(
-                            model_name, rev_id, request,
-                            injection_cache=injection_cache)
-                        self.application.backend.mark_as_failure(
-                            task_id, RuntimeError("Never started"))
+                if rev_id in root_caches:
+                    batch_rev_ids.append(rev_id)
                     continue
-                root_cache = {str(k): v for k, v in root_caches[rev_id].items()}
-                result = self._process_score_map.delay(
-                    request.to_json(), list(missing_models), rev_id, root_cache)
-                self._lock_process(missing_models, rev_id, request,
-                                   injection_cache, result.id)
-
+                injection_cache = request.injection_caches.get(rev_id)
                 for model_name in missing_models:
-                    if rev_id in results:
-                        results[rev_id][model_name] = result
-                    else:
-                        results[rev_id] = {model_name: result}
+                    task_id = context.format_id_string(
+                        model_name, rev_id, request,
+                        injection_cache=injection_cache)
+                    self.application.backend.mark_as_failure(
+                        task_id, RuntimeError("Never started"))
+            if len(batch_rev_ids) == 0:
+                continue
+
+            queue = self._queue_for(request, missing_models)
+            enqueue_start = time.perf_counter()
+            for batch in self._batch_rev_ids(batch_rev_ids):
+                rev_root_caches = [
+                    [rev_id, {str(k): v for k, v in root_caches[rev_id].items()}]
+                    for rev_id in batch]
+                if self.root_cache_store is not None:
+                    rev_root_caches = self.root_cache_store.store(
+                        rev_root_caches,
+                        ttl=self._root_cache_ttl(len(batch)))
+                result = self._process_score_map_batch.apply_async(
+                    (request.to_json(), list(missing_models), rev_root_caches),
+                    queue=queue)
+                batch_sizes[result.id] = len(batch)
+                sent_tasks[result.id] = (queue, time.time())
+
+                for rev_id in batch:
+                    injection_cache = request.injection_caches.get(rev_id)
+                    self._lock_process(missing_models, rev_id, request,
+                                       injection_cache, result.id,
+                                       batch_size=len(batch))
+                    results[rev_id] = {model_name: result
+                                       for model_name in missing_models}
+            request.trace.add('enqueue', time.perf_counter() - enqueue_start,
+                              model_names=missing_models, start=enqueue_start)
+
+        for queue, task_count in Counter(
+                queue for queue, _ in sent_tasks.values()).items():
+            if queue in self.admission_controllers:
+                self.admission_controllers[queue].enqueued(task_count)
+
+        # Read results.  Every distinct task is waited on once, all at the
+        # same time, against a single deadline for the whole request.
+        # Batches run in parallel, so the deadline is set by the biggest one,
+        # including batches that other requests sent.
+        combined_results = list(
+            chain(inprogress_results.items(), results.items()))
+        score_results = {}
+        task_rev_ids = {}
+        for rev_id, model_results in combined_results:
+            for score_result in model_results.values():
+                score_results[score_result.id] = score_result
+                task_rev_ids[score_result.id] = rev_id
+                batch_sizes.setdefault(
+                    score_result.id, getattr(score_result, 'batch_size', 1))
+        task_results = self._wait_for_tasks(
+            score_results, task_rev_ids,
+            self._batch_timeout(max(batch_sizes.values(), default=1)),
+            sent_tasks=sent_tasks, trace=request.trace)
 
-        # Read results
         rev_scores = {}
         score_errors = {}
-        combined_results = chain(inprogress_results.items(), results.items())
         for rev_id, model_results in combined_results:
             injection_cache = request.injection_caches.get(rev_id)
             if rev_id not in rev_scores:
                 rev_scores[rev_id] = {}
             for model_name, score_result in model_results.items():
-                try:
-                    task_result = score_result.get(timeout=self.timeout)
-                except celery.exceptions.TimeoutError:
-                    timeout_error = errors.TimeoutError(
-                        "Timed out after {0} seconds.".format(self.timeout))
-                    score_errors[rev_id] = timeout_error
-                    self.application.backend.mark_as_failure(
-                        score_result.id, timeout_error)
-                except Exception as error:
-                    score_errors[rev_id] = error
+                task_scores, task_errors, task_error = \
+                    task_results[score_result.id]
+
+                if task_error is not None:
+                    score_errors[rev_id] = task_error
+                elif rev_id in task_errors:
+                    score_errors[rev_id] = task_errors[rev_id]
                 else:
-                    if model_name in task_result:
-                        rev_scores[rev_id][model_name] = task_result[model_name]
+                    if model_name in task_scores.get(rev_id, {}):
+                        rev_scores[rev_id][model_name] = \
+                            task_scores[rev_id][model_name]
                     else:
                         raise RuntimeError('Model is not in the task but '
                                            'the task locked the model')
@@ -140,19 +374,161 @@ class CeleryQueue(ScoringSystem):
 
         return rev_scores, score_errors
 
+    def _wait_for_tasks(self, score_results, task_rev_ids, timeout,
+                        sent_tasks=None, trace=None):
+        """
+        Waits up to `timeout` seconds for all of `score_results` to finish.
+        Result backends that support it (e.g. redis) are listened to for
+        all of the tasks at once rather than polled one task at a time.
+        Tasks in `sent_tasks` that don't finish in time are marked as failed.
+        Other tasks belong to other requests, which wait on them with their
+        own deadlines.
+
+        :Parameters:
+            score_results : `dict` ( `str` --> :class:`celery.result.AsyncResult` )
+                Results to wait for by task ID
+            task_rev_ids : `dict` ( `str` --> `int` )
+                A rev_id that each task was scoring.  See
+                :meth:`_read_task_result`
+            timeout : `float`
+                Seconds to wait for all of the tasks
+            sent_tasks : `dict` ( `str` --> ( `str`, `float` ) )
+                The queue that each task this request sent went to and when.
+                Used to observe how long tasks wait in their queue.
+            trace : :class:`ores.tracing.Trace`
+                If set, the queue wait and worker spans of the tasks this
+                request sent are added to it
+
+        :Returns:
+            A `dict` of task ID --> tuple of scores by rev_id, errors by rev_id
+            and an error for the task as a whole (or None)
+        """
+        task_results = {}
+        if len(score_results) == 0:
+            return task_results
+
+        sent_tasks = sent_tasks or {}
+
+        def on_result(task_id, value):
+            if task_id in sent_tasks:
+                queue, sent = sent_tasks[task_id]
+                self._observe_task(queue, time.time() - sent, value,
+                                   trace=trace)
+            task_results[task_id] = self._read_task_result(
+                value, task_rev_ids[task_id])
+
+        result_set = celery.result.ResultSet(list(score_results.values()))
+        try:
+            if result_set.supports_native_join:
+                result_set.join_native(
+                    timeout=timeout, propagate=False, callback=on_result)
+            else:
+                result_set.join(
+                    timeout=timeout, propagate=False, callback=on_result)
+        except celery.exceptions.TimeoutError:
+            pass
+
+        for task_id in score_results.keys() - task_results.keys():
+            timeout_error = errors.TimeoutError(
+                "Timed out after {0} seconds.".format(timeout))
+            task_results[task_id] = ({}, {}, timeout_error)
+            if task_id in sent_tasks:
+                self.application.backend.mark_as_failure(
+                    task_id, timeout_error)
+                queue, sent = sent_tasks[task_id]
+                if queue in self.admission_controllers:
+                    # It waited at least this long
+                    self.admission_controllers[queue].observe(
+                        time.time() - sent)
+
+        return task_results
+
+    def _observe_task(self, queue, turnaround, task_result, trace=None):
+        """
+        Splits the time between sending a batch to `queue` and getting its
+        result into time spent waiting in the queue and time spent scoring.
+        """
+        if not isinstance(task_result, dict) or \
+           task_result.get('duration') is None:
+            return
+        service_time = task_result['duration']
+        wait_time = max(turnaround - service_time, 0)
+        if trace is not None:
+            trace.add('queue_wait', wait_time)
+            trace.extend(task_result.get('spans', []))
+        if queue in self.admission_controllers:
+            self.admission_controllers[queue].observe(wait_time, service_time)
+
+    def _read_task_result(self, task_result, rev_id):
+        """
+        Reads the value of a finished task.  `rev_id` is the revision that a
+        per-revision `_process_score_map` task (e.g. one that was still in
+        progress from before batching) was scoring.
+
+        :Returns:
+            A tuple of scores by rev_id, errors by rev_id and an error for the
+            task as a whole (or None)
+        """
+        if isinstance(task_result, BaseException):
+            return {}, {}, task_result
+        elif 'scores' in task_result and 'errors' in task_result:
+            rev_scores, rev_errors = self._read_batch_result(task_result)
+            return rev_scores, rev_errors, None
+        else:
+            return {rev_id: task_result}, {}, None
+
     def _lock_process(self, models, rev_id, request, injection_cache,
-                      task_id):
+                      task_id, batch_size=None):
         context = self[request.context_name]
+        value = self._format_tracked_task(task_id, batch_size)
         for model in models:
             key = context.format_id_string(
                     model, rev_id, request,
                     injection_cache=injection_cache)
-            self.task_tracker.lock(key, task_id)
+            self.task_tracker.lock(key, value)
+
+    @staticmethod
+    def _format_tracked_task(task_id, batch_size=None):
+        """
+        Formats the value kept in the task tracker for a task.  The size of
+        a batch is kept with its task ID so that other requests that find it
+        in progress know how long it may take.
+        """
+        if batch_size is None:
+            return task_id
+        else:
+            return "{0}{1}{2}".format(task_id, TRACKED_BATCH_SEPARATOR,
+                                      batch_size)
+
+    @staticmethod
+    def _parse_tracked_task(value):
+        """
+        The inverse of :meth:`_format_tracked_task`
+
+        :Returns:
+            A tuple of task ID and batch size.  Per-revision tasks have a
+            batch size of 1.
+        """
+        task_id, _, batch_size = value.partition(TRACKED_BATCH_SEPARATOR)
+        return task_id, int(batch_size or 1)
 
     def _lookup_inprogress_results(self, request, response):
+        keys = self._inprogress_keys(request, response)
+        task_ids = [self.task_tracker.get_in_progress_task(key)
+                    for _, _, key in keys]
+        return self._build_inprogress_results(keys, task_ids)
+
+    async def _lookup_inprogress_results_async(self, request, response):
+        keys = self._inprogress_keys(request, response)
+        task_ids = await asyncio.gather(
+            *(self.async_task_tracker.get_in_progress_task(key)
+              for _, _, key in keys))
+        return self._build_inprogress_results(keys, task_ids)
+
+    def _inprogress_keys(self, request, response):
         context = self[request.context_name]
 
-        inprogress_results = {}
+        keys = []
         for rev_id in request.rev_ids:
             injection_cache = request.injection_caches.get(rev_id)
 
@@ -164,16 +540,25 @@ class CeleryQueue(ScoringSystem):
                 key = context.format_id_string(
                     model_name, rev_id, request,
                     injection_cache=injection_cache)
-                task_id = self.task_tracker.get_in_progress_task(key)
-                if task_id:
-                    score_result = \
-                        self._process_score_map.AsyncResult(task_id)
-                    logger.info("Found in-progress result for {0} -- {1}"
-                                .format(task_id, score_result.state))
-                    if rev_id in inprogress_results:
-                        inprogress_results[rev_id][model_name] = score_result
-                    else:
-                        inprogress_results[rev_id] = {model_name: score_result}
+                keys.append((rev_id, model_name, key))
+
+        return keys
+
+    def _build_inprogress_results(self, keys, task_ids):
+        inprogress_results = {}
+        for (rev_id, model_name, _), value in zip(keys, task_ids):
+            if value:
+                task_id, batch_size = self._parse_tracked_task(value)
+                score_result = \
+                    self._process_score_map.AsyncResult(task_id)
+                # Sizes the wait for this task.  See _process_missing_scores.
+                score_result.batch_size = batch_size
+                logger.info("Found in-progress result for {0} -- {1}"
+                            .format(task_id, score_result.state))
+                if rev_id in inprogress_results:
+                    inprogress_results[rev_id][model_name] = score_result
+                else:
+                    inprogress_results[rev_id] = {model_name: score_result}
 
         return inprogress_results
 
@@ -190,22 +575,56 @@ class CeleryQueue(ScoringSystem):
                     self.application.backend.store_result(
                         task_id, {}, REQUESTED)
 
-    def _score(self, *args, **kwargs):
-        self._check_queue_full()
-        return super()._score(*args, **kwargs)
-
-    def _check_queue_full(self):
-        # Check redis to see if the queue of waiting tasks is too big.
-        # This is a hack to implement backpressure because celery doesn't
-        # support it natively.
-        # This will result in a race condition, but it should have OK
-        # properties.
-        if self.redis is not None and self.queue_maxsize is not None:
-            queue_size = self.redis.llen(DEFAULT_CELERY_QUEUE)
-            if queue_size > self.queue_maxsize:
-                message = "Queue size is too full {0}".format(queue_size)
-                logger.warning(message)
-                raise errors.ScoreProcessorOverloaded(message)
+    def _generate_missing_scores(self, request, response,
+                                 missing_model_set_revs, *args, **kwargs):
+        if len(missing_model_set_revs) > 0:
+            self._admit(request, missing_model_set_revs)
+        return super()._generate_missing_scores(
+            request, response, missing_model_set_revs, *args, **kwargs)
+
+    async def _generate_missing_scores_async(self, request, response,
+                                             missing_model_set_revs, *args,
+                                             **kwargs):
+        if len(missing_model_set_revs) > 0:
+            await run_in_executor(
+                None, self._admit, request, missing_model_set_revs)
+        return await super()._generate_missing_scores_async(
+            request, response, missing_model_set_revs, *args, **kwargs)
+
+    async def _process_missing_scores_async(self, *args, **kwargs):
+        # Waiting on celery results blocks, so do it off of the event loop.
+        # Scoring itself happens in the celery workers.
+        return await run_in_executor(
+            None, self._process_missing_scores, *args, **kwargs)
+
+    def _admit(self, request, missing_model_set_revs):
+        # Only requests that will queue new tasks are checked, and only
+        # against the queues that they will use.  Requests that can be
+        # answered from the cache or from tasks that are already in progress
+        # don't add to the backlog.
+        queues = {self._queue_for(request, model_names)
+                  for model_names in missing_model_set_revs}
+        for queue in sorted(queues):
+            if queue in self.admission_controllers:
+                self.admission_controllers[queue].admit(request)
+
+    def _queue_for(self, request, model_names):
+        """
+        Chooses the queue to send a task for `model_names` to.
+        """
+        if request.precache and self.precache_queue is not None:
+            return self.precache_queue
+        for model_name in sorted(model_names):
+            route = "{0}:{1}".format(request.context_name, model_name)
+            if route in self.queue_routes:
+                return self.queue_routes[route]
+        return self.queue_routes.get(request.context_name,
+                                     DEFAULT_CELERY_QUEUE)
+
+    def _queue_size(self, queue):
+        # Check redis to see how many tasks are waiting.  This is a hack to
+        # implement backpressure because celery doesn't support it natively.
+        return self.redis.llen(queue)
 
     @classmethod
     def from_config(cls, config, name, section_key="scoring_systems"):
@@ -222,7 +641,14 @@ class CeleryQueue(ScoringSystem):
 
         kwargs = cls._kwargs_from_config(
             config, name, section_key=section_key, ScoringContextClass=ScoringContextClass)
+        precache_queue = section.get('precache_queue')
+        queue_routes = section.get('queue_routes')
+        worker_queues = section.get('worker_queues')
         queue_maxsize = section.get('queue_maxsize')
+        max_queue_wait = section.get('max_queue_wait')
+        precache_fraction = section.get('precache_fraction')
+        queue_size_ttl = section.get('queue_size_ttl')
+        batch_size = section.get('batch_size')
 
         if 'task_tracker' in section:
             task_tracker = RedisTaskTracker.from_config(
@@ -230,16 +656,37 @@ class CeleryQueue(ScoringSystem):
         else:
             task_tracker = None
 
+        if 'root_cache_store' in section:
+            root_cache_store = RedisRootCacheStore.from_config(
+                config, section['root_cache_store'])
+        else:
+            root_cache_store = None
+
         application = celery.Celery(__name__)
         application.conf.update(**{k: v for k, v in section.items()
                                    if k not in ('class', 'context_map',
                                                 'score_cache',
                                                 'metrics_collector', 'timeout',
-                                                'queue_maxsize')})
+                                                'precache_queue',
+                                                'queue_routes',
+                                                'worker_queues',
+                                                'queue_maxsize',
+                                                'max_queue_wait',
+                                                'precache_fraction',
+                                                'queue_size_ttl', 'batch_size',
+                                                'root_cache_store',
+                                                'lazy_models',
+                                                'model_loading_workers')})
 
         return cls(application=application,
+                   precache_queue=precache_queue, queue_routes=queue_routes,
+                   worker_queues=worker_queues,
                    queue_maxsize=queue_maxsize,
-                   task_tracker=task_tracker, **kwargs)
+                   max_queue_wait=max_queue_wait,
+                   precache_fraction=precache_fraction,
+                   queue_size_ttl=queue_size_ttl,
+                   task_tracker=task_tracker, batch_size=batch_size,
+                   root_cache_store=root_cache_store, **kwargs)
 
 
 PASS_HOST_PORT = re.compile(
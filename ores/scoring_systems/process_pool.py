@@ -1,55 +1,254 @@
+import asyncio
+import atexit
 import logging
+import os
+import threading
 from concurrent import futures as cfutures
+from concurrent.futures.process import BrokenProcessPool
 
 from ..errors import TimeoutError
+from ..util import split_evenly
 from .scoring_system import ScoringSystem
 
 logger = logging.getLogger(__name__)
 
+_worker_scoring_system = None
+"""
+The :class:`ores.scoring_systems.ProcessPool` that a worker process was
+initialized with.  Set once per worker so that models stay loaded between
+tasks.
+"""
+
+
+def _initialize_worker(scoring_system):
+    global _worker_scoring_system
+    _worker_scoring_system = scoring_system
+
+
+def _process_score_maps(request, model_names, root_caches):
+    rev_scores, rev_errors = _worker_scoring_system._process_score_maps(
+        request, model_names, root_caches)
+    # The request's trace starts over in the worker
+    return rev_scores, rev_errors, request.trace.spans
+
 
 class ProcessPool(ScoringSystem):
+    """
+    A scoring system that generates scores in a long-lived pool of worker
+    processes.  The pool is started on first use and reused between requests
+    so that workers keep their models loaded.
+
+    :Parameters:
+        workers : `int`
+            The number of worker processes to run (defaults to the number of
+            CPUs)
+        max_tasks_per_worker : `int`
+            If set, the pool is recycled once it has processed this many
+            tasks per worker.  This bounds memory growth in long-running
+            workers.
+    """
 
-    def __init__(self, *args, workers=None, **kwargs):
+    def __init__(self, *args, workers=None, max_tasks_per_worker=None,
+                 **kwargs):
         super().__init__(*args, **kwargs)
         self.workers = int(workers) if workers is not None else None
+        self.max_tasks_per_worker = int(max_tasks_per_worker) \
+            if max_tasks_per_worker is not None else None
+
+        self._executor = None
+        self._executor_pid = None
+        self._executor_tasks = 0
+        self._executor_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def __getstate__(self):
+        # The pool itself can't travel to the workers
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_executor_pid'] = None
+        state['_executor_lock'] = None
+        state['single_flight'] = None
+        return state
+
+    def _get_executor(self, task_count):
+        """
+        Returns the running executor (starting a new one if necessary) and
+        reserves `task_count` tasks against its recycling budget.
+        """
+        with self._executor_lock:
+            if self._executor is not None and \
+               self._executor_pid != os.getpid():
+                # We've been forked (e.g. by a pre-forking web server).  The
+                # parent's pool is unusable from here.
+                self._executor = None
+
+            if self._executor is not None and \
+               self.max_tasks_per_worker is not None and \
+               self._executor_tasks >= self._max_pool_tasks():
+                logger.info("Recycling process pool after {0} tasks"
+                            .format(self._executor_tasks))
+                # Pending futures still complete, but no new work is accepted
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+            if self._executor is None:
+                logger.info("Starting a process pool with {0} workers"
+                            .format(self.workers or os.cpu_count()))
+                self._executor = cfutures.ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_initialize_worker,
+                    initargs=(self,))
+                self._executor_pid = os.getpid()
+                self._executor_tasks = 0
+
+            self._executor_tasks += task_count
+            return self._executor
+
+    def _max_pool_tasks(self):
+        return self.max_tasks_per_worker * (self.workers or os.cpu_count())
+
+    def _discard_executor(self, executor):
+        """
+        Drops a broken executor so that the next request starts a fresh pool.
+        """
+        with self._executor_lock:
+            if self._executor is executor:
+                logger.warning("Process pool is broken.  Restarting it.")
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def close(self):
+        """
+        Shuts down the worker pool.
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+            if executor is not None and self._executor_pid == os.getpid():
+                executor.shutdown(wait=True)
 
     def _process_missing_scores(self, request, missing_model_set_revs,
                                 root_caches, inprogress_results=None):
+        executor, futures, errors = self._submit_missing_scores(
+            request, missing_model_set_revs, root_caches)
+
         rev_scores = {}
-        errors = {}
+        for batch, future in futures.items():
+            try:
+                batch_scores, batch_errors, spans = future.result(
+                    timeout=self._batch_timeout(len(batch)))
+            except cfutures.TimeoutError:
+                self._add_batch_error(errors, batch, TimeoutError(
+                    "Timed out after {0} seconds.".format(
+                        self._batch_timeout(len(batch)))))
+            except BrokenProcessPool as error:
+                self._discard_executor(executor)
+                self._add_batch_error(errors, batch, error)
+            except Exception as error:
+                self._add_batch_error(errors, batch, error)
+            else:
+                rev_scores.update(batch_scores)
+                errors.update(batch_errors)
+                request.trace.extend(spans)
 
-        futures = {}
-        with cfutures.ProcessPoolExecutor(max_workers=self.workers) as executor:
-            for missing_models, rev_ids in missing_model_set_revs.items():
-                for rev_id in rev_ids:
-                    if rev_id not in root_caches:
-                        continue
-                    root_cache = root_caches[rev_id]
-                    logger.debug("Submitting _process_score_map for {0}"
-                                 .format(request.format(rev_id, missing_models)))
-                    future = executor.submit(
-                        self._process_score_map, request, rev_id, missing_models,
-                        root_cache)
-                    futures[rev_id] = future
-
-            for rev_id, future in futures.items():
-                try:
-                    rev_scores[rev_id] = future.result(timeout=self.timeout)
-                except cfutures.TimeoutError:
-                    errors[rev_id] = TimeoutError(
-                        "Timed out after {0} seconds.".format(self.timeout))
-                except Exception as error:
-                    errors[rev_id] = error
+        return rev_scores, errors
+
+    async def _process_missing_scores_async(self, request,
+                                            missing_model_set_revs,
+                                            root_caches,
+                                            inprogress_results=None):
+        executor, futures, errors = self._submit_missing_scores(
+            request, missing_model_set_revs, root_caches)
+
+        batches = list(futures.keys())
+        results = await asyncio.gather(
+            *(asyncio.wait_for(asyncio.wrap_future(futures[batch]),
+                               self._batch_timeout(len(batch)))
+              for batch in batches),
+            return_exceptions=True)
+
+        rev_scores = {}
+        for batch, result in zip(batches, results):
+            if isinstance(result, asyncio.TimeoutError):
+                self._add_batch_error(errors, batch, TimeoutError(
+                    "Timed out after {0} seconds.".format(
+                        self._batch_timeout(len(batch)))))
+            elif isinstance(result, BrokenProcessPool):
+                self._discard_executor(executor)
+                self._add_batch_error(errors, batch, result)
+            elif isinstance(result, Exception):
+                self._add_batch_error(errors, batch, result)
+            else:
+                batch_scores, batch_errors, spans = result
+                rev_scores.update(batch_scores)
+                errors.update(batch_errors)
+                request.trace.extend(spans)
 
         return rev_scores, errors
 
+    @staticmethod
+    def _add_batch_error(errors, batch, error):
+        for rev_id in batch:
+            errors[rev_id] = error
+
+    def _submit_missing_scores(self, request, missing_model_set_revs,
+                               root_caches):
+        """
+        Submits the revisions for each set of missing models to the pool in
+        up to one batch per worker.  Each batch is scored with a single call
+        per model (see :meth:`ScoringSystem._process_score_maps`).
+
+        :Returns:
+            The executor, a `dict` of batch (a `tuple` of rev_ids) --> future
+            and a `dict` of rev_id --> errors for revisions that could not be
+            submitted.
+        """
+        errors = {}
+        futures = {}
+
+        batches = []
+        for missing_models, rev_ids in missing_model_set_revs.items():
+            rev_ids = [rev_id for rev_id in rev_ids if rev_id in root_caches]
+            if len(rev_ids) == 0:
+                continue
+            for batch in split_evenly(rev_ids, self.workers or os.cpu_count()):
+                batches.append((missing_models, tuple(batch)))
+
+        if len(batches) == 0:
+            return None, futures, errors
+        executor = self._get_executor(len(batches))
+
+        try:
+            for missing_models, batch in batches:
+                logger.debug("Submitting _process_score_maps for {0}:{1} x{2}"
+                             .format(request.context_name,
+                                     set(missing_models), len(batch)))
+                future = executor.submit(
+                    _process_score_maps, request, missing_models,
+                    {rev_id: root_caches[rev_id] for rev_id in batch})
+                futures[batch] = future
+        except BrokenProcessPool as error:
+            self._discard_executor(executor)
+            for _, batch in batches:
+                if batch not in futures:
+                    self._add_batch_error(errors, batch, error)
+
+        return executor, futures, errors
+
     @classmethod
     def from_config(cls, config, name, section_key="scoring_systems"):
+        """
+        scoring_systems:
+            local_process_pool:
+                class: ores.scoring_systems.ProcessPool
+                workers: 8
+                max_tasks_per_worker: 1000
+        """
         logger.info("Loading ProcessPool '{0}' from config.".format(name))
         section = config[section_key][name]
 
         kwargs = cls._kwargs_from_config(
             config, name, section_key=section_key)
         workers = section.get('workers')
+        max_tasks_per_worker = section.get('max_tasks_per_worker')
 
-        return cls(workers=workers, **kwargs)
+        return cls(workers=workers, max_tasks_per_worker=max_tasks_per_worker,
+                   **kwargs)
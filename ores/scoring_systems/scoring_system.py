@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import logging
 import time
 
@@ -7,12 +9,14 @@ import stopit
 from .. import errors
 from ..errors import (MissingContext, MissingModels, TimeoutError,
                       TooManyRequestsError)
-from ..lock_manager import IpRangeList, PoolCounter
+from ..lock_manager import IpRangeList, LockManager
 from ..metrics_collectors import Null
-from ..score_caches import Empty
+from ..score_caches import Empty, TwoTier
 from ..score_response import ScoreResponse
 from ..scoring_context import ScoringContext
 from ..util import timeout
+from .async_adapters import AsyncExtractor, AsyncScoreCache, run_in_executor
+from .single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -26,12 +30,17 @@ class ScoringSystem(dict):
         super().__init__()
         self.update(context_map)
         self.score_cache = score_cache or Empty()
+        self.async_score_cache = AsyncScoreCache(self.score_cache)
         self.metrics_collector = metrics_collector or Null()
+        if isinstance(self.score_cache, TwoTier):
+            # Per-tier hits and misses are reported with everything else
+            self.score_cache.metrics_collector = self.metrics_collector
         self.timeout = timeout
         self.connections_per_ip = connections_per_ip
         self.connections_per_ip_hard = connections_per_ip_hard
         self.lock_manager = lock_manager
         self.whitelisted_ranges = IpRangeList(whitelisted_ips)
+        self.single_flight = SingleFlight()
 
     def check_context_models(self, request):
 
@@ -44,13 +53,13 @@ class ScoringSystem(dict):
 
     def score(self, request):
         self.check_context_models(request)
+        self._start_trace(request)
 
         locked = None
         start = time.time()
-        if request.ip and (not request.precache) and \
-                self.lock_manager is not None and \
-                not self.whitelisted_ranges.matches(request.ip):
-            locked = self._lock_ip(request.ip)
+        if self._should_lock_ip(request):
+            with request.trace.span('lock'):
+                locked = self._lock_ip(request.ip)
             self.metrics_collector.lock_acquired(
                 'poolcounter',
                 duration=time.time() - start)
@@ -65,29 +74,79 @@ class ScoringSystem(dict):
             if request.ip and locked:
                 self._release_ip(request.ip)
 
-        duration = time.time() - start
+        self._record_request(request, time.time() - start)
+
+        return response
+
+    async def score_async(self, request):
+        """
+        An :mod:`asyncio` variant of :meth:`score`.  Cache lookups, locking
+        and datasource extraction are awaited so that a single event loop can
+        overlap the IO of many concurrent requests.
+        """
+        self.check_context_models(request)
+        self._start_trace(request)
+
+        locked = None
+        start = time.time()
+        if self._should_lock_ip(request):
+            with request.trace.span('lock'):
+                locked = await run_in_executor(None, self._lock_ip, request.ip)
+            self.metrics_collector.lock_acquired(
+                'poolcounter',
+                duration=time.time() - start)
+
+        logger.debug("Scoring {0} asynchronously".format(request))
+        try:
+            response = await self._score_async(request)
+        except errors.ScoreProcessorOverloaded:
+            self.metrics_collector.score_processor_overloaded(request)
+            raise
+        finally:
+            if request.ip and locked:
+                await run_in_executor(None, self._release_ip, request.ip)
+
+        self._record_request(request, time.time() - start)
+
+        return response
+
+    def _start_trace(self, request):
+        """
+        Reports each span of the request's trace to the metrics collector as
+        it finishes.
+        """
+        request.trace.on_span = functools.partial(
+            self.metrics_collector.stage_timed, request)
+
+    def _should_lock_ip(self, request):
+        return request.ip and (not request.precache) and \
+            self.lock_manager is not None and \
+            not self.whitelisted_ranges.matches(request.ip)
+
+    def _record_request(self, request, duration):
         if not request.precache:
             self.metrics_collector.scores_request(request, duration)
         else:
             self.metrics_collector.precache_request(request, duration)
 
-        return response
-
     def _score(self, request):
         context = self[request.context_name]
         response = ScoreResponse(context, request)
 
         # 0. Get model info (if applicable)
         if request.model_info:
-            self._build_model_info(request, response)
+            with request.trace.span('model_info'):
+                self._build_model_info(request, response)
 
         # 1. Lookup cached and inprogress scores (Fast IO)
         if not request.include_features:
             # Can't use cached score if we want feature values since those
             # will need to be regenerated
-            self._lookup_cached_scores(request, response)
-            inprogress_results = self._lookup_inprogress_results(
-                request, response)
+            with request.trace.span('cache_lookup'):
+                self._lookup_cached_scores(request, response)
+            with request.trace.span('inprogress_lookup'):
+                inprogress_results = self._lookup_inprogress_results(
+                    request, response)
         else:
             inprogress_results = {}
 
@@ -95,37 +154,219 @@ class ScoringSystem(dict):
         missing_model_set_revs = self._filter_missing_model_set_revs(
             request, response, inprogress_results=inprogress_results)
 
+        # 2.1 Wait on identical work that is already in flight in-process
+        missing_model_set_revs, led_flights, followed_flights = \
+            self._claim_flights(request, missing_model_set_revs)
+        try:
+            self._generate_missing_scores(
+                request, response, missing_model_set_revs, inprogress_results)
+        except BaseException as e:
+            self._resolve_flights(led_flights, response, error=e)
+            raise
+        self._resolve_flights(led_flights, response)
+
+        # 5. Collect scores from the work we waited on.  All of the waits
+        # share one deadline.
+        results = []
+        deadline = time.monotonic() + self.timeout \
+            if self.timeout is not None else None
+        with request.trace.span('flight_wait'):
+            for _, _, flight in followed_flights:
+                remaining = max(deadline - time.monotonic(), 0) \
+                    if deadline is not None else None
+                try:
+                    results.append(flight.wait(remaining))
+                except Exception as error:
+                    results.append(error)
+        self._add_flight_results(request, response, followed_flights, results)
+
+        return response
+
+    def _generate_missing_scores(self, request, response,
+                                 missing_model_set_revs, inprogress_results):
         # 2.5 Register inprogress work
-        self._register_model_set_revs_to_process(
-            request, missing_model_set_revs)
+        with request.trace.span('register'):
+            self._register_model_set_revs_to_process(
+                request, missing_model_set_revs)
 
         # 3. Extract base datasources for missing models (Slow IO)
         start = time.time()
-        root_caches, extraction_errors = self._extract_root_caches(
-            request, missing_model_set_revs)
+        with request.trace.span('extract'):
+            root_caches, extraction_errors = self._extract_root_caches(
+                request, missing_model_set_revs)
         self.metrics_collector.datasources_extracted(
             request, sum(len(ids) for ids in missing_model_set_revs.values()),
             time.time() - start)
 
         # 3.5. Record extraction errors
-        for rev_id, error in extraction_errors.items():
-            for model in request.model_names:
-                # To avoid too may logs, we filter errors related
-                # to missing resources, since they are expected
-                # and generally not a problem.
-                # See https://phabricator.wikimedia.org/T299137
-                if not isinstance(error, revscoring.errors.MissingResource):
-                    logger.error(
-                        "Feature extraction error for model {} "
-                        "and revision {} due to: {}"
-                        .format(model, rev_id, error))
-                response.add_error(rev_id, model, error)
-                self.metrics_collector.score_errored(request, model)
+        self._record_errors(request, response, extraction_errors)
 
         # 4. Generate scores (Heavy CPU)
-        missing_scores, scoring_errors = self._process_missing_scores(
-            request, missing_model_set_revs, root_caches,
-            inprogress_results=inprogress_results)
+        with request.trace.span('process'):
+            missing_scores, scoring_errors = self._process_missing_scores(
+                request, missing_model_set_revs, root_caches,
+                inprogress_results=inprogress_results)
+        self._add_missing_scores(request, response, missing_scores)
+
+        # Store scores in cache
+        with request.trace.span('cache_store'):
+            self._cache_scores(request, missing_scores)
+
+        # 4.5 Record scoring errors
+        self._record_errors(request, response, scoring_errors)
+
+    async def _score_async(self, request):
+        context = self[request.context_name]
+        response = ScoreResponse(context, request)
+
+        # 0. Get model info (if applicable)
+        if request.model_info:
+            with request.trace.span('model_info'):
+                self._build_model_info(request, response)
+
+        # 1. Lookup cached and inprogress scores (Fast IO)
+        if not request.include_features:
+            with request.trace.span('cache_lookup'):
+                await self._lookup_cached_scores_async(request, response)
+            with request.trace.span('inprogress_lookup'):
+                inprogress_results = \
+                    await self._lookup_inprogress_results_async(
+                        request, response)
+        else:
+            inprogress_results = {}
+
+        # 2. Get missing rev_model sets
+        missing_model_set_revs = self._filter_missing_model_set_revs(
+            request, response, inprogress_results=inprogress_results)
+
+        # 2.1 Wait on identical work that is already in flight in-process
+        missing_model_set_revs, led_flights, followed_flights = \
+            self._claim_flights(request, missing_model_set_revs)
+        try:
+            await self._generate_missing_scores_async(
+                request, response, missing_model_set_revs, inprogress_results)
+        except BaseException as e:
+            self._resolve_flights(led_flights, response, error=e)
+            raise
+        self._resolve_flights(led_flights, response)
+
+        # 5. Collect scores from the work we waited on.  The waits run at
+        # the same time, so they share one deadline.
+        with request.trace.span('flight_wait'):
+            results = await asyncio.gather(
+                *(flight.wait_async(self.timeout)
+                  for _, _, flight in followed_flights),
+                return_exceptions=True)
+        self._add_flight_results(request, response, followed_flights, results)
+
+        return response
+
+    async def _generate_missing_scores_async(self, request, response,
+                                             missing_model_set_revs,
+                                             inprogress_results):
+        # 2.5 Register inprogress work
+        with request.trace.span('register'):
+            await run_in_executor(
+                None, self._register_model_set_revs_to_process,
+                request, missing_model_set_revs)
+
+        # 3. Extract base datasources for missing models (Slow IO)
+        start = time.time()
+        with request.trace.span('extract'):
+            root_caches, extraction_errors = \
+                await self._extract_root_caches_async(
+                    request, missing_model_set_revs)
+        self.metrics_collector.datasources_extracted(
+            request, sum(len(ids) for ids in missing_model_set_revs.values()),
+            time.time() - start)
+
+        # 3.5. Record extraction errors
+        self._record_errors(request, response, extraction_errors)
+
+        # 4. Generate scores (Heavy CPU)
+        with request.trace.span('process'):
+            missing_scores, scoring_errors = \
+                await self._process_missing_scores_async(
+                    request, missing_model_set_revs, root_caches,
+                    inprogress_results=inprogress_results)
+        self._add_missing_scores(request, response, missing_scores)
+
+        # Store scores in cache
+        with request.trace.span('cache_store'):
+            await self.async_score_cache.store_many(
+                request.context_name,
+                list(self._cache_stores(request, missing_scores)))
+
+        # 4.5 Record scoring errors
+        self._record_errors(request, response, scoring_errors)
+
+    def _claim_flights(self, request, missing_model_set_revs):
+        """
+        Claims the (rev_id, model) pairs that this request will generate.
+        Pairs that another request in this process is already generating are
+        removed from `missing_model_set_revs` and returned as flights to wait
+        on.
+        """
+        context = self[request.context_name]
+        led_flights = []
+        followed_flights = []
+        owned_models = {}
+        for model_set, rev_ids in missing_model_set_revs.items():
+            for rev_id in rev_ids:
+                injection_cache = request.injection_caches.get(rev_id)
+                for model_name in model_set:
+                    key = context.format_id_string(
+                        model_name, rev_id, request,
+                        injection_cache=injection_cache)
+                    flight, leader = self.single_flight.claim(key)
+                    if leader:
+                        led_flights.append((rev_id, model_name, key))
+                        owned_models.setdefault(rev_id, set()).add(model_name)
+                    else:
+                        logger.debug("Waiting on in-flight score for {0}"
+                                     .format(key))
+                        followed_flights.append((rev_id, model_name, flight))
+
+        return (self._group_model_set_revs(owned_models), led_flights,
+                followed_flights)
+
+    @staticmethod
+    def _group_model_set_revs(models_by_rev):
+        model_set_revs = {}
+        for rev_id, model_names in models_by_rev.items():
+            model_set_revs.setdefault(
+                frozenset(model_names), []).append(rev_id)
+        return model_set_revs
+
+    def _resolve_flights(self, led_flights, response, error=None):
+        for rev_id, model_name, key in led_flights:
+            if error is not None:
+                self.single_flight.resolve(key, error=error)
+            elif model_name in response.errors.get(rev_id, {}):
+                self.single_flight.resolve(
+                    key, error=response.errors[rev_id][model_name])
+            elif model_name in response.scores.get(rev_id, {}):
+                self.single_flight.resolve(
+                    key, result=(response.scores[rev_id][model_name],
+                                 response.features.get(rev_id, {})
+                                                  .get(model_name)))
+            else:
+                self.single_flight.resolve(
+                    key, error=RuntimeError("No score was generated"))
+
+    def _add_flight_results(self, request, response, followed_flights,
+                            results):
+        for (rev_id, model_name, _), result in zip(followed_flights, results):
+            if isinstance(result, BaseException):
+                response.add_error(rev_id, model_name, result)
+                self.metrics_collector.score_errored(request, model_name)
+            else:
+                score, features = result
+                response.add_score(rev_id, model_name, score)
+                if request.include_features:
+                    response.add_features(rev_id, model_name, features)
+
+    def _add_missing_scores(self, request, response, missing_scores):
         for rev_id, score_map in missing_scores.items():
             for model_name, model_score in score_map.items():
                 response.add_score(rev_id, model_name, model_score['score'])
@@ -133,11 +374,8 @@ class ScoringSystem(dict):
                     response.add_features(
                         rev_id, model_name, model_score['features'])
 
-            # Store scores in cache
-            self._cache_scores(request, rev_id, score_map)
-
-        # 4.5 Record scoring errors
-        for rev_id, error in scoring_errors.items():
+    def _record_errors(self, request, response, rev_errors):
+        for rev_id, error in rev_errors.items():
             for model in request.model_names:
                 # To avoid too may logs, we filter errors related
                 # to missing resources, since they are expected
@@ -151,8 +389,6 @@ class ScoringSystem(dict):
                 response.add_error(rev_id, model, error)
                 self.metrics_collector.score_errored(request, model)
 
-        return response
-
     def _build_model_info(self, request, response):
         context = self[request.context_name]
         for model_name in request.model_names:
@@ -162,27 +398,77 @@ class ScoringSystem(dict):
 
     def _extract_root_caches(self, request, missing_model_set_revs):
         context = self[request.context_name]
+        return context.extract_model_set_root_caches(
+            missing_model_set_revs, injection_caches=request.injection_caches)
 
-        root_caches = {}
-        errors = {}
-        for model_set, rev_ids in missing_model_set_revs.items():
-            ms_root_caches, ms_errors = context.extract_root_dependency_caches(
-                model_set, rev_ids, injection_caches=request.injection_caches)
-            root_caches.update(ms_root_caches)
-            errors.update(ms_errors)
-
-        return root_caches, errors
+    async def _extract_root_caches_async(self, request, missing_model_set_revs):
+        extractor = AsyncExtractor(self[request.context_name])
+        return await extractor.extract_model_set_root_caches(
+            missing_model_set_revs, injection_caches=request.injection_caches)
 
     def _process_score_map(self, request, rev_id, model_names, root_cache):
+        """
+        Generates a score map for a single revision.  See
+        :meth:`ores.scoring_context.ScoringContext.process_model_scores`
+        """
+        context = self[request.context_name]
+
+        start = time.time()
+        score_map = self._run_with_timeout(
+            request, context.process_model_scores, model_names, root_cache,
+            include_features=request.include_features,
+            seconds=self.timeout)
+        duration = time.time() - start
+
+        logger.debug("Score generated for {0} in {1} seconds"
+                     .format(request.format(rev_id, model_names),
+                             round(duration, 3)))
+        self.metrics_collector.score_processed(request, duration)
+
+        return score_map
+
+    def _process_score_maps(self, request, model_names, root_caches):
+        """
+        Generates score maps for a batch of revisions that are missing the
+        same set of models.  `timeout` applies to solving the features of
+        each revision and only prediction is batched.  See
+        :meth:`ores.scoring_context.ScoringContext.process_model_scores_batch`
+
+        :Returns:
+            A tuple of score maps by rev_id and errors by rev_id
+        """
         context = self[request.context_name]
 
         start = time.time()
-        # Runs a timeout function so that we don't get stuck here
+        rev_scores, rev_errors = context.process_model_scores_batch(
+            model_names, root_caches,
+            include_features=request.include_features, trace=request.trace,
+            timeout=self.timeout)
+        duration = time.time() - start
+
+        logger.debug("Scores generated for {0}:{1} x{2} in {3} seconds"
+                     .format(request.context_name, set(request.model_names),
+                             len(root_caches), round(duration, 3)))
+        # Report the per-revision cost so that the metric means the same
+        # thing regardless of batch size.
+        for _ in rev_scores:
+            self.metrics_collector.score_processed(
+                request, duration / len(root_caches))
+        for error in rev_errors.values():
+            if isinstance(error, TimeoutError):
+                self.metrics_collector.score_timed_out(request, self.timeout)
+
+        return rev_scores, rev_errors
+
+    def _run_with_timeout(self, request, func, *args, seconds=None,
+                          **kwargs):
+        """
+        Runs `func` for at most `seconds` and reports timeouts as
+        :class:`ores.errors.TimeoutError`.
+        """
+        start = time.time()
         try:
-            score_map = timeout(
-                context.process_model_scores, model_names, root_cache,
-                include_features=request.include_features,
-                seconds=self.timeout)
+            return timeout(func, *args, seconds=seconds, **kwargs)
         except revscoring.errors.CaughtDependencyError as e:
             if isinstance(e.exception, stopit.TimeoutException):
                 duration = time.time() - start
@@ -196,19 +482,37 @@ class ScoringSystem(dict):
             self.metrics_collector.score_timed_out(request, duration)
             raise
 
-        duration = time.time() - start
-
-        logger.debug("Score generated for {0}:{1} in {2} seconds"
-                     .format(request.context_name, set(request.model_names),
-                             round(duration, 3)))
-        self.metrics_collector.score_processed(request, duration)
-
-        return score_map
+    def _batch_timeout(self, rev_count):
+        """
+        The longest that generating scores for a batch can take.  `timeout`
+        applies to each revision, so a batch gets as long as its revisions
+        would have had one at a time.  Processes that wait on batches scored
+        elsewhere should wait this long.
+        """
+        if self.timeout is None:
+            return None
+        else:
+            return self.timeout * max(rev_count, 1)
 
     def _process_missing_scores(self, request, missing_model_set_revs,
                                 root_caches):
         raise NotImplementedError()
 
+    async def _process_missing_scores_async(self, request,
+                                            missing_model_set_revs,
+                                            root_caches,
+                                            inprogress_results=None):
+        """
+        Generates missing scores for :meth:`score_async`.  By default, this
+        runs :meth:`_process_missing_scores` in the event loop's default
+        executor so that CPU-bound scoring doesn't block the loop.  Scoring
+        systems that do their CPU work elsewhere may override this.
+        """
+        return await run_in_executor(
+            None, self._process_missing_scores, request,
+            missing_model_set_revs, root_caches,
+            inprogress_results=inprogress_results)
+
     def _filter_missing_model_set_revs(self, request, response,
                                        inprogress_results=None):
         missing_model_set_rev_pairs = self._filter_missing_model_pairs(
@@ -237,47 +541,52 @@ class ScoringSystem(dict):
                                             missing_model_set_revs):
         return None
 
-    def _cache_scores(self, request, rev_id, score_map):
-        for model_name, score_doc in score_map.items():
-            self._cache_score(request, rev_id, model_name, score_doc)
+    def _cache_scores(self, request, rev_scores):
+        self.score_cache.store_many(
+            request.context_name, self._cache_stores(request, rev_scores))
 
-    def _cache_score(self, request, rev_id, model_name, score_doc):
-        version = self[request.context_name].model_version(model_name)
-        injection_cache = request.injection_caches.get(rev_id)
-        self.score_cache.store(
-            score_doc['score'], request.context_name, model_name,
-            rev_id, version=version, injection_cache=injection_cache)
+    def _cache_stores(self, request, rev_scores):
+        context = self[request.context_name]
+        for rev_id, score_map in rev_scores.items():
+            for model_name, score_doc in score_map.items():
+                yield (score_doc['score'], model_name, rev_id,
+                       context.model_version(model_name),
+                       request.injection_caches.get(rev_id))
 
     def _lookup_inprogress_results(self, request, response):
         return {}
 
-    def _lookup_cached_scores(self, request, response):
-
-        for rev_id in request.rev_ids:
-            for model_name in request.model_names:
-                try:
-                    rev_score = self._lookup_cached_score(
-                        request, rev_id, model_name)
-                    response.add_score(rev_id, model_name, rev_score)
-                except KeyError:
-                    pass
-
-    def _lookup_cached_score(self, request, rev_id, model_name):
-        version = self[request.context_name].model_version(model_name)
-        injection_cache = request.injection_caches.get(rev_id)
-        try:
-            score = self.score_cache.lookup(
-                request.context_name, model_name, rev_id,
-                version=version, injection_cache=injection_cache)
-
-            logger.debug("Found cached score for {0}"
-                         .format(request.format(rev_id, model_name)))
+    async def _lookup_inprogress_results_async(self, request, response):
+        return {}
 
-            self.metrics_collector.score_cache_hit(request, model_name)
-            return score
-        except KeyError:
-            self.metrics_collector.score_cache_miss(request, model_name)
-            raise
+    def _lookup_cached_scores(self, request, response):
+        lookups = self._cache_lookups(request)
+        cached_scores = self.score_cache.lookup_many(
+            request.context_name, lookups)
+        self._add_cached_scores(request, response, lookups, cached_scores)
+
+    async def _lookup_cached_scores_async(self, request, response):
+        lookups = self._cache_lookups(request)
+        cached_scores = await self.async_score_cache.lookup_many(
+            request.context_name, lookups)
+        self._add_cached_scores(request, response, lookups, cached_scores)
+
+    def _cache_lookups(self, request):
+        context = self[request.context_name]
+        return [(model_name, rev_id, context.model_version(model_name),
+                 request.injection_caches.get(rev_id))
+                for rev_id in request.rev_ids
+                for model_name in request.model_names]
+
+    def _add_cached_scores(self, request, response, lookups, cached_scores):
+        for i, (model_name, rev_id, _, _) in enumerate(lookups):
+            if i in cached_scores:
+                logger.debug("Found cached score for {0}"
+                             .format(request.format(rev_id, model_name)))
+                self.metrics_collector.score_cache_hit(request, model_name)
+                response.add_score(rev_id, model_name, cached_scores[i])
+            else:
+                self.metrics_collector.score_cache_miss(request, model_name)
 
     def _lock_ip(self, ip):
         try:
@@ -309,7 +618,9 @@ class ScoringSystem(dict):
         section = config[section_key][name]
 
         context_map = ScoringContextClass.map_from_config(
-            config, section['scoring_contexts'])
+            config, section['scoring_contexts'],
+            lazy_models=section.get('lazy_models'),
+            loading_workers=section.get('model_loading_workers'))
 
         if 'score_cache' in section:
             score_cache = ScoreCache.from_config(config, section['score_cache'])
@@ -317,7 +628,7 @@ class ScoringSystem(dict):
             score_cache = None
 
         if 'lock_manager' in section:
-            pool_counter = PoolCounter.from_config(config, section['lock_manager'])
+            pool_counter = LockManager.from_config(config, section['lock_manager'])
         else:
             pool_counter = None
 
@@ -329,7 +640,7 @@ class ScoringSystem(dict):
 
         timeout = section.get('timeout')
         connections_per_ip = section.get('connections_per_ip', 4)
-        connections_per_ip_hard = section.get('connections_per_ip', 7)
+        connections_per_ip_hard = section.get('connections_per_ip_hard', 7)
         whitelisted_ips = section.get('whitelisted_ips', [])
 
         return {'context_map': context_map, 'score_cache': score_cache,
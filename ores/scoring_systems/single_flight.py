@@ -0,0 +1,115 @@
+"""
+In-process de-duplication of concurrent identical scoring work.
+
+When two threads in the same process need the same score at the same time,
+the first one to claim the score's key (the "leader") generates it and the
+others wait for the leader's result rather than repeating the extraction and
+scoring.
+"""
+import asyncio
+import threading
+
+from ..errors import TimeoutError
+
+
+class Flight:
+    """
+    A unit of work in progress.  Followers :meth:`wait` until the leader
+    calls :meth:`resolve`.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.callbacks = []
+        self.result = None
+        self.error = None
+
+    def resolve(self, result=None, error=None):
+        with self.lock:
+            self.result = result
+            self.error = error
+            self.done.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            raise TimeoutError("Timed out after {0} seconds.".format(timeout))
+        return self._outcome()
+
+    async def wait_async(self, timeout=None):
+        """
+        Like :meth:`wait`, but waits on the event loop rather than blocking a
+        thread.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def set_done():
+            if not future.done():
+                future.set_result(None)
+
+        def on_resolve():
+            try:
+                loop.call_soon_threadsafe(set_done)
+            except RuntimeError:
+                # The loop closed after the follower gave up
+                pass
+
+        with self.lock:
+            if not self.done.is_set():
+                self.callbacks.append(on_resolve)
+            else:
+                set_done()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Timed out after {0} seconds.".format(timeout))
+        return self._outcome()
+
+    def _outcome(self):
+        if self.error is not None:
+            raise self.error
+        else:
+            return self.result
+
+
+class SingleFlight:
+    """
+    Tracks the :class:`Flight` in progress for each key.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def claim(self, key):
+        """
+        Claims a key.
+
+        :Returns:
+            A tuple of the :class:`Flight` for the key and whether or not the
+            caller is the leader that must resolve it.
+        """
+        with self.lock:
+            if key in self.flights:
+                return self.flights[key], False
+            else:
+                flight = Flight()
+                self.flights[key] = flight
+                return flight, True
+
+    def resolve(self, key, result=None, error=None):
+        """
+        Resolves the flight for a key and releases the key so that later work
+        starts a new flight.
+        """
+        with self.lock:
+            flight = self.flights.pop(key, None)
+        if flight is not None:
+            flight.resolve(result=result, error=error)
+
+    def __len__(self):
+        return len(self.flights)
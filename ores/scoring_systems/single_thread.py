@@ -13,16 +13,19 @@ class SingleThread(ScoringSystem):
         errors = {}
 
         for missing_models, rev_ids in missing_model_set_revs.items():
-            for rev_id in rev_ids:
-                if rev_id not in root_caches:
-                    continue
-                root_cache = root_caches[rev_id]
-                try:
-                    score_map = self._process_score_map(
-                        request, rev_id, missing_models, root_cache)
-                    rev_scores[rev_id] = score_map
-                except Exception as error:
+            batch_root_caches = {rev_id: root_caches[rev_id]
+                                 for rev_id in rev_ids if rev_id in root_caches}
+            if len(batch_root_caches) == 0:
+                continue
+            try:
+                batch_scores, batch_errors = self._process_score_maps(
+                    request, missing_models, batch_root_caches)
+            except Exception as error:
+                for rev_id in batch_root_caches:
                     errors[rev_id] = error
+            else:
+                rev_scores.update(batch_scores)
+                errors.update(batch_errors)
 
         return rev_scores, errors
 
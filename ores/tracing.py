@@ -0,0 +1,71 @@
+"""
+Request-scoped timing of the stages of scoring.
+
+Each :class:`ores.score_request.ScoreRequest` carries a :class:`Trace`.  As a
+request works its way through a scoring system, each stage (cache lookup,
+datasource extraction, feature solving, prediction, etc.) is recorded as a
+span.  Spans are reported to a
+:class:`ores.metrics_collectors.MetricsCollector` as they finish and can be
+included in a response by requesting `?trace`.
+"""
+import time
+from contextlib import contextmanager
+
+
+class Trace:
+    """
+    :Parameters:
+        on_span : `callable`
+            Called with (name, duration, model_names) as each span finishes
+    """
+
+    def __init__(self, on_span=None):
+        self.on_span = on_span
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def __reduce__(self):
+        # A trace starts over in another process.  Spans recorded there are
+        # sent back explicitly.  See `extend()`.
+        return (self.__class__, ())
+
+    @contextmanager
+    def span(self, name, model_names=None):
+        """
+        Times the body of a `with` block as a span.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start,
+                     model_names=model_names, start=start)
+
+    def add(self, name, duration, model_names=None, start=None):
+        """
+        Records a span that was timed elsewhere.  `start` is a
+        :func:`time.perf_counter` value from this process, if known.
+        """
+        model_names = sorted(model_names) if model_names is not None else None
+        self.spans.append({
+            'name': name,
+            'models': model_names,
+            'start': round(start - self.start, 6)
+            if start is not None else None,
+            'duration': round(duration, 6)
+        })
+        if self.on_span is not None:
+            self.on_span(name, duration, model_names)
+
+    def extend(self, spans):
+        """
+        Records spans from another trace (e.g. one from a worker process).
+        Their start times are relative to a different clock, so they are
+        dropped.
+        """
+        for span in spans:
+            self.add(span['name'], span['duration'],
+                     model_names=span['models'])
+
+    def to_json(self):
+        return list(self.spans)
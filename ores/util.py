@@ -1,6 +1,10 @@
+import gc
 import logging
+import os
+import threading
 import time
 import traceback
+from contextlib import contextmanager
 
 import stopit
 
@@ -16,12 +20,49 @@ def jsonify_error(error):
     return {'error': {'type': error_type, 'message': message}}
 
 
+def split_evenly(items, parts):
+    """
+    Splits a `list` of `items` into at most `parts` chunks whose sizes differ
+    by no more than one.
+    """
+    parts = max(min(parts, len(items)), 1)
+    size, remainder = divmod(len(items), parts)
+    chunks = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < remainder else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def pid_alive(pid):
+    """
+    Checks whether a process with `pid` is still running.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Someone else's process
+        return True
+    return True
+
+
 def timeout(func, *args, seconds=None, **kwargs):
     if seconds is None:
         return func(*args, **kwargs)
 
+    if threading.current_thread() is threading.main_thread():
+        Timeout = stopit.SignalTimeout
+    else:
+        # Signals are only delivered to the main thread.  This interrupts
+        # between bytecodes rather than during long calls into C.
+        Timeout = stopit.ThreadingTimeout
+
     start = time.time()
-    with stopit.SignalTimeout(seconds) as to_ctx_mgr:
+    with Timeout(seconds) as to_ctx_mgr:
         result = func(*args, **kwargs)
     duration = time.time() - start
 
@@ -36,3 +77,33 @@ def timeout(func, *args, seconds=None, **kwargs):
     else:
         traceback.print_stack()
         raise RuntimeError("Something weird happened.")
+
+
+@contextmanager
+def shared_with_forks():
+    """
+    Makes the objects created inside the context (e.g. loaded models) cheap
+    to share with processes that are forked later.  Forked processes share
+    their parent's memory until a page is written to, and the garbage
+    collector writes to every object that it tracks.  Collection is paused
+    while loading so that freed objects don't leave holes between the ones
+    that survive.  Afterwards, garbage (e.g. temporary objects from loading)
+    is collected so that it isn't kept alive forever, then everything is
+    frozen into the collector's permanent generation where it is never
+    visited again.
+    """
+    if not hasattr(gc, "freeze"):  # Python < 3.7
+        yield
+        return
+
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.collect()
+        gc.freeze()
+        logger.info("Froze {0} objects to share with forked processes"
+                    .format(gc.get_freeze_count()))
+        if was_enabled:
+            gc.enable()
@@ -0,0 +1,61 @@
+"""
+Writes a snapshot of the metadata that web workers need for each model that
+is loaded from a file so that they can start without loading the models
+themselves.  Snapshots are written to `ores.data_paths.model_metadata` unless
+an output directory is provided.
+
+Usage:
+    snapshot_models (-h|--help)
+    snapshot_models [--config-dir=<path>]... [--output=<path>]
+                    [--workers=<num>] [--debug]
+
+Options:
+    -h --help            Prints this documentation
+    --config-dir=<path>  The path to a directory containing configuration
+                         [default: config/]
+    --output=<path>      The directory to write snapshots to
+    --workers=<num>      The number of processes to load models with
+                         [default: <cpu count>]
+    --debug              Print debug logging
+"""
+import logging
+import os
+
+import docopt
+
+from .. import model_metadata
+from ..applications.util import build_config, configure_logging
+from ..scoring_context import ClientScoringContext
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    config = build_config(config_dirs=args['--config-dir'])
+    configure_logging(debug=args['--debug'], config=config)
+
+    directory = args['--output'] or model_metadata.snapshot_dir(config)
+    if directory is None:
+        raise RuntimeError("No --output and no ores.data_paths.model_metadata "
+                           "configured")
+    if args['--workers'] == "<cpu count>":
+        workers = None
+    else:
+        workers = int(args['--workers'])
+
+    run(config, directory, workers)
+
+
+def run(config, directory, workers=None):
+    os.makedirs(directory, exist_ok=True)
+    keys = [key for key, section in config['scorer_models'].items()
+            if 'model_file' in section]
+
+    models = ClientScoringContext.ModelLoader().load_many(
+        config, keys, workers=workers)
+    for key, (info, root_datasources) in models.items():
+        path = model_metadata.write_snapshot(
+            directory, config, key, info, root_datasources)
+        logger.info("Wrote {0}".format(path))
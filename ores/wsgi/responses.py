@@ -36,16 +36,25 @@ def forbidden(message=None):
                  message or "This request requires authentication.")
 
 
+def unsupported_media_type(message=None):
+    return error(415, 'unsupported media type',
+                 message or "The request body's Content-Type is not " +
+                            "supported.")
+
+
 def not_found(message=None):
     return error(NOT_FOUND, 'not found',
                  message or "Nothing found at this location.")
 
 
-def server_overloaded(message=None):
-    return error(SERVER_OVERLOADED, 'server overloaded',
-                 message or ("Cannot process your request because the " +
-                             "server is overloaded.  Try again in a" +
-                             "few minutes."))
+def server_overloaded(message=None, retry_after=None):
+    response = error(SERVER_OVERLOADED, 'server overloaded',
+                     message or ("Cannot process your request because the " +
+                                 "server is overloaded.  Try again in a" +
+                                 "few minutes."))
+    if retry_after is not None:
+        response += ({'Retry-After': str(int(retry_after))},)
+    return response
 
 
 def unknown_error(message):
@@ -2,7 +2,7 @@ import os
 
 from flask import render_template, request, send_file
 
-from . import ui, v1, v2, v3, versions
+from . import metrics, ui, v1, v2, v3, versions
 
 PWD = os.path.dirname(os.path.abspath(__file__))
 GEAR_FAVICON = os.path.join(PWD, "../static/favicon/gear/favicon.ico")
@@ -30,6 +30,7 @@ def configure(config, bp, score_processor):
 
     bp = ui.configure(config, bp)
     bp = versions.configure(config, bp)
+    bp = metrics.configure(config, bp, score_processor)
     bp = v1.configure(config, bp, score_processor)
     bp = v2.configure(config, bp, score_processor)
     bp = v3.configure(config, bp, score_processor)
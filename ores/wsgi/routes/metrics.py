@@ -0,0 +1,20 @@
+from flask import Response
+
+from .. import responses
+from ...metrics_collectors import Prometheus
+
+
+def configure(config, bp, score_processor):
+
+    @bp.route("/metrics", methods=["GET"])
+    def metrics():
+        metrics_collector = score_processor.metrics_collector
+        if not isinstance(metrics_collector, Prometheus):
+            return responses.not_found(
+                "Metrics are not collected for scraping.  See " +
+                "ores.metrics_collectors.Prometheus.")
+
+        return Response(metrics_collector.exposition(),
+                        mimetype="text/plain; version=0.0.4")
+
+    return bp
@@ -31,10 +31,10 @@ def configure(config, bp, scoring_system):
             else:
                 score_response = scoring_system.score(score_request)
                 return util.format_v1_score_response(score_response, model)
-        except errors.ScoreProcessorOverloaded:
+        except errors.ScoreProcessorOverloaded as e:
             scoring_system.metrics_collector.response_made(
                 responses.SERVER_OVERLOADED, score_request)
-            return responses.server_overloaded()
+            return responses.server_overloaded(retry_after=e.retry_after)
         except errors.MissingContext as e:
             scoring_system.metrics_collector.response_made(
                 responses.NOT_FOUND, score_request)
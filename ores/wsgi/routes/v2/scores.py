@@ -27,10 +27,10 @@ def configure(config, bp, scoring_system):
         try:
             score_response = scoring_system.score(score_request)
             return util.format_v2_score_response(score_request, score_response)
-        except errors.ScoreProcessorOverloaded:
+        except errors.ScoreProcessorOverloaded as e:
             scoring_system.metrics_collector.response_made(
                 responses.SERVER_OVERLOADED, score_request)
-            return responses.server_overloaded()
+            return responses.server_overloaded(retry_after=e.retry_after)
         except errors.MissingContext as e:
             scoring_system.metrics_collector.response_made(
                 responses.NOT_FOUND, score_request)
@@ -1,7 +1,7 @@
 from flask import request
 from flask_swaggerui import render_swaggerui
 
-from . import precache, scores, spec
+from . import bulk, precache, scores, spec
 
 
 def configure(config, bp, score_processor):
@@ -15,6 +15,7 @@ def configure(config, bp, score_processor):
 
     bp = precache.configure(config, bp, score_processor)
     bp = scores.configure(config, bp, score_processor)
+    bp = bulk.configure(config, bp, score_processor)
     bp = spec.configure(config, bp, score_processor)
 
     return bp
@@ -0,0 +1,224 @@
+import json
+import logging
+import traceback
+from itertools import islice
+
+from flask import Response, request, stream_with_context
+from revscoring.errors import ModelInfoLookupError
+
+from .... import errors
+from ....score_request import ScoreRequest
+from ... import preprocessors, responses, util
+from ...util import build_score_request
+
+DEFAULT_BATCH_SIZE = 50
+BODY_MIMETYPES = {"application/x-ndjson", "text/plain", ""}
+UNSUPPORTED_PARAMS = ("inject", "precache", "feature.", "datasource.")
+
+logger = logging.getLogger(__name__)
+
+
+class LineError(util.ParamError):
+    """
+    A line of a request body that isn't a revision ID
+    """
+
+    def __init__(self, message, line_number):
+        super().__init__(message)
+        self.line_number = line_number
+
+
+def configure(config, bp, scoring_system):
+    batch_size = config['ores']['wsgi'].get(
+        'bulk_batch_size', DEFAULT_BATCH_SIZE)
+
+    # /v3/bulk/enwiki/?models=damaging|goodfaith  (revids in the body)
+    @bp.route("/v3/bulk/<context>/", methods=["GET", "POST"])
+    @preprocessors.nocache
+    def bulk_score_v3(context):
+        # Form bodies would be read into request.values before the revision
+        # IDs could be streamed from them
+        if request.method == "POST" and \
+           request.mimetype not in BODY_MIMETYPES:
+            return responses.unsupported_media_type(
+                "Send one revision ID per line as application/x-ndjson or "
+                "text/plain, not {0}".format(request.mimetype))
+        unsupported = sorted(
+            k for k in request.args if k.startswith(UNSUPPORTED_PARAMS))
+        if len(unsupported) > 0:
+            return responses.bad_request(
+                "Not supported by bulk scoring: {0}"
+                .format(", ".join(unsupported)))
+
+        try:
+            score_request = build_score_request(
+                scoring_system, request, context)
+            scoring_system.check_context_models(score_request)
+        except errors.MissingContext as e:
+            return responses.not_found("No scorers available for {0}"
+                                       .format(e))
+        except errors.MissingModels as e:
+            context_name, model_names = e.args
+            return responses.not_found(
+                "Models {0} not available for {1}"
+                .format(tuple(model_names), context_name))
+        except Exception as e:
+            return responses.bad_request(str(e))
+
+        try:
+            models_doc = format_models(score_request, scoring_system)
+        except ModelInfoLookupError as e:
+            return responses.model_info_lookup_error(e)
+
+        if len(score_request.rev_ids) > 0:
+            rev_ids = iter(util.parse_rev_ids(request, None))
+        else:
+            rev_ids = read_rev_ids(request.stream)
+
+        lines = generate_lines(score_request, scoring_system, rev_ids,
+                               models_doc, batch_size)
+        return Response(stream_with_context(lines),
+                        mimetype="application/x-ndjson")
+
+    return bp
+
+
+def read_rev_ids(stream):
+    """
+    Reads one revision ID per line of a request body as it arrives.  A
+    line that isn't a revision ID is yielded as a :class:`LineError` so
+    that the revision IDs around it can still be scored.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if len(line) > 0:
+            try:
+                yield int(line)
+            except ValueError:
+                yield LineError(
+                    "Could not interpret revision ID {0!r}"
+                    .format(line.decode('utf-8', 'replace')), line_number)
+
+
+def format_models(score_request, scoring_system):
+    context = scoring_system[score_request.context_name]
+    return {model_name: context.format_model_info(
+                model_name, score_request.model_info or ['version'])
+            for model_name in sorted(score_request.model_names)}
+
+
+def generate_lines(score_request, scoring_system, rev_ids, models_doc,
+                   batch_size):
+    """
+    Scores `rev_ids` in batches of `batch_size` and yields a line of JSON
+    for each revision as its batch completes.  The first line describes the
+    models and each following line is:
+
+        {"rev_id": <rev_id>, "scores": {"<model_name>": <score or error>}}
+
+    A line of the body that isn't a revision ID is reported in its place as
+
+        {"line": <line number>, "error": <error>}
+
+    and scoring continues.  If scoring can't continue (e.g. the server is overloaded), the last line
+    is {"error": <error>} and revisions that were not reported were not
+    scored.
+    """
+    yield format_line({'context': score_request.context_name,
+                       'models': models_doc})
+
+    while True:
+        batch = list(islice(rev_ids, batch_size))
+        if len(batch) == 0:
+            return
+        batch_rev_ids = [rev_id for rev_id in batch
+                         if not isinstance(rev_id, LineError)]
+        if len(batch_rev_ids) == 0:
+            for line in format_batch(batch, None):
+                yield line
+            continue
+
+        batch_request = ScoreRequest(
+            score_request.context_name, batch_rev_ids,
+            score_request.model_names,
+            include_features=score_request.include_features,
+            ip=score_request.ip)
+        try:
+            score_response = scoring_system.score(batch_request)
+        except errors.ScoreProcessorOverloaded as e:
+            scoring_system.metrics_collector.response_made(
+                responses.SERVER_OVERLOADED, batch_request)
+            yield format_stream_error(
+                'server overloaded',
+                "Cannot continue because the server is overloaded.",
+                retry_after=e.retry_after)
+            return
+        except errors.TooManyRequestsError:
+            scoring_system.metrics_collector.response_made(
+                responses.TOO_MANY_REQUESTS, batch_request)
+            yield format_stream_error(
+                'too_many_requests',
+                "A limited number of parallel connections per IP is allowed.")
+            return
+        except errors.TimeoutError as e:
+            # Only this batch is lost
+            scoring_system.metrics_collector.response_made(
+                responses.TIMEOUT, batch_request)
+            for line in format_batch_error(batch, batch_request, e):
+                yield line
+            continue
+        except Exception:
+            message = traceback.format_exc()
+            logger.error(message)
+            yield format_stream_error('internal server error', message)
+            return
+
+        for line in format_batch(batch, score_response):
+            yield line
+
+
+def format_batch(batch, score_response):
+    for rev_id in dict.fromkeys(batch):
+        if isinstance(rev_id, LineError):
+            yield format_line_error(rev_id)
+            continue
+        scores_doc = {}
+        for model_name, score in \
+                score_response.scores.get(rev_id, {}).items():
+            scores_doc[model_name] = {'score': score}
+        for model_name, error in \
+                score_response.errors.get(rev_id, {}).items():
+            scores_doc[model_name] = util.format_error(error)
+        for model_name, features in \
+                score_response.features.get(rev_id, {}).items():
+            scores_doc[model_name]['features'] = features
+
+        yield format_line({'rev_id': rev_id, 'scores': scores_doc})
+
+
+def format_batch_error(batch, batch_request, error):
+    error_doc = util.format_error(error)
+    for rev_id in dict.fromkeys(batch):
+        if isinstance(rev_id, LineError):
+            yield format_line_error(rev_id)
+            continue
+        yield format_line({
+            'rev_id': rev_id,
+            'scores': {model_name: error_doc
+                       for model_name in batch_request.model_names}})
+
+
+def format_line_error(error):
+    return format_line(dict(line=error.line_number,
+                            **util.format_error(error)))
+
+
+def format_stream_error(code, message, retry_after=None):
+    error_doc = {'code': code, 'message': message}
+    if retry_after is not None:
+        error_doc['retry_after'] = int(retry_after)
+    return format_line({'error': error_doc})
+
+
+def format_line(doc):
+    return json.dumps(util.normalize_json(doc)) + "\n"
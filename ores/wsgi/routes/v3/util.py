@@ -36,7 +36,8 @@ def format_v3_score_response(response):
             "models": {
                 "<model_name>": <model_info>,
                 "<model_name>": <model_info>
-            }
+            },
+            "trace": [<span>, <span>, ...]  # If requested with ?trace
         }
     }
     """
@@ -62,6 +63,9 @@ def format_v3_score_response(response):
             model_name: info_doc
             for model_name, info_doc in response.model_info.items()}
 
+    if response.request.include_trace:
+        context_doc['trace'] = response.request.trace.to_json()
+
     return util.jsonify({response.context.name: context_doc})
 
 
@@ -105,11 +109,13 @@ def process_score_request(score_request, scoring_system):
                 "Too many values for 'revids' parameter.  Max of 50.")
         else:
             score_response = scoring_system.score(score_request)
-            return format_v3_score_response(score_response)
-    except errors.ScoreProcessorOverloaded:
+            # Recorded too late to be part of a trace in the response
+            with score_request.trace.span('serialize'):
+                return format_v3_score_response(score_response)
+    except errors.ScoreProcessorOverloaded as e:
         scoring_system.metrics_collector.response_made(
                 responses.SERVER_OVERLOADED, score_request)
-        return responses.server_overloaded()
+        return responses.server_overloaded(retry_after=e.retry_after)
     except errors.MissingContext as e:
         scoring_system.metrics_collector.response_made(
                 responses.NOT_FOUND, score_request)
@@ -88,6 +88,7 @@ def build_score_request(scoring_system, request, context_name=None, rev_id=None,
     model_names = parse_model_names(request, model_name)
     precache = 'precache' in request.args
     include_features = 'features' in request.args
+    include_trace = 'trace' in request.args
     injection_caches = parse_injection(request, rev_ids)
     model_info = parse_model_info(request)
 
@@ -105,7 +106,8 @@ def build_score_request(scoring_system, request, context_name=None, rev_id=None,
                         include_features=include_features,
                         injection_caches=injection_caches,
                         model_info=model_info,
-                        ip=ip)
+                        ip=ip,
+                        include_trace=include_trace)
 
 
 def parse_rev_ids(request, rev_id):
@@ -57,6 +57,11 @@ setup(
             "pylru",
             "redis",
         ],
+        # Install ores[msgpack] to store scores in Redis with the compact
+        # msgpack codec.
+        "msgpack": [
+            "msgpack",
+        ],
     },
     classifiers=[
         "Development Status :: 3 - Alpha",
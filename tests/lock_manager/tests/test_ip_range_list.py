@@ -1,3 +1,5 @@
+import ipaddress
+
 from ores.lock_manager.ip_range_list import IpRangeList
 
 
@@ -49,3 +51,31 @@ def test_matches_mixed_type_safe():
     ip = '4.3.2.1'
 
     assert not IpRangeList(whitelist).matches(ip)
+
+
+def test_matches_overlapping_ranges():
+    whitelist = [
+        '10.0.0.0/8',
+        '10.1.0.0/16',
+        '11.0.0.0/8',
+        '192.168.1.0/24',
+    ]
+    ip_range_list = IpRangeList(whitelist, memo_size=0)
+    assert ip_range_list.intervals[4] == [
+        (int(ipaddress.ip_address('10.0.0.0')),
+         int(ipaddress.ip_address('11.255.255.255'))),
+        (int(ipaddress.ip_address('192.168.1.0')),
+         int(ipaddress.ip_address('192.168.1.255')))]
+
+    assert ip_range_list.matches('11.2.3.4')
+    assert ip_range_list.matches('192.168.1.255')
+    assert not ip_range_list.matches('192.168.2.0')
+    assert not ip_range_list.matches('9.255.255.255')
+
+
+def test_matches_memo():
+    ip_range_list = IpRangeList(['10.0.0.0/8'], memo_size=2)
+    assert ip_range_list.matches('10.1.2.3')
+    assert ip_range_list.matches('10.1.2.3')
+    assert not ip_range_list.matches('4.3.2.1')
+    assert ip_range_list.memo.cache_info().hits == 1
@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import signal
+
+from pytest import raises
+
+from ores.errors import TimeoutError, TooManyRequestsError
+from ores.lock_manager import LocalLockManager, LockManager, PoolCounter
+
+
+def test_lock_and_release():
+    lock_manager = LocalLockManager()
+    assert lock_manager.lock("1.2.3.4", 2, 3, 1)
+    assert lock_manager.lock("1.2.3.4", 2, 3, 1)
+
+    with raises(TimeoutError):
+        lock_manager.lock("1.2.3.4", 2, 3, 0)
+
+    with raises(TooManyRequestsError):
+        lock_manager.lock("1.2.3.4", 2, 2, 0)
+
+    # Other keys are counted separately
+    assert lock_manager.lock("4.3.2.1", 2, 3, 0)
+
+    assert lock_manager.release("1.2.3.4")
+    assert lock_manager.release("1.2.3.4")
+    assert not lock_manager.release("1.2.3.4")
+    assert lock_manager.lock("1.2.3.4", 1, 1, 0)
+
+    # No timeout means no waiting
+    with raises(TimeoutError):
+        lock_manager.lock("1.2.3.4", 1, 2, None)
+    assert lock_manager.lock("4.3.2.1", 2, 3, None)
+
+
+def hold_lock(lock_manager, locked, done):
+    lock_manager.lock("1.2.3.4", 1, 2, 1)
+    locked.set()
+    done.wait(5)
+    lock_manager.release("1.2.3.4")
+
+
+def test_shared_across_processes():
+    lock_manager = LocalLockManager()
+    locked = multiprocessing.Event()
+    done = multiprocessing.Event()
+    process = multiprocessing.get_context("fork").Process(
+        target=hold_lock, args=(lock_manager, locked, done))
+    process.start()
+    try:
+        assert locked.wait(5)
+        with raises(TimeoutError):
+            lock_manager.lock("1.2.3.4", 1, 2, 0)
+    finally:
+        done.set()
+        process.join()
+
+    # Waits for the other process to release
+    assert lock_manager.lock("1.2.3.4", 1, 2, 1)
+
+
+def hold_lock_forever(lock_manager, locked):
+    lock_manager.lock("1.2.3.4", 1, 2, 1)
+    locked.set()
+    signal.pause()
+
+
+def test_reclaim_from_dead_process():
+    lock_manager = LocalLockManager()
+    locked = multiprocessing.Event()
+    process = multiprocessing.get_context("fork").Process(
+        target=hold_lock_forever, args=(lock_manager, locked))
+    process.start()
+    assert locked.wait(5)
+    with raises(TimeoutError):
+        lock_manager.lock("1.2.3.4", 1, 2, 0)
+
+    os.kill(process.pid, signal.SIGKILL)
+    process.join()
+
+    # The dead process' lock is reclaimed
+    assert lock_manager.lock("1.2.3.4", 1, 2, 0)
+    assert lock_manager.release("1.2.3.4")
+    assert lock_manager.running[lock_manager._slot("1.2.3.4")] == 0
+
+
+def test_holders_full():
+    lock_manager = LocalLockManager(holders=1)
+    locked = multiprocessing.Event()
+    done = multiprocessing.Event()
+    process = multiprocessing.get_context("fork").Process(
+        target=hold_lock, args=(lock_manager, locked, done))
+    process.start()
+    try:
+        assert locked.wait(5)
+        # There is no room to record this process' lock
+        with raises(RuntimeError):
+            lock_manager.lock("1.2.3.4", 2, 3, 0)
+        assert lock_manager.running[lock_manager._slot("1.2.3.4")] == 1
+    finally:
+        done.set()
+        process.join()
+
+    assert lock_manager.lock("1.2.3.4", 2, 3, 0)
+
+
+def test_token_bucket():
+    lock_manager = LocalLockManager(rate=0.001, burst=2)
+    for _ in range(2):
+        assert lock_manager.lock("1.2.3.4", 5, 5, 0)
+        assert lock_manager.release("1.2.3.4")
+
+    with raises(TooManyRequestsError):
+        lock_manager.lock("1.2.3.4", 5, 5, 0)
+
+
+def test_from_config():
+    config = {
+        'lock_managers': {
+            'pool_counter': ["localhost:7531"],
+            'local': {'class': "ores.lock_manager.LocalLockManager",
+                      'slots': 16, 'stripes': 4}
+        }
+    }
+    lock_manager = LockManager.from_config(config, 'local')
+    assert isinstance(lock_manager, LocalLockManager)
+    assert lock_manager.slots == 16
+    assert len(lock_manager.conditions) == 4
+
+    lock_manager = LockManager.from_config(config, 'pool_counter')
+    assert isinstance(lock_manager, PoolCounter)
+    assert lock_manager.nodes == [("localhost", 7531)]
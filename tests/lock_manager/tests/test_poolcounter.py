@@ -0,0 +1,126 @@
+import socket
+import threading
+
+from pytest import raises
+
+from ores.errors import TimeoutError, TooManyRequestsError
+from ores.lock_manager import LockManager, PoolCounter
+from ores.lock_manager.poolcounter_stub import PoolCounterStub
+
+
+def closed_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return ("127.0.0.1", port)
+
+
+def test_lock_and_release():
+    with PoolCounterStub() as server:
+        pool_counter = PoolCounter([server.address])
+        assert pool_counter.lock("1.2.3.4", 2, 3, 1)
+        assert pool_counter.lock("1.2.3.4", 2, 3, 1)
+        # Each lock holds its own connection
+        assert len(pool_counter.held["1.2.3.4"]) == 2
+
+        with raises(TimeoutError):
+            pool_counter.lock("1.2.3.4", 2, 3, 0)
+
+        with raises(TooManyRequestsError):
+            pool_counter.lock("1.2.3.4", 2, 2, 0)
+
+        assert pool_counter.release("1.2.3.4")
+        assert pool_counter.release("1.2.3.4")
+        assert not pool_counter.release("1.2.3.4")
+
+        # Connections go back to the pool
+        assert len(pool_counter.idle[server.address]) == 3
+        assert pool_counter.lock("1.2.3.4", 2, 3, 1)
+        assert len(pool_counter.idle[server.address]) == 2
+        assert pool_counter.close()
+
+
+def test_failover():
+    dead_node = closed_port()
+    with PoolCounterStub() as server:
+        pool_counter = PoolCounter([dead_node, server.address])
+        for i in range(10):
+            key = "10.0.0.{0}".format(i)
+            assert pool_counter.lock(key, 1, 2, 1)
+            assert pool_counter.release(key)
+        assert dead_node in pool_counter.down_until
+        assert server.address not in pool_counter.down_until
+
+    # Every node is down
+    pool_counter = PoolCounter([closed_port()])
+    with raises(ConnectionRefusedError):
+        pool_counter.lock("1.2.3.4", 1, 2, 1)
+    assert not pool_counter.connect("1.2.3.4")
+
+
+def test_reconnect_after_node_restart():
+    with PoolCounterStub() as server:
+        pool_counter = PoolCounter([server.address])
+        assert pool_counter.lock("1.2.3.4", 1, 2, 1)
+        assert pool_counter.release("1.2.3.4")
+        address = server.address
+
+    with PoolCounterStub(*address):
+        # The idle connection is dead.  A new one is made.
+        assert pool_counter.lock("1.2.3.4", 1, 2, 1)
+        assert pool_counter.release("1.2.3.4")
+
+
+def test_nodes_for():
+    nodes = [("a", 1), ("b", 1), ("c", 1)]
+    pool_counter = PoolCounter(nodes)
+    first_nodes = {pool_counter.nodes_for(str(i))[0] for i in range(100)}
+    assert first_nodes == set(nodes)
+
+    # Removing a node only moves the keys that were on it
+    fewer = PoolCounter(nodes[:2])
+    for i in range(100):
+        if pool_counter.nodes_for(str(i))[0] != ("c", 1):
+            assert fewer.nodes_for(str(i))[0] == \
+                pool_counter.nodes_for(str(i))[0]
+
+
+def test_concurrent_locks():
+    with PoolCounterStub() as server:
+        pool_counter = PoolCounter([server.address], max_idle=4)
+        errors = []
+
+        def lock_and_release(i):
+            try:
+                for _ in range(20):
+                    key = "10.0.0.{0}".format(i % 4)
+                    assert pool_counter.lock(key, 10, 20, 1)
+                    assert pool_counter.release(key)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=lock_and_release, args=(i,))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert len(pool_counter.held) == 0
+        assert len(pool_counter.idle[server.address]) <= 4
+
+
+def test_from_config():
+    config = {
+        'lock_managers': {
+            'pool_counter': {'class': "ores.lock_manager.PoolCounter",
+                             'nodes': ["localhost:7531", "otherhost:7532"],
+                             'io_timeout': 0.5}
+        }
+    }
+    lock_manager = LockManager.from_config(config, 'pool_counter')
+    assert isinstance(lock_manager, PoolCounter)
+    assert lock_manager.nodes == [("localhost", 7531), ("otherhost", 7532)]
+    assert lock_manager.io_timeout == 0.5
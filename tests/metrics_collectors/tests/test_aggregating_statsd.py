@@ -0,0 +1,83 @@
+import time
+from contextlib import contextmanager
+
+from ores.metrics_collectors import AggregatingStatsd
+from ores.score_request import ScoreRequest
+
+
+class StatsClient:
+
+    def __init__(self):
+        self.messages = []
+
+    def incr(self, name, count=1):
+        self.messages.append(("INCR", name, count))
+
+    def timing(self, name, duration):
+        self.messages.append(("TIMING", name, duration))
+
+    @contextmanager
+    def pipeline(self):
+        yield self
+
+
+def test_aggregating_statsd():
+    fake_client = StatsClient()
+    collector = AggregatingStatsd(fake_client, flush_interval=60000)
+
+    collector.scores_request(ScoreRequest("foo", [1, 2], {"bar"}), 0.15)
+    collector.scores_request(ScoreRequest("foo", [3], {"bar"}), 0.25)
+    collector.response_made(200, ScoreRequest("foo", [1], {"bar"}))
+    # Nothing is sent until a flush
+    assert fake_client.messages == []
+
+    collector.close()
+    assert set(fake_client.messages) == \
+        {('INCR', 'scores_request.foo.bar.count', 2),
+         ('INCR', 'scores_request.foo.bar.sum', 400),
+         ('TIMING', 'scores_request.foo.bar.min', 150),
+         ('TIMING', 'scores_request.foo.bar.max', 250),
+         ('INCR', 'scores_request.foo.count', 2),
+         ('INCR', 'scores_request.foo.sum', 400),
+         ('TIMING', 'scores_request.foo.min', 150),
+         ('TIMING', 'scores_request.foo.max', 250),
+         ('INCR', 'scores_request.count', 2),
+         ('INCR', 'scores_request.sum', 400),
+         ('TIMING', 'scores_request.min', 150),
+         ('TIMING', 'scores_request.max', 250),
+         ('INCR', 'revision_scored.foo.bar', 3),
+         ('INCR', 'revision_scored.foo', 3),
+         ('INCR', 'revision_scored', 3),
+         ('INCR', 'response.200.foo', 1),
+         ('INCR', 'response.200', 1),
+         ('INCR', 'response', 1)}
+
+
+def test_timing_aggregates():
+    fake_client = StatsClient()
+    collector = AggregatingStatsd(fake_client, flush_interval=60000)
+    for _ in range(2000):
+        collector.lock_acquired('poolcounter', 0.125)
+        collector.lock_acquired('poolcounter', 0.5)
+    collector.close()
+
+    # Every timing is accounted for in one message per statistic
+    assert sorted(message for message in fake_client.messages
+                  if message[1].startswith('locking_response_time.') and
+                  'poolcounter' not in message[1]) == \
+        [("INCR", 'locking_response_time.count', 4000),
+         ("INCR", 'locking_response_time.sum', 1250000),
+         ("TIMING", 'locking_response_time.max', 500),
+         ("TIMING", 'locking_response_time.min', 125)]
+
+
+def test_background_flush():
+    fake_client = StatsClient()
+    collector = AggregatingStatsd(fake_client, flush_interval=10)
+    collector.score_errored(ScoreRequest("foo", [1], {"bar"}), "bar")
+
+    deadline = time.time() + 5
+    while len(fake_client.messages) == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert ('INCR', 'score_errored.foo.bar', 1) in fake_client.messages
+    collector.close()
@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+
+from ores.metrics_collectors import Prometheus
+from ores.score_request import ScoreRequest
+
+
+def test_exposition():
+    collector = Prometheus(buckets=[0.1, 1])
+    collector.scores_request(ScoreRequest("foo", [1, 2], {"bar", "baz"}),
+                             0.15)
+    collector.scores_request(ScoreRequest("foo", [3], {"bar"}), 0.05)
+    collector.response_made(200, ScoreRequest("foo", [1], {"bar"}))
+    collector.lock_acquired('poolcounter', 2)
+
+    lines = collector.exposition().split("\n")
+    assert '# TYPE ores_revision_scored_total counter' in lines
+    assert 'ores_revision_scored_total{context="foo",model="bar"} 3' in lines
+    assert 'ores_revision_scored_total{context="foo",model="baz"} 2' in lines
+    assert 'ores_response_total{code="200",context="foo"} 1' in lines
+
+    assert '# TYPE ores_scores_request_duration_seconds histogram' in lines
+    metric = 'ores_scores_request_duration_seconds'
+    assert metric + '_bucket{context="foo",model="bar",le="0.1"} 1' in lines
+    assert metric + '_bucket{context="foo",model="bar",le="1"} 2' in lines
+    assert metric + '_bucket{context="foo",model="bar",le="+Inf"} 2' in lines
+    assert metric + '_sum{context="foo",model="bar"} 0.2' in lines
+    assert metric + '_count{context="foo",model="bar"} 2' in lines
+    metric = 'ores_lock_acquired_duration_seconds'
+    assert metric + '_bucket{lock_type="poolcounter",le="1"} 0' in lines
+    assert metric + '_bucket{lock_type="poolcounter",le="+Inf"} 1' in lines
+
+
+def score_errored(collector):
+    collector.score_errored(ScoreRequest("foo", [1], {"bar"}), "bar")
+    collector.close()
+
+
+def test_shared_across_processes(tmpdir):
+    collector = Prometheus(directory=str(tmpdir), write_interval=60000)
+    collector.score_errored(ScoreRequest("foo", [1], {"bar"}), "bar")
+
+    for _ in range(2):
+        process = multiprocessing.get_context("fork").Process(
+            target=score_errored, args=(collector,))
+        process.start()
+        process.join()
+
+    lines = collector.exposition().split("\n")
+    assert 'ores_score_errored_total{context="foo",model="bar"} 3' in lines
+    collector.close()
+
+
+def score_and_exit(collector, retire):
+    collector.score_errored(ScoreRequest("foo", [1], {"bar"}), "bar")
+    collector.scores_request(ScoreRequest("foo", [1], {"bar"}), 0.5)
+    if retire:
+        collector.retire()
+    else:
+        # Killed without a chance to clean up
+        collector.close()
+
+
+def test_recycled_processes(tmpdir):
+    collector = Prometheus(directory=str(tmpdir), write_interval=60000)
+    collector.score_errored(ScoreRequest("foo", [1], {"bar"}), "bar")
+
+    for i in range(6):
+        process = multiprocessing.get_context("fork").Process(
+            target=score_and_exit, args=(collector, i % 2 == 0))
+        process.start()
+        process.join()
+
+        lines = collector.exposition().split("\n")
+        assert 'ores_score_errored_total{context="foo",model="bar"} ' + \
+            str(i + 2) in lines
+        assert 'ores_scores_request_duration_seconds_count' + \
+            '{context="foo",model="bar"} ' + str(i + 1) in lines
+        # This process' snapshot and one for all of the exited processes
+        snapshots = [f for f in os.listdir(str(tmpdir))
+                     if f.endswith(".json")]
+        assert len(snapshots) == 2
+
+    collector.close()
+
+
+def test_from_config(tmpdir):
+    config = {
+        'metrics_collectors': {
+            'prometheus': {'class': "ores.metrics_collectors.Prometheus",
+                           'directory': str(tmpdir),
+                           'buckets': [1, 0.5]}
+        }
+    }
+    collector = Prometheus.from_config(config, 'prometheus')
+    assert collector.directory == str(tmpdir)
+    assert collector.buckets == (0.5, 1.0)
@@ -1,14 +1,37 @@
 class RedisMock:
     def __init__(self):
         self.values = {}
+        self.ttls = {}
 
     def setex(self, key, ttl, value):
         self.values[key] = value
+        self.ttls[key] = ttl
         return True
 
     def get(self, key):
         return self.values.get(key)
 
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
     def delete(self, key):
         del self.values[key]
         return True
+
+    def pipeline(self, transaction=True):
+        return PipelineMock(self)
+
+
+class PipelineMock:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def setex(self, key, ttl, value):
+        self.commands.append((self.redis.setex, (key, ttl, value)))
+        return self
+
+    def execute(self):
+        results = [command(*args) for command, args in self.commands]
+        self.commands = []
+        return results
@@ -0,0 +1,27 @@
+from pytest import raises
+
+from ores.errors import RootCacheExpired
+from ores.root_cache_store import InMemoryRootCacheStore
+
+
+def test_in_memory_root_cache_store():
+    root_cache_store = InMemoryRootCacheStore()
+    payload = [[1, {'datasource.revision.text': "foo"}]]
+
+    reference = root_cache_store.store(payload)
+    assert reference != payload
+    assert root_cache_store.load(reference) == payload
+
+    root_cache_store.values.clear()
+    with raises(RootCacheExpired):
+        root_cache_store.load(reference)
+
+
+def test_min_size():
+    root_cache_store = InMemoryRootCacheStore(min_size=1024)
+    small = [[1, {'datasource.revision.text': "foo"}]]
+    large = [[1, {'datasource.revision.text': "foo" * 1024}]]
+
+    assert root_cache_store.store(small) is small
+    assert root_cache_store.load(small) is small
+    assert root_cache_store.load(root_cache_store.store(large)) == large
@@ -0,0 +1,30 @@
+from ores.root_cache_store import RedisRootCacheStore
+
+from tests.redis_mock import RedisMock
+
+
+def test_redis_root_cache_store():
+    redis = RedisMock()
+    root_cache_store = RedisRootCacheStore(redis, prefix="foo")
+    payload = [[1, {'datasource.revision.text': "foo"}]]
+
+    reference = root_cache_store.store(payload)
+    assert len(redis.values) == 1
+    assert list(redis.values.keys())[0].startswith("foo:")
+    assert root_cache_store.load(reference) == payload
+
+
+def test_ttl():
+    redis = RedisMock()
+    root_cache_store = RedisRootCacheStore(redis)
+    payload = [[1, {'datasource.revision.text': "foo"}]]
+
+    root_cache_store.store(payload, ttl=12)
+    root_cache_store.store(payload)
+    assert sorted(redis.ttls.values()) == [12, 60]
+
+    # A configured TTL wins over the deadline
+    redis = RedisMock()
+    root_cache_store = RedisRootCacheStore(redis, ttl=30)
+    root_cache_store.store(payload, ttl=12)
+    assert list(redis.ttls.values()) == [30]
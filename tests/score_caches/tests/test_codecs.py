@@ -0,0 +1,74 @@
+from pytest import raises
+
+from ores.score_caches import codecs
+from ores.score_caches.redis import Redis
+from tests.redis_mock import RedisMock
+
+SCORE = {'prediction': False,
+         'probability': {'false': 0.5700000000000001, 'true': 0.43}}
+
+
+def test_json():
+    codec = codecs.JSON()
+    assert codec.decode(codec.encode(SCORE)) == SCORE
+
+
+def test_msgpack():
+    codec = codecs.MsgPack()
+    encoded = codec.encode(SCORE)
+    assert len(encoded) < len(codecs.JSON().encode(SCORE))
+    assert codec.decode(encoded) == SCORE
+
+    # Non-string keys survive the round trip
+    score = {'prediction': True, 'probability': {True: 0.9, False: 0.1}}
+    assert codec.decode(codec.encode(score)) == score
+
+
+def test_msgpack_decodes_json():
+    codec = codecs.MsgPack()
+    assert codec.decode(codecs.JSON().encode(SCORE)) == SCORE
+    assert codec.decode(codecs.JSON().encode(0.421)) == 0.421
+
+
+def test_from_name():
+    assert isinstance(codecs.from_name(None), codecs.JSON)
+    assert isinstance(codecs.from_name("msgpack"), codecs.MsgPack)
+    with raises(ValueError):
+        codecs.from_name("pickle")
+
+
+def test_redis_codec_migration():
+    redis = RedisMock()
+    json_cache = Redis(redis, codec=codecs.JSON())
+    msgpack_cache = Redis(redis, codec=codecs.MsgPack())
+
+    json_cache.store(SCORE, 'testwiki', 'damaging', 1)
+    msgpack_cache.store(SCORE, 'testwiki', 'damaging', 2)
+
+    assert msgpack_cache.lookup('testwiki', 'damaging', 1) == SCORE
+    assert msgpack_cache.lookup_many(
+        'testwiki', [('damaging', 1, None, None),
+                     ('damaging', 2, None, None)]) == \
+        {0: SCORE, 1: SCORE}
+
+
+def test_json_decodes_msgpack():
+    codec = codecs.JSON()
+    assert codec.decode(codecs.MsgPack().encode(SCORE)) == SCORE
+
+
+def test_redis_undecodable_miss():
+    redis = RedisMock()
+    cache = Redis(redis, codec=codecs.MsgPack())
+    cache.store(SCORE, 'testwiki', 'damaging', 1)
+    redis.setex(cache._generate_key('testwiki', 'damaging', 2), 60,
+                codecs.MSGPACK_MARKER + b"\xc1")
+    redis.setex(cache._generate_key('testwiki', 'damaging', 3), 60, b"{")
+
+    with raises(KeyError):
+        cache.lookup('testwiki', 'damaging', 2)
+    assert cache.lookup_many(
+        'testwiki', [('damaging', 1, None, None),
+                     ('damaging', 2, None, None),
+                     ('damaging', 3, None, None)]) == \
+        {0: SCORE}
@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from pytest import raises
 
 from ores.score_caches.lru import LRU
@@ -50,3 +52,48 @@ def test_from_config():
     context = cache.context("foo", "bar")
     context.store(1, "foo")
     assert context.lookup(1) == "foo"
+
+
+def test_lookup_many():
+    lru = LRU(10)
+
+    lru.store_many("foo", [("bar", "baz", 1, None, None),
+                           ("bar", "baz", 2, None, {"cachedvalue": 1})])
+
+    assert lru.lookup_many("foo", [("baz", 1, None, None),
+                                   ("baz", 2, None, None),
+                                   ("baz", 2, None, {"cachedvalue": 1}),
+                                   ("baz", 3, None, None)]) == \
+        {0: "bar", 2: "bar"}
+
+    # Lookups that only differ in their injection cache don't collide
+    lru.store_many("foo", [("qux", "baz", 2, None, None)])
+    assert lru.lookup_many("foo", [("baz", 2, None, {"cachedvalue": 1}),
+                                   ("baz", 2, None, None)]) == \
+        {0: "bar", 1: "qux"}
+
+
+def test_ttl():
+    lru = LRU(10, ttl=-1)
+
+    cache_context = lru.context("foo", "bar")
+    cache_context.store(1, "foo")
+
+    with raises(KeyError):
+        cache_context.lookup(1)
+
+
+def test_threads():
+    lru = LRU(8)
+
+    def store_and_lookup(i):
+        lru.store(i, "foo", "bar", i % 16)
+        try:
+            lru.lookup("foo", "bar", (i + 1) % 16)
+        except KeyError:
+            pass
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(store_and_lookup, range(10000)))
+
+    assert len(lru.lru) == 8
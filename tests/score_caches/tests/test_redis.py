@@ -29,3 +29,21 @@ def cache_mock():
 def test_lookup_mock(cache_mock):
     cache_mock.store(0.421, 'testwiki', 'damaging', 124)
     assert cache_mock.lookup('testwiki', 'damaging', 124) == 0.421
+
+
+@pytest.mark.redis
+def test_lookup_many_mock(cache_mock):
+    cache_mock.store_many('testwiki', [
+        (0.421, 'damaging', 124, '0.1.0', None),
+        (0.8, 'goodfaith', 124, '0.1.0', None),
+        (0.5, 'damaging', 125, '0.1.0', {'feature.foo': 1})])
+
+    assert cache_mock.lookup('testwiki', 'goodfaith', 124,
+                             version='0.1.0') == 0.8
+    assert cache_mock.lookup_many('testwiki', [
+        ('damaging', 124, '0.1.0', None),
+        ('goodfaith', 124, '0.1.0', None),
+        ('damaging', 125, '0.1.0', None),
+        ('damaging', 125, '0.1.0', {'feature.foo': 1}),
+        ('damaging', 126, '0.1.0', None)]) == \
+        {0: 0.421, 1: 0.8, 3: 0.5}
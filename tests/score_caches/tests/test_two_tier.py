@@ -0,0 +1,101 @@
+from pytest import raises
+
+from ores.metrics_collectors import Null
+from ores.score_caches.lru import LRU
+from ores.score_caches.redis import Redis
+from ores.score_caches.score_cache import ScoreCache
+from ores.score_caches.two_tier import TwoTier
+from ores.scoring_systems import SingleThread
+from tests.redis_mock import RedisMock
+
+
+class TierMetrics(Null):
+    def __init__(self):
+        self.events = []
+
+    def score_cache_tier_hit(self, tier, context_name, model_name, count=1):
+        self.events.append(("hit", tier, model_name, count))
+
+    def score_cache_tier_miss(self, tier, context_name, model_name,
+                              count=1):
+        self.events.append(("miss", tier, model_name, count))
+
+
+def test_two_tier():
+    near = LRU(10)
+    far = Redis(RedisMock())
+    metrics = TierMetrics()
+    cache = TwoTier(near, far, metrics_collector=metrics)
+
+    far.store(0.5, "enwiki", "damaging", 1)
+    assert cache.lookup("enwiki", "damaging", 1) == 0.5
+    assert metrics.events == [("miss", "near", "damaging", 1),
+                              ("hit", "far", "damaging", 1)]
+
+    # Filled from the far tier
+    assert near.lookup("enwiki", "damaging", 1) == 0.5
+
+    with raises(KeyError):
+        cache.lookup("enwiki", "damaging", 2)
+
+    cache.store(0.7, "enwiki", "damaging", 2)
+    assert near.lookup("enwiki", "damaging", 2) == 0.7
+    assert far.lookup("enwiki", "damaging", 2) == 0.7
+
+
+def test_lookup_many():
+    near = LRU(10)
+    far = Redis(RedisMock())
+    metrics = TierMetrics()
+    cache = TwoTier(near, far, metrics_collector=metrics)
+
+    near.store(0.1, "enwiki", "damaging", 1)
+    far.store(0.2, "enwiki", "damaging", 2)
+
+    scores = cache.lookup_many("enwiki", [("damaging", 1, None, None),
+                                          ("damaging", 2, None, None),
+                                          ("damaging", 3, None, None)])
+    assert scores == {0: 0.1, 1: 0.2}
+    assert set(metrics.events) == {("hit", "near", "damaging", 1),
+                                   ("miss", "near", "damaging", 2),
+                                   ("hit", "far", "damaging", 1),
+                                   ("miss", "far", "damaging", 1)}
+    assert near.lookup("enwiki", "damaging", 2) == 0.2
+
+
+def test_from_config():
+    config = {
+        'score_caches': {
+            'near': {
+                'class': 'ores.score_caches.LRU',
+                'size': 128,
+                'ttl': 30
+            },
+            'far': {
+                'class': 'ores.score_caches.LRU',
+                'size': 1024
+            },
+            'two_tier': {
+                'class': 'ores.score_caches.TwoTier',
+                'near': 'near',
+                'far': 'far'
+            }
+        }
+    }
+
+    cache = ScoreCache.from_config(config, "two_tier")
+    assert cache.near.ttl == 30
+    context = cache.context("foo", "bar")
+    context.store(1, "foo")
+    assert context.lookup(1) == "foo"
+
+
+def test_scoring_system_metrics_collector():
+    metrics = TierMetrics()
+    cache = TwoTier(LRU(10), LRU(10))
+    SingleThread({}, score_cache=cache, metrics_collector=metrics)
+
+    with raises(KeyError):
+        cache.lookup("enwiki", "damaging", 1)
+    assert metrics.events == [("miss", "near", "damaging", 1),
+                              ("miss", "far", "damaging", 1)]
@@ -0,0 +1,87 @@
+from pytest import raises
+
+from ores.errors import ScoreProcessorOverloaded
+from ores.score_request import ScoreRequest
+from ores.scoring_systems.admission_controller import AdmissionController
+
+interactive = ScoreRequest("fakewiki", [1], ["fake"])
+precache = ScoreRequest("fakewiki", [1], ["fake"], precache=True)
+
+
+def test_queue_size():
+    queue_sizes = [6]
+    admission_controller = AdmissionController(
+        lambda: queue_sizes[0], 10, precache_fraction=0.5)
+
+    # Precache traffic is shed first
+    admission_controller.admit(interactive)
+    with raises(ScoreProcessorOverloaded) as e:
+        admission_controller.admit(precache)
+    assert e.value.retry_after >= 1
+
+    queue_sizes[0] = 11
+    # The queue size is cached
+    admission_controller.admit(interactive)
+
+    admission_controller._queue_size_checked -= 1
+    with raises(ScoreProcessorOverloaded):
+        admission_controller.admit(interactive)
+
+
+def test_enqueued():
+    admission_controller = AdmissionController(
+        lambda: 0, 10, queue_size_ttl=60)
+
+    admission_controller.admit(interactive)
+    admission_controller.enqueued(11)
+    with raises(ScoreProcessorOverloaded):
+        admission_controller.admit(interactive)
+
+
+def test_queue_wait():
+    queue_sizes = [1]
+    admission_controller = AdmissionController(
+        lambda: queue_sizes[0], 100, max_queue_wait=10, queue_size_ttl=0)
+
+    admission_controller.observe(6, 1)
+    assert admission_controller.service_time == 1
+    admission_controller.admit(interactive)
+    with raises(ScoreProcessorOverloaded) as e:
+        admission_controller.admit(precache)
+    assert e.value.retry_after == 1
+
+    admission_controller.observe(40)
+    assert admission_controller.wait_time == 6 + 0.2 * (40 - 6)
+    with raises(ScoreProcessorOverloaded) as e:
+        admission_controller.admit(interactive)
+    assert e.value.retry_after == 3
+
+    # Nothing is waiting so the observed wait is stale
+    queue_sizes[0] = 0
+    admission_controller.admit(interactive)
+
+
+def test_retry_after():
+    admission_controller = AdmissionController(lambda: 200, 100)
+    with raises(ScoreProcessorOverloaded) as e:
+        admission_controller.admit(interactive)
+    assert e.value.retry_after == 5
+
+    admission_controller.observe(30)
+    with raises(ScoreProcessorOverloaded) as e:
+        admission_controller.admit(interactive)
+    # Half of the queue needs to drain
+    assert e.value.retry_after == 15
+
+    admission_controller.observe(30, 2)
+    with raises(ScoreProcessorOverloaded) as e:
+        admission_controller.admit(interactive)
+    # 100 excess tasks, one at a time, is capped
+    assert e.value.retry_after == 60
+
+    admission_controller = AdmissionController(lambda: 200, 100, workers=8)
+    admission_controller.observe(30, 2)
+    with raises(ScoreProcessorOverloaded) as e:
+        admission_controller.admit(interactive)
+    # 100 excess tasks, 8 at a time, 2 seconds each
+    assert e.value.retry_after == 25
@@ -1,13 +1,23 @@
+import functools
+import threading
+import time
+
 import celery
+from pytest import raises
 from revscoring.extractors import OfflineExtractor
 
+from ores import errors
+from ores.root_cache_store import InMemoryRootCacheStore
+from ores.score_caches import LRU
 from ores.score_request import ScoreRequest
+from ores.score_response import ScoreResponse
 from ores.scoring.models import RevIdScorer
 from ores.scoring_context import ScoringContext
+from ores.scoring_systems.admission_controller import AdmissionController
 from ores.scoring_systems.celery_queue import CeleryQueue
 from ores.task_tracker import InMemoryTaskTracker
 
-from .util import fakewiki
+from .util import fakewiki, wait_time
 
 
 def test_score():
@@ -91,3 +101,249 @@ def test_locking():
     assert 'revid' in key
     assert '0.0.1' in key
     assert '123' in key
+
+
+def test_batch_rev_ids():
+    application = celery.Celery(__name__)
+    application.conf.worker_concurrency = 2
+    scoring_system = CeleryQueue(
+        {'fakewiki': fakewiki}, application=application, batch_size=2)
+
+    assert scoring_system._batch_rev_ids([1]) == [[1]]
+    # Spread over worker_concurrency
+    assert scoring_system._batch_rev_ids([1, 2, 3]) == [[1, 2], [3]]
+    # No bigger than batch_size
+    assert scoring_system._batch_rev_ids([1, 2, 3, 4, 5]) == \
+        [[1, 2], [3, 4], [5]]
+
+
+def test_batch_result():
+    application = celery.Celery(__name__)
+    application.conf.result_serializer = 'json'
+    scoring_system = CeleryQueue(
+        {'fakewiki': fakewiki}, application=application)
+
+    task_result = scoring_system._format_batch_result(
+        {1: {'fake': {'score': True}}},
+        {2: errors.TimeoutError("Timed out")})
+    rev_scores, rev_errors = scoring_system._read_batch_result(task_result)
+
+    assert rev_scores == {1: {'fake': {'score': True}}}
+    assert isinstance(rev_errors[2], errors.TimeoutError)
+    assert str(rev_errors[2]) == "Timed out"
+
+
+def test_batched_score():
+    application = celery.Celery(__name__)
+    application.conf.update(task_always_eager=True, worker_concurrency=2,
+                            task_serializer='pickle',
+                            accept_content=['pickle', 'json'],
+                            result_backend='cache+memory://')
+    scoring_system = CeleryQueue(
+        {'fakewiki': fakewiki}, application=application, timeout=5,
+        batch_size=2)
+
+    rev_ids = [1, 2, 3, 4, 5]
+    response = scoring_system.score(
+        ScoreRequest("fakewiki", rev_ids, ["fake", "other_fake"],
+                     injection_caches={rev_id: {wait_time: 0.0}
+                                       for rev_id in rev_ids}))
+    assert response.errors == {}
+    assert response.scores == {rev_id: {'fake': True, 'other_fake': True}
+                               for rev_id in rev_ids}
+
+
+def test_root_cache_store():
+    application = celery.Celery(__name__)
+    application.conf.update(task_always_eager=True,
+                            task_serializer='pickle',
+                            accept_content=['pickle', 'json'])
+    root_cache_store = InMemoryRootCacheStore()
+    scoring_system = CeleryQueue(
+        {'fakewiki': fakewiki}, application=application, timeout=5,
+        root_cache_store=root_cache_store)
+
+    response = scoring_system.score(
+        ScoreRequest("fakewiki", [1, 2], ["fake"],
+                     injection_caches={1: {wait_time: 0.0},
+                                       2: {wait_time: 0.0}}))
+    assert response.errors == {}
+    assert response.scores == {1: {'fake': True}, 2: {'fake': True}}
+    # Root caches went through the store rather than the task message
+    assert len(root_cache_store.values) > 0
+
+    # Root caches are kept until the task would be past its deadline
+    assert scoring_system._root_cache_ttl(2) == 20
+    scoring_system.max_queue_wait = 3
+    assert scoring_system._root_cache_ttl(2) == 13
+
+
+def test_admission():
+    application = celery.Celery(__name__)
+    application.conf.update(task_always_eager=True,
+                            task_serializer='pickle',
+                            accept_content=['pickle', 'json'])
+    scoring_system = CeleryQueue(
+        {'fakewiki': fakewiki}, application=application, timeout=5,
+        score_cache=LRU(size=10))
+    queue_sizes = [0]
+    scoring_system.admission_controllers['celery'] = AdmissionController(
+        lambda: queue_sizes[0], 10, queue_size_ttl=0)
+
+    response = scoring_system.score(
+        ScoreRequest("fakewiki", [1], ["fake"],
+                     injection_caches={1: {wait_time: 0.0}}))
+    assert response.scores == {1: {'fake': True}}
+    # Worker time was observed
+    assert scoring_system.admission_controllers['celery'].service_time \
+        is not None
+
+    queue_sizes[0] = 11
+    # Cached scores don't need the queue
+    response = scoring_system.score(
+        ScoreRequest("fakewiki", [1], ["fake"],
+                     injection_caches={1: {wait_time: 0.0}}))
+    assert response.scores == {1: {'fake': True}}
+
+    with raises(errors.ScoreProcessorOverloaded):
+        scoring_system.score(
+            ScoreRequest("fakewiki", [2], ["fake"],
+                         injection_caches={2: {wait_time: 0.0}}))
+
+
+def test_queue_routes():
+    application = celery.Celery(__name__)
+    scoring_system = CeleryQueue(
+        {'fakewiki': fakewiki}, application=application,
+        precache_queue="precache",
+        queue_routes={'fakewiki': "fakewiki",
+                      'fakewiki:other_fake': "other_fake"})
+
+    def queue_for(model_names, precache=False):
+        request = ScoreRequest("fakewiki", [1], model_names,
+                               precache=precache)
+        return scoring_system._queue_for(request, frozenset(model_names))
+
+    assert queue_for(["fake"]) == "fakewiki"
+    assert queue_for(["fake", "other_fake"]) == "other_fake"
+    assert queue_for(["fake"], precache=True) == "precache"
+    other_request = ScoreRequest("otherwiki", [1], ["fake"])
+    assert scoring_system._queue_for(other_request, {"fake"}) == "celery"
+
+    # Workers only consume the default queue unless they are told otherwise
+    assert [queue.name for queue in application.conf.task_queues] == \
+        ["celery"]
+
+    application = celery.Celery(__name__)
+    CeleryQueue({'fakewiki': fakewiki}, application=application,
+                precache_queue="precache", worker_queues=["precache"])
+    assert [queue.name for queue in application.conf.task_queues] == \
+        ["precache"]
+
+
+def test_admission_per_queue():
+    application = celery.Celery(__name__)
+    scoring_system = CeleryQueue(
+        {'fakewiki': fakewiki}, application=application,
+        precache_queue="precache")
+    queue_sizes = {'celery': 0, 'precache': 11}
+    for queue in ['celery', 'precache']:
+        scoring_system.admission_controllers[queue] = AdmissionController(
+            functools.partial(queue_sizes.get, queue), 10)
+
+    missing_model_set_revs = {frozenset(["fake"]): [1]}
+    # A backed up precache queue doesn't hold up interactive requests
+    scoring_system._admit(ScoreRequest("fakewiki", [1], ["fake"]),
+                          missing_model_set_revs)
+    with raises(errors.ScoreProcessorOverloaded):
+        scoring_system._admit(
+            ScoreRequest("fakewiki", [1], ["fake"], precache=True),
+            missing_model_set_revs)
+
+
+def test_wait_for_tasks():
+    application = celery.Celery(__name__)
+    application.conf.result_backend = 'cache+memory://'
+    scoring_system = CeleryQueue(
+        {'fakewiki': fakewiki}, application=application)
+    application.backend.store_result(
+        'done', scoring_system._format_batch_result(
+            {1: {'fake': {'score': True}}, 2: {'fake': {'score': True}}}, {}),
+        celery.states.SUCCESS)
+    application.backend.store_result(
+        'failed', errors.TimeoutError("Timed out"), celery.states.FAILURE)
+
+    task_results = scoring_system._wait_for_tasks(
+        {task_id: application.AsyncResult(task_id)
+         for task_id in ['done', 'failed', 'pending', 'inherited']},
+        {'done': 1, 'failed': 3, 'pending': 4, 'inherited': 5}, 0.1,
+        sent_tasks={'pending': ("celery", time.time())})
+
+    assert task_results['done'] == (
+        {1: {'fake': {'score': True}}, 2: {'fake': {'score': True}}}, {}, None)
+    assert isinstance(task_results['failed'][2], errors.TimeoutError)
+    # Never finished before the deadline
+    assert isinstance(task_results['pending'][2], errors.TimeoutError)
+    assert application.AsyncResult('pending').state == celery.states.FAILURE
+    # Another request's task is left for that request to wait on
+    assert isinstance(task_results['inherited'][2], errors.TimeoutError)
+    assert application.AsyncResult('inherited').state == celery.states.PENDING
+
+
+def test_tracked_batch_size():
+    application = celery.Celery(__name__)
+    application.conf.update(result_backend='cache+memory://')
+    scoring_system = CeleryQueue(
+        {'fakewiki': fakewiki}, application=application,
+        task_tracker=InMemoryTaskTracker())
+    request = ScoreRequest("fakewiki", [1, 2], ["fake"])
+
+    scoring_system._lock_process(["fake"], 1, request, None, "batch",
+                                 batch_size=4)
+    scoring_system._lock_process(["fake"], 2, request, None, "single")
+    inprogress_results = scoring_system._lookup_inprogress_results(
+        request, ScoreResponse(fakewiki, request))
+
+    assert inprogress_results[1]['fake'].id == "batch"
+    assert inprogress_results[1]['fake'].batch_size == 4
+    assert inprogress_results[2]['fake'].id == "single"
+    assert inprogress_results[2]['fake'].batch_size == 1
+
+
+def test_overlapping_requests():
+    application = celery.Celery(__name__)
+    application.conf.update(task_always_eager=True,
+                            task_store_eager_result=True,
+                            task_serializer='pickle',
+                            accept_content=['pickle', 'json'],
+                            result_backend='cache+memory://')
+    scoring_system = CeleryQueue(
+        {'fakewiki': fakewiki}, application=application, timeout=0.25,
+        task_tracker=InMemoryTaskTracker(), batch_size=1)
+
+    # Another request sent a batch of 4 that scores rev 1.  It finishes after
+    # the wait for a single revision (0.25s) but well within the wait for a
+    # batch of 4.
+    other_request = ScoreRequest("fakewiki", [1, 2, 3, 4], ["fake"])
+    scoring_system._lock_process(["fake"], 1, other_request, None, "batch",
+                                 batch_size=4)
+
+    def finish_batch():
+        time.sleep(0.75)
+        application.backend.store_result(
+            "batch", scoring_system._format_batch_result(
+                {rev_id: {'fake': {'score': True}}
+                 for rev_id in [1, 2, 3, 4]}, {}),
+            celery.states.SUCCESS)
+    finisher = threading.Thread(target=finish_batch)
+    finisher.start()
+
+    # This request sends its own batch of 1 for rev 5
+    response = scoring_system.score(
+        ScoreRequest("fakewiki", [1, 5], ["fake"],
+                     injection_caches={5: {wait_time: 0.01}}))
+    finisher.join()
+
+    assert response.errors == {}
+    assert response.scores == {1: {'fake': True}, 5: {'fake': True}}
+    assert application.AsyncResult("batch").state == celery.states.SUCCESS
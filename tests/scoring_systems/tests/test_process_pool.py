@@ -7,7 +7,8 @@ from ores.scoring.models import RevIdScorer
 from ores.scoring_context import ScoringContext
 from ores.scoring_systems.process_pool import ProcessPool
 
-from .util import fakewiki, test_scoring_system, wait_time
+from .util import (fakewiki, test_scoring_system, test_scoring_system_async,
+                   wait_time)
 
 
 def test_score():
@@ -17,6 +18,14 @@ def test_score():
     test_scoring_system(scoring_system)
 
 
+def test_score_async():
+    scoring_system = ProcessPool({'fakewiki': fakewiki}, workers=2,
+                                 timeout=1.0)
+
+    test_scoring_system_async(scoring_system)
+    scoring_system.close()
+
+
 def test_rev_id_scorer():
     revid = RevIdScorer(version='0.0.1')
     fakewiki = ScoringContext(
@@ -41,3 +50,66 @@ def test_timeout():
     assert 1 in response.errors, str(response.errors)
     assert isinstance(response.errors[1]['fake'], errors.TimeoutError), \
            type(response.errors[1]['fake'])
+
+
+def test_reuses_pool():
+    scoring_system = ProcessPool({'fakewiki': fakewiki}, workers=2)
+
+    test_scoring_system(scoring_system)
+    executor = scoring_system._executor
+    assert executor is not None
+
+    test_scoring_system(scoring_system)
+    assert scoring_system._executor is executor
+
+    scoring_system.close()
+    assert scoring_system._executor is None
+
+
+def test_recycles_pool():
+    scoring_system = ProcessPool({'fakewiki': fakewiki}, workers=1,
+                                 max_tasks_per_worker=1)
+
+    response = scoring_system.score(
+        ScoreRequest("fakewiki", [1], ["fake"],
+                     injection_caches={1: {wait_time: 0.01}}))
+    assert response.scores == {1: {'fake': True}}
+    executor = scoring_system._executor
+
+    response = scoring_system.score(
+        ScoreRequest("fakewiki", [2], ["fake"],
+                     injection_caches={2: {wait_time: 0.01}}))
+    assert response.scores == {2: {'fake': True}}
+    assert scoring_system._executor is not executor
+
+    scoring_system.close()
+
+
+def test_batches_revisions():
+    scoring_system = ProcessPool({'fakewiki': fakewiki}, workers=2)
+
+    response = scoring_system.score(
+        ScoreRequest("fakewiki", [1, 2, 3, 4, 5], ["fake"],
+                     injection_caches={rev_id: {wait_time: 0.01}
+                                       for rev_id in [1, 2, 3, 4, 5]}))
+    assert response.scores == {rev_id: {'fake': True}
+                               for rev_id in [1, 2, 3, 4, 5]}
+    # One task per worker rather than one per revision
+    assert scoring_system._executor_tasks == 2
+
+    scoring_system.close()
+
+
+def test_trace():
+    scoring_system = ProcessPool({'fakewiki': fakewiki}, workers=2)
+    request = ScoreRequest("fakewiki", [1, 2], ["fake"],
+                           injection_caches={1: {wait_time: 0.01},
+                                             2: {wait_time: 0.01}})
+    scoring_system.score(request)
+    scoring_system.close()
+
+    # Spans recorded in the workers make it back to the request
+    names = [span['name'] for span in request.trace.spans]
+    assert 'solve_features' in names
+    assert 'predict' in names
+    assert names[-3:] == ['process', 'cache_store', 'flight_wait']
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+from pytest import raises
+
+from ores import errors
+from ores.score_request import ScoreRequest
+from ores.scoring_context import ScoringContext
+from ores.scoring_systems.single_flight import SingleFlight
+from ores.scoring_systems.single_thread import SingleThread
+
+from .util import FakeExtractor, FakeSM, wait_time
+
+
+def test_single_flight():
+    single_flight = SingleFlight()
+
+    flight, leader = single_flight.claim("foo")
+    assert leader
+    same_flight, leader = single_flight.claim("foo")
+    assert not leader
+    assert same_flight is flight
+
+    single_flight.resolve("foo", result=10)
+    assert flight.wait() == 10
+    assert len(single_flight) == 0
+
+    flight, leader = single_flight.claim("foo")
+    assert leader
+    single_flight.resolve("foo", error=RuntimeError("derp"))
+    with raises(RuntimeError):
+        flight.wait()
+
+
+def test_wait_timeout():
+    single_flight = SingleFlight()
+    flight, _ = single_flight.claim("foo")
+    with raises(errors.TimeoutError):
+        flight.wait(0.01)
+
+
+class CountingSM(FakeSM):
+
+    def __init__(self):
+        super().__init__()
+        self.scored = 0
+
+    def score(self, feature_values):
+        self.scored += 1
+        return True
+
+
+def test_concurrent_requests():
+    model = CountingSM()
+    fakewiki = ScoringContext("fakewiki", {'fake': model}, FakeExtractor())
+    scoring_system = SingleThread({'fakewiki': fakewiki})
+
+    responses = []
+
+    def score():
+        responses.append(scoring_system.score(
+            ScoreRequest("fakewiki", [1], ["fake"],
+                         injection_caches={1: {wait_time: 0.2}})))
+
+    threads = [threading.Thread(target=score) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.scored == 1
+    assert [response.scores for response in responses] == \
+        [{1: {'fake': True}}] * 4
+    assert len(scoring_system.single_flight) == 0
+
+
+def test_follower_deadline():
+    model = CountingSM()
+    fakewiki = ScoringContext("fakewiki", {'fake': model}, FakeExtractor())
+    scoring_system = SingleThread({'fakewiki': fakewiki}, timeout=0.3)
+    responses = {}
+    durations = {}
+
+    def score(name, rev_ids):
+        start = time.monotonic()
+        responses[name] = scoring_system.score(
+            ScoreRequest("fakewiki", rev_ids, ["fake"],
+                         injection_caches={rev_id: {wait_time: 0.25}
+                                           for rev_id in rev_ids}))
+        durations[name] = time.monotonic() - start
+
+    leader = threading.Thread(target=score, args=("leader", [1, 2, 3]))
+    follower = threading.Thread(target=score, args=("follower", [1, 2, 3]))
+    leader.start()
+    time.sleep(0.05)
+    follower.start()
+    leader.join()
+    follower.join()
+
+    assert responses['leader'].errors == {}
+    # The follower gave up on all three flights after one timeout rather than
+    # one timeout per flight, and didn't repeat the leader's work
+    assert durations['follower'] < 0.6
+    assert set(responses['follower'].errors) == {1, 2, 3}
+    assert all(isinstance(errors_['fake'], errors.TimeoutError)
+               for errors_ in responses['follower'].errors.values())
+    assert model.scored == 3
+
+
+def test_wait_async():
+    single_flight = SingleFlight()
+    flight, _ = single_flight.claim("foo")
+
+    with raises(errors.TimeoutError):
+        asyncio.run(flight.wait_async(0.01))
+
+    threading.Timer(0.05, single_flight.resolve, args=("foo",),
+                    kwargs={'result': 10}).start()
+    assert asyncio.run(flight.wait_async(5)) == 10
+    # Already resolved
+    assert asyncio.run(flight.wait_async(0)) == 10
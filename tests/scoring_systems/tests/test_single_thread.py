@@ -1,8 +1,14 @@
+import asyncio
+import time
+
 from ores import errors
+from ores.metrics_collectors import Null
 from ores.score_request import ScoreRequest
+from ores.scoring_context import ScoringContext
 from ores.scoring_systems.single_thread import SingleThread
 
-from .util import fakewiki, test_scoring_system, wait_time
+from .util import (FakeExtractor, FakeSM, fakewiki, test_scoring_system,
+                   test_scoring_system_async, wait_time)
 
 
 def test_score():
@@ -11,6 +17,12 @@ def test_score():
     test_scoring_system(scoring_system)
 
 
+def test_score_async():
+    scoring_system = SingleThread({'fakewiki': fakewiki}, timeout=0.10)
+
+    test_scoring_system_async(scoring_system)
+
+
 def test_single_thread():
     scoring_system = SingleThread({'fakewiki': fakewiki}, timeout=1.0)
 
@@ -20,3 +32,106 @@ def test_single_thread():
     assert 1 in response.errors, str(response.errors)
     assert isinstance(response.errors[1]['fake'], errors.TimeoutError), \
            type(response.errors[1]['fake'])
+
+
+def test_batch_isolation():
+    scoring_system = SingleThread({'fakewiki': fakewiki}, timeout=1.0)
+    start = time.monotonic()
+    response = scoring_system.score(
+        ScoreRequest("fakewiki", [1, 2], ["fake"],
+                     injection_caches={1: {wait_time: 0.05},
+                                       2: {wait_time: 2.5}}))
+
+    # Rev 2 only gets its own timeout and only it times out
+    assert time.monotonic() - start < 2
+    assert response.scores == {1: {'fake': True}}
+    assert list(response.errors.keys()) == [2]
+    assert isinstance(response.errors[2]['fake'], errors.TimeoutError)
+
+
+class BrokenBatchSM(FakeSM):
+
+    def score_many(self, feature_values):
+        raise RuntimeError("Can't score a batch")
+
+
+class CountingExtractor(FakeExtractor):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.solved = 0
+
+    def solve(self, *args, **kwargs):
+        self.solved += 1
+        return super().solve(*args, **kwargs)
+
+
+def test_batch_failure():
+    extractor = CountingExtractor()
+    brokenwiki = ScoringContext(
+        "brokenwiki", {'fake': BrokenBatchSM()}, extractor)
+    scoring_system = SingleThread({'brokenwiki': brokenwiki})
+    response = scoring_system.score(
+        ScoreRequest("brokenwiki", [1, 2], ["fake"],
+                     injection_caches={1: {wait_time: 0},
+                                       2: {wait_time: 0}}))
+
+    assert response.errors == {}
+    assert response.scores == {1: {'fake': True}, 2: {'fake': True}}
+    # Features solved for the batch are reused to score each revision
+    assert extractor.solved == 2
+
+
+def test_score_async_off_loop():
+    scoring_system = SingleThread({'fakewiki': fakewiki}, timeout=0.10)
+    finished = []
+
+    async def tick():
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+        finished.append('tick')
+
+    async def score(request):
+        response = await scoring_system.score_async(request)
+        finished.append(request.rev_ids)
+        return response
+
+    async def score_while_ticking():
+        return await asyncio.gather(
+            score(ScoreRequest("fakewiki", [1], ["fake"],
+                               injection_caches={1: {wait_time: 0.05}})),
+            score(ScoreRequest("fakewiki", [2], ["fake"],
+                               injection_caches={2: {wait_time: 0.5}})),
+            tick())
+
+    response, timed_out_response, _ = asyncio.run(score_while_ticking())
+    # The event loop kept running while scores were generated
+    assert finished.index('tick') < finished.index({2})
+    assert response.scores == {1: {'fake': True}}
+    # Timeouts work outside of the main thread
+    assert isinstance(timed_out_response.errors[2]['fake'],
+                      errors.TimeoutError)
+
+
+def test_trace():
+    stages = []
+
+    class Collector(Null):
+        def stage_timed(self, request, stage, duration, model_names=None):
+            stages.append((stage, model_names))
+
+    scoring_system = SingleThread({'fakewiki': fakewiki},
+                                  metrics_collector=Collector())
+    request = ScoreRequest("fakewiki", [1, 2], ["fake"],
+                           injection_caches={1: {wait_time: 0.01},
+                                             2: {wait_time: 0.01}},
+                           model_info=['version'], include_trace=True)
+    scoring_system.score(request)
+
+    assert stages == [
+        ('model_info', None), ('cache_lookup', None),
+        ('inprogress_lookup', None), ('register', None), ('extract', None),
+        ('solve_features', ["fake"]), ('predict', ["fake"]),
+        ('process', None), ('cache_store', None), ('flight_wait', None)]
+    assert [span['name'] for span in request.trace.spans] == \
+        [stage for stage, _ in stages]
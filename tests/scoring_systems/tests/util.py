@@ -1,3 +1,4 @@
+import asyncio
 import time
 
 from pytest import mark
@@ -69,3 +70,28 @@ def test_scoring_system(scoring_system):
     assert response.model_info == \
         {'fake': {'version': 'fake version'},
          'other_fake': {'version': 'fake version'}}
+
+
+@mark.skip('Not test')
+def test_scoring_system_async(scoring_system):
+
+    async def score_concurrently():
+        return await asyncio.gather(
+            scoring_system.score_async(
+                ScoreRequest("fakewiki", [1], ["fake"],
+                             injection_caches={1: {wait_time: 0.05}},
+                             model_info=['version'])),
+            scoring_system.score_async(
+                ScoreRequest("fakewiki", [1, 2], ["fake", "other_fake"],
+                             injection_caches={1: {wait_time: 0.05},
+                                               2: {wait_time: 0.01}})))
+
+    response, other_response = asyncio.run(score_concurrently())
+    assert response.errors == {}
+    assert response.scores == {1: {'fake': True}}
+    assert response.model_info == {'fake': {'version': 'fake version'}}
+
+    assert other_response.errors == {}
+    assert other_response.scores == \
+        {1: {'fake': True, 'other_fake': True},
+         2: {'fake': True, 'other_fake': True}}
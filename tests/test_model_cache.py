@@ -0,0 +1,146 @@
+import os
+import pickle
+
+from revscoring.scoring.environment import Environment
+
+from ores.model_cache import MB, LazyModel, ModelCache
+from ores.scoring.models import RevIdScorer
+from ores.scoring_context import ScoringContext
+
+
+class FakeModel:
+    def __init__(self, key, size):
+        self.key = key
+        self.version = "0.0.1"
+        self.info = {'key': key}
+        self.features = []
+        self.payload = b"x" * size
+
+    def score(self, feature_values):
+        return self.key
+
+
+def load_fake(key):
+    return FakeModel(key, MB)
+
+
+def size_fake(key):
+    return MB
+
+
+def test_model_cache():
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        return FakeModel(key, MB)
+
+    model_cache = ModelCache(load, size_fake, max_memory=2.5)
+    model_cache.pin("a")
+    model_cache.get("b")
+    model_cache.get("b")
+    assert loads == ["a", "b"]
+
+    # Over budget, so the least recently used model that isn't pinned goes
+    model_cache.get("c")
+    assert "a" in model_cache
+    assert "b" not in model_cache
+    assert "c" in model_cache
+
+    model_cache.get("b")
+    assert loads == ["a", "b", "c", "b"]
+    assert "a" in model_cache
+    assert "c" not in model_cache
+
+
+def test_lazy_model():
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        return FakeModel(key, MB)
+
+    model_cache = ModelCache(load, size_fake, max_memory=1.5)
+    a = LazyModel(model_cache, "a")
+    b = LazyModel(model_cache, "b")
+    assert loads == []
+
+    assert a.score({}) == "a"
+    assert b.version == "0.0.1"
+    assert "a" not in model_cache
+
+    # Remembered metadata doesn't reload an evicted model
+    assert a.info == {'key': "a"}
+    assert loads == ["a", "b"]
+
+
+def test_pickle_lazy_model():
+    model_cache = ModelCache(load_fake, size_fake)
+    a = LazyModel(model_cache, "a")
+    assert a.score({}) == "a"
+
+    # Loaded models stay behind
+    a = pickle.loads(pickle.dumps(a))
+    assert "a" not in a.model_cache
+    assert a.score({}) == "a"
+
+
+def test_map_from_config():
+    config = {
+        'scoring_contexts': {
+            'testwiki': {
+                'extractor': "offline",
+                'scorer_models': {'revid': "testwiki_revid",
+                                  'revid2': "testwiki_revid"}
+            }
+        },
+        'extractors': {
+            'offline': {'class': "revscoring.extractors.OfflineExtractor"}
+        },
+        'scorer_models': {
+            'testwiki_revid': {'class': "ores.scoring.models.RevIdScorer",
+                               'version': "0.0.0"}
+        }
+    }
+    context_map = ScoringContext.map_from_config(
+        config, ['testwiki'], lazy_models={'max_memory': 100})
+    scoring_context = context_map['testwiki']
+    assert isinstance(scoring_context['revid'], LazyModel)
+    assert scoring_context['revid'] is scoring_context['revid2']
+    assert "testwiki_revid" not in scoring_context['revid'].model_cache
+
+    assert scoring_context.model_version('revid') == "0.0.0"
+    assert isinstance(scoring_context['revid'].model, RevIdScorer)
+
+    context_map = ScoringContext.map_from_config(
+        config, ['testwiki'], lazy_models={'preload': ["testwiki:revid"]})
+    scoring_context = context_map['testwiki']
+    assert "testwiki_revid" in scoring_context['revid'].model_cache
+
+
+def test_model_file_size(tmpdir):
+    model_path = str(tmpdir.join("revid.model"))
+    model = RevIdScorer(version="0.0.1")
+    model.info['environment'] = Environment()
+    with open(model_path, 'wb') as f:
+        pickle.dump(model, f)
+    config = {
+        'scoring_contexts': {
+            'testwiki': {'extractor': "offline",
+                         'scorer_models': {'revid': "testwiki_revid"}}
+        },
+        'extractors': {
+            'offline': {'class': "revscoring.extractors.OfflineExtractor"}
+        },
+        'scorer_models': {
+            'testwiki_revid': {'class': "ores.scoring.models.RevIdScorer",
+                               'model_file': model_path}
+        }
+    }
+    context_map = ScoringContext.map_from_config(
+        config, ['testwiki'], lazy_models={'max_memory': 100})
+    model = context_map['testwiki']['revid']
+
+    assert model.version == "0.0.1"
+    # Counted by the size of its model file
+    assert model.model_cache.memory == os.path.getsize(model_path)
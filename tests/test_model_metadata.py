@@ -0,0 +1,116 @@
+import os
+import pickle
+
+from revscoring.scoring.environment import Environment
+
+from ores import model_metadata
+from ores.scoring.models import RevIdScorer
+from ores.scoring_context import ClientScoringContext, ScoringContext
+from ores.utilities import snapshot_models
+
+
+def dump_model(path, version):
+    model = RevIdScorer(version=version)
+    model.info['environment'] = Environment()
+    with open(path, 'wb') as f:
+        pickle.dump(model, f)
+
+
+def make_config(tmpdir):
+    model_path = str(tmpdir.join("revid.model"))
+    dump_model(model_path, "0.0.1")
+    snapshot_dir = tmpdir.mkdir("metadata")
+    return {
+        'ores': {'data_paths': {'model_metadata': str(snapshot_dir)}},
+        'scoring_contexts': {
+            'testwiki': {
+                'extractor': "offline",
+                'scorer_models': {'revid': "testwiki_revid",
+                                  'revid2': "testwiki_revid2"}
+            }
+        },
+        'extractors': {
+            'offline': {'class': "revscoring.extractors.OfflineExtractor"}
+        },
+        'scorer_models': {
+            'testwiki_revid': {'class': "ores.scoring.models.RevIdScorer",
+                               'model_file': model_path},
+            'testwiki_revid2': {'class': "ores.scoring.models.RevIdScorer",
+                                'version': "0.0.2"}
+        }
+    }
+
+
+def test_snapshot(tmpdir):
+    config = make_config(tmpdir)
+    directory = model_metadata.snapshot_dir(config)
+    assert model_metadata.read_snapshot(
+        directory, config, "testwiki_revid") is None
+
+    snapshot_models.run(config, directory, workers=1)
+    snapshot = model_metadata.read_snapshot(
+        directory, config, "testwiki_revid")
+    assert snapshot['version'] == "0.0.1"
+    assert "datasource.revision.id" in snapshot['root_datasource_names']
+    # Models that aren't loaded from a file don't get a snapshot
+    assert model_metadata.read_snapshot(
+        directory, config, "testwiki_revid2") is None
+
+    # A changed model file makes the snapshot stale
+    dump_model(config['scorer_models']['testwiki_revid']['model_file'],
+               "0.0.30")
+    assert model_metadata.read_snapshot(
+        directory, config, "testwiki_revid") is None
+
+
+def test_snapshot_unchanged_file(tmpdir, monkeypatch):
+    config = make_config(tmpdir)
+    directory = model_metadata.snapshot_dir(config)
+    snapshot_models.run(config, directory, workers=1)
+    model_path = config['scorer_models']['testwiki_revid']['model_file']
+
+    hashed = []
+    model_file_hash = model_metadata.model_file_hash
+
+    def tracking_hash(config, key):
+        hashed.append(key)
+        return model_file_hash(config, key)
+
+    monkeypatch.setattr(model_metadata, 'model_file_hash', tracking_hash)
+
+    # The model file isn't read while its size and mtime are the same
+    assert model_metadata.read_snapshot(
+        directory, config, "testwiki_revid") is not None
+    assert hashed == []
+
+    # Touched, but the same content
+    stat = os.stat(model_path)
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert model_metadata.read_snapshot(
+        directory, config, "testwiki_revid") is not None
+    assert hashed == ["testwiki_revid"]
+
+
+def test_client_scoring_context(tmpdir, monkeypatch):
+    config = make_config(tmpdir)
+    snapshot_models.run(config, model_metadata.snapshot_dir(config))
+
+    loaded = []
+    load = ClientScoringContext.ModelLoader.load
+
+    def tracking_load(self, config, key):
+        loaded.append(key)
+        return load(self, config, key)
+
+    # Keep loading in this process so that loads can be counted
+    monkeypatch.setattr(ClientScoringContext.ModelLoader, 'load',
+                        tracking_load)
+    monkeypatch.setattr(
+        ScoringContext.ModelLoader, 'load_many',
+        lambda self, config, keys, workers=None:
+            {key: self.load(config, key) for key in keys})
+
+    context_map = ClientScoringContext.map_from_config(config, ['testwiki'])
+    assert loaded == ["testwiki_revid2"]
+    assert context_map['testwiki'].model_version('revid') == "0.0.1"
+    assert context_map['testwiki'].model_version('revid2') == "0.0.2"
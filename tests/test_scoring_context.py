@@ -68,3 +68,169 @@ def test_scoring_context():
     score = scoring_context.process_model_scores(
         ["fake"], {characters: 10, is_fake: False})
     assert score['fake']['score']['prediction'] == "generated"
+
+
+def test_extract_model_set_root_caches():
+    from revscoring.datasources import Datasource
+    from revscoring.features import Feature
+
+    text = Datasource("text")
+    user = Datasource("user")
+    chars = Feature("chars", len, returns=int, depends_on=[text])
+    user_chars = Feature("user_chars", len, returns=int, depends_on=[user])
+
+    extract_calls = []
+
+    def fake_extract(rev_ids, dependents, caches=None):
+        extract_calls.append((list(rev_ids), set(dependents)))
+        for rev_id in rev_ids:
+            yield None, [str(rev_id) for _ in dependents]
+
+    FakeExtractor = namedtuple("Extractor", ['extract', 'solve', 'language'])
+    extractor = FakeExtractor(fake_extract, None, None)
+
+    FakeScorerModel = namedtuple("FakeScorerModel",
+                                 ['score', 'version', 'language', 'features'])
+    scoring_context = ScoringContext(
+        "fakewiki",
+        {"text_model": FakeScorerModel(None, "1", None, [chars]),
+         "user_model": FakeScorerModel(None, "1", None, [chars, user_chars])},
+        extractor)
+
+    root_caches, errors = scoring_context.extract_model_set_root_caches(
+        {frozenset(["text_model", "user_model"]): [1],
+         frozenset(["text_model"]): [2]})
+
+    assert len(extract_calls) == 1
+    assert sorted(extract_calls[0][0]) == [1, 2]
+    assert extract_calls[0][1] == {text, user}
+    assert errors == {}
+    assert root_caches == {1: {text: "1", user: "1"}, 2: {text: "2"}}
+
+
+def test_dependency_plans():
+    from revscoring.datasources import Datasource
+    from revscoring.features import Feature
+
+    text = Datasource("text")
+    user = Datasource("user")
+    chars = Feature("chars", len, returns=int, depends_on=[text])
+    user_chars = Feature("user_chars", len, returns=int, depends_on=[user])
+
+    FakeScorerModel = namedtuple("FakeScorerModel",
+                                 ['score', 'version', 'language', 'features'])
+    scoring_context = ScoringContext(
+        "fakewiki",
+        {"text_model": FakeScorerModel(None, "1", None, [chars]),
+         "user_model": FakeScorerModel(None, "1", None,
+                                       [chars, chars + user_chars])},
+        None)
+    scoring_context.prepare_dependency_plans()
+
+    root_datasources = scoring_context.root_datasources(["user_model"])
+    assert set(root_datasources) == {text, user}
+    assert len(root_datasources) == 2
+    # Memoized by the set of model names
+    assert scoring_context.root_datasources({"user_model"}) is \
+        root_datasources
+    assert set(scoring_context.root_datasources(["text_model"])) == {text}
+
+    assert set(scoring_context.base_features("user_model")) == \
+        {chars, user_chars}
+    assert scoring_context.base_features("user_model") is \
+        scoring_context.base_features("user_model")
+
+
+def test_process_model_scores_batch():
+    from revscoring.datasources import Datasource
+    from revscoring.features import Feature
+
+    text = Datasource("text")
+    chars = Feature("chars", len, returns=int, depends_on=[text])
+
+    class FakeScorerModel:
+        version = "1"
+        language = None
+        features = [chars]
+        scaler = None
+
+        def __init__(self):
+            self.batches = []
+
+        def score(self, feature_values):
+            raise AssertionError("Should have been scored in a batch")
+
+        def score_many(self, feature_values):
+            self.batches.append(list(feature_values))
+            return [{"prediction": values[0] > 3}
+                    for values in feature_values]
+
+    FakeExtractor = namedtuple("Extractor", ['extract', 'solve', 'language'])
+    extractor = FakeExtractor(None, dependencies.solve, None)
+
+    model = FakeScorerModel()
+    scoring_context = ScoringContext("fakewiki", {"fake": model}, extractor)
+
+    rev_scores, errors = scoring_context.process_model_scores_batch(
+        ["fake"], {1: {text: "ab"}, 2: {text: "abcd"}, 3: {}},
+        include_features=True)
+
+    assert model.batches == [[[2], [4]]]
+    assert rev_scores == {
+        1: {"fake": {"score": {"prediction": False},
+                     "features": {"feature.chars": 2}}},
+        2: {"fake": {"score": {"prediction": True},
+                     "features": {"feature.chars": 4}}}}
+    assert list(errors.keys()) == [3]
+
+
+def test_map_from_config():
+    from ores.scoring.models import RevIdScorer
+
+    config = {
+        'scoring_contexts': {
+            'testwiki': {
+                'extractor': "offline",
+                'scorer_models': {'revid': "testwiki_revid"}
+            },
+            'otherwiki': {
+                'extractor': "offline",
+                'scorer_models': {'revid': "testwiki_revid",
+                                  'revid2': "otherwiki_revid"}
+            }
+        },
+        'extractors': {
+            'offline': {'class': "revscoring.extractors.OfflineExtractor"}
+        },
+        'scorer_models': {
+            'testwiki_revid': {'class': "ores.scoring.models.RevIdScorer",
+                               'version': "0.0.0"},
+            'otherwiki_revid': {'class': "ores.scoring.models.RevIdScorer",
+                                'version': "0.0.1"}
+        }
+    }
+    context_map = ScoringContext.map_from_config(
+        config, ['testwiki', 'otherwiki'], loading_workers=2)
+
+    assert isinstance(context_map['testwiki']['revid'], RevIdScorer)
+    # Models are loaded once per config key
+    assert context_map['testwiki']['revid'] is \
+        context_map['otherwiki']['revid']
+    assert context_map['otherwiki'].model_version('revid2') == "0.0.1"
+
+
+class ArrayLoader(ScoringContext.ModelLoader):
+    def load(self, config, key):
+        import numpy
+        return {'key': key, 'weights': numpy.arange(config[key])}
+
+
+def test_load_many():
+    models = ArrayLoader().load_many(
+        {'a': 10, 'b': 20, 'c': 30}, ['a', 'b', 'c', 'a'], workers=2)
+
+    assert set(models) == {'a', 'b', 'c'}
+    assert models['b']['key'] == 'b'
+    assert list(models['c']['weights']) == list(range(30))
+    # Arrays sent out-of-band stay writable
+    models['c']['weights'][0] = 5
@@ -0,0 +1,34 @@
+import pickle
+
+from ores.tracing import Trace
+
+
+def test_trace():
+    reported = []
+    trace = Trace(on_span=lambda *args: reported.append(args))
+
+    with trace.span('cache_lookup'):
+        pass
+    trace.add('predict', 0.5, model_names={"damaging", "goodfaith"})
+
+    assert [span['name'] for span in trace.to_json()] == \
+        ['cache_lookup', 'predict']
+    assert trace.spans[0]['start'] >= 0
+    assert trace.spans[1] == {'name': 'predict',
+                              'models': ["damaging", "goodfaith"],
+                              'start': None, 'duration': 0.5}
+    assert reported[1] == ('predict', 0.5, ["damaging", "goodfaith"])
+
+
+def test_trace_across_processes():
+    trace = Trace(on_span=print)
+    trace.add('extract', 0.1)
+
+    # A worker starts with an empty trace and sends its spans back
+    worker_trace = pickle.loads(pickle.dumps(trace))
+    assert worker_trace.spans == []
+    assert worker_trace.on_span is None
+    worker_trace.add('predict', 0.2, model_names=["damaging"])
+
+    trace.extend(worker_trace.spans)
+    assert [span['name'] for span in trace.spans] == ['extract', 'predict']
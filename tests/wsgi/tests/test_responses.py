@@ -0,0 +1,15 @@
+from flask import Flask, make_response
+
+from ores.wsgi import responses
+
+
+def test_server_overloaded():
+    app = Flask(__name__)
+    with app.test_request_context('/'):
+        response = make_response(responses.server_overloaded())
+        assert response.status_code == 503
+        assert 'Retry-After' not in response.headers
+
+        response = make_response(responses.server_overloaded(retry_after=3))
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == "3"
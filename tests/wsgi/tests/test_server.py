@@ -1,8 +1,12 @@
 import json
 
 import pytest
+from flask import Blueprint, Flask
 
 from ores.applications.wsgi import build
+from ores.metrics_collectors import Prometheus
+from ores.score_request import ScoreRequest
+from ores.wsgi.routes import metrics
 
 
 @pytest.fixture
@@ -143,6 +147,83 @@ def test_scores_v3_context(client):
            {'testwiki': {'models': {'revid': {'version': '0.0.0'}}}}
 
 
+def test_scores_v3_rev_trace(client):
+    res = client.get('/v3/scores/testwiki/123?trace', follow_redirects=True)
+    assert res.status_code == 200
+    data = json.loads(res.get_data().decode('utf-8'))
+    assert 'predict' in [span['name'] for span in data['testwiki']['trace']]
+
+    res = client.get('/v3/scores/testwiki/123', follow_redirects=True)
+    data = json.loads(res.get_data().decode('utf-8'))
+    assert 'trace' not in data['testwiki']
+
+
+def test_bulk_v3(client):
+    res = client.post('/v3/bulk/testwiki/?models=revid',
+                      data="123\n\n456\n123\n",
+                      content_type="text/plain")
+    assert res.status_code == 200
+    assert res.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in
+             res.get_data().decode('utf-8').strip().split("\n")]
+    assert lines[0] == {'context': 'testwiki',
+                        'models': {'revid': {'version': '0.0.0'}}}
+    # Revisions repeated within a batch are only scored once
+    assert [line['rev_id'] for line in lines[1:]] == [123, 456]
+    assert lines[1]['scores']['revid']['score']['prediction'] is False
+
+    res = client.get('/v3/bulk/testwiki/?revids=123|456')
+    lines = res.get_data().decode('utf-8').strip().split("\n")
+    assert [json.loads(line)['rev_id'] for line in lines[1:]] == [123, 456]
+
+
+def test_bulk_v3_errors(client):
+    res = client.post('/v3/bulk/testwiki/?models=foo', data="123\n")
+    assert res.status_code == 404
+
+    # A bad line is reported in its place and scoring continues
+    res = client.post('/v3/bulk/testwiki/?models=revid',
+                      data="123\nfoo\n456\n", content_type="text/plain")
+    lines = [json.loads(line) for line in
+             res.get_data().decode('utf-8').strip().split("\n")]
+    assert [line.get('rev_id', line.get('line')) for line in lines[1:]] == \
+        [123, 2, 456]
+    assert lines[2]['error']['type'] == "LineError"
+    assert 'revid' in lines[3]['scores']
+
+    # Form bodies can't be streamed
+    res = client.post('/v3/bulk/testwiki/?models=revid',
+                      data={'123': ''})
+    assert res.status_code == 415
+
+    for param in ['inject={}', 'precache', 'feature.revision.id=1']:
+        res = client.post('/v3/bulk/testwiki/?models=revid&' + param,
+                          data="123\n", content_type="text/plain")
+        assert res.status_code == 400
+
+
+def test_metrics_not_collected(client):
+    # The test config reports metrics through logging
+    res = client.get('/metrics', follow_redirects=True)
+    assert res.status_code == 404
+
+
+def test_metrics():
+    class ScoringSystem:
+        metrics_collector = Prometheus()
+
+    ScoringSystem.metrics_collector.response_made(
+        200, ScoreRequest("testwiki", [1], {"revid"}))
+    bp = metrics.configure({}, Blueprint('ores', __name__), ScoringSystem())
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+
+    res = app.test_client().get('/metrics')
+    assert res.status_code == 200
+    assert 'ores_response_total{code="200",context="testwiki"} 1' in \
+        res.get_data().decode('utf-8').split("\n")
+
+
 def test_scores_v3_404_context(client):
     res = client.get('/v3/scores/noowiki/', follow_redirects=True)
     assert res.status_code == 404